@@ -0,0 +1,276 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from benchmarks.sintetico import gerar_csv
+from modules import graficos
+from utils import config
+from utils.agregacao import TabelaCodificada, agregar, agregar_grupos
+from utils.dados import ARQUIVO_CUBO, carregar_particoes, ingerir, montar_estados, preprocessar
+from utils.filtros import FiltroIndexado
+from utils.routes import estado_nome, populacao
+
+# Benchmarks das etapas do app sobre um dataset sintético no formato da PRF.
+# Uso: python -m benchmarks.bench --linhas 1000000 --saida resultado.json [--comparar base.json]
+
+# Matriz de filtros (UF, município, início, fim); município True = primeiro município da UF
+MATRIZ_FILTROS = [
+    (None, None, None, None),
+    ('SP', None, None, None),
+    ('MG', None, '2020-01-01', '2021-12-31'),
+    ('RJ', True, None, None),
+    (None, None, '2023-01-01', '2023-03-31'),
+    ('AC', True, '2019-06-01', '2019-06-30'),
+]
+
+SCRIPT_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+
+# Executar a função algumas vezes, guardando os tempos; o pico de memória alocada (tracemalloc)
+# é medido em uma execução à parte, para não distorcer os tempos
+def medir(resultados, nome, funcao, repeticoes=1, memoria=True):
+    tempos = []
+    pico = 0
+    valor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        valor = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    if memoria:
+        tracemalloc.start()
+        valor = funcao()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    resultados[nome] = {
+        "tempos_s": tempos,
+        "mediana_s": statistics.median(tempos),
+        "min_s": min(tempos),
+        "pico_memoria_mb": pico / 2**20 if memoria else None,
+    }
+    print(f"{nome:<40} {resultados[nome]['mediana_s'] * 1000:10.1f} ms")
+    return valor
+
+
+# GeoJSON com um retângulo por estado, para o benchmark não depender do arquivo real nem de rede
+def geojson_sintetico():
+    features = []
+    for i, (nome, sigla) in enumerate(estado_nome.items()):
+        x, y = -74 + (i % 9) * 4, -33 + (i // 9) * 12
+        anel = [[x, y], [x + 4, y], [x + 4, y + 12], [x, y + 12], [x, y]]
+        features.append({"type": "Feature", "id": sigla, "properties": {"name": nome},
+                         "geometry": {"type": "Polygon", "coordinates": [anel]}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def resolver_filtros(filtro):
+    especificacoes = []
+    for uf, municipio, inicio, fim in MATRIZ_FILTROS:
+        if municipio is True:
+            municipio = filtro.municipios_por_uf.get(uf, [None])[0]
+        especificacoes.append((uf, municipio, inicio, fim))
+    return especificacoes
+
+
+# Entrada de cada gráfico a partir do resultado do kernel de agregação, na mesma forma usada pelo app
+AGREGACOES = {
+    'kpis': lambda resultado: resultado['kpis'],
+    'mapa': lambda resultado: resultado['series']['uf'].rename(columns={"acidentes": "Quantidade de Acidentes"}),
+    'pizza': lambda resultado: resultado['series']['classificacao_acidente'].rename(columns={"acidentes": "Quantidade por tipo"}),
+    'barras': lambda resultado: resultado['series']['fase_dia'].rename(columns={"acidentes": "Quantidade"}),
+    'anos': lambda resultado: resultado['series']['ano'].set_axis(['Quantidade de Acidentes', 'Quantidade de Mortes'], axis=1),
+    'dia_semana': lambda resultado: resultado['series']['dia_semana'][['dia_semana', 'acidentes']].set_axis(['dia_semana', 'accident_count'], axis=1),
+    'causas': lambda resultado: resultado['series']['causas'],
+}
+
+
+def construtores_figuras(agregados, estados, geojson):
+    return {
+        'mapa': lambda: graficos.grafico_mapa(agregados['mapa'], geojson),
+        'pizza': lambda: graficos.grafico_pizza(agregados['pizza']),
+        'barras': lambda: graficos.grafico_barras_fase_dia(agregados['barras']),
+        'anos_acidentes': lambda: graficos.grafico_linha_anos(agregados['anos'], 'Quantidade de Acidentes', '#fcde9c', "Acidentes"),
+        'anos_mortes': lambda: graficos.grafico_linha_anos(agregados['anos'], 'Quantidade de Mortes', '#e24c70', "Mortes"),
+        'dia_semana': lambda: graficos.grafico_dia_semana(agregados['dia_semana']),
+        'causas': lambda: graficos.grafico_causas(agregados['causas']),
+        'tx_acidentes': lambda: graficos.grafico_taxa_estados(estados, 'tx_acidentalidade_1k', '#fcde9c', "Acidentes", "Taxa"),
+        'tx_mortes': lambda: graficos.grafico_taxa_estados(estados, 'tx_mortalidade_1k', '#e24c70', "Mortes", "Taxa"),
+    }
+
+
+# Reexecuções completas do script pelo harness de testes do Streamlit, variando os filtros
+def medir_app(resultados, especificacoes, repeticoes, memoria):
+    from streamlit.testing.v1 import AppTest
+
+    nomes_estados = {sigla: nome for nome, sigla in estado_nome.items()}
+    app = AppTest.from_file(SCRIPT_APP, default_timeout=600)
+    medir(resultados, "app.primeira_execucao", app.run, 1, memoria)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    data_minima, data_maxima = app.session_state.start_date, app.session_state.end_date
+
+    for i, (uf, municipio, inicio, fim) in enumerate(especificacoes):
+        def rerun():
+            app.selectbox(key="selected_uf").set_value(nomes_estados[uf] if uf else "Brasil").run()
+            if uf:
+                app.selectbox(key="municipio").set_value(municipio or "Todos os Municípios")
+            app.date_input(key="start_date").set_value(pd.Timestamp(inicio).date() if inicio else data_minima)
+            app.date_input(key="end_date").set_value(pd.Timestamp(fim).date() if fim else data_maxima)
+            app.run()
+            if app.exception:
+                raise RuntimeError(app.exception[0].message)
+        medir(resultados, f"app.rerun.{i}", rerun, repeticoes, memoria)
+
+
+def executar(args):
+    os.makedirs(args.diretorio, exist_ok=True)
+    caminho_csv = os.path.join(args.diretorio, f"sintetico_{args.linhas}.csv")
+    if not os.path.exists(caminho_csv):
+        print(f"Gerando {args.linhas} linhas em {caminho_csv}...")
+        gerar_csv(caminho_csv, args.linhas)
+
+    resultados = {}
+    memoria = not args.sem_memoria
+
+    # Ingestão (CSV -> partições mensais), sempre em um diretório novo
+    diretorio_dados = os.path.join(args.diretorio, f"particoes_{args.linhas}")
+    def ingestao():
+        shutil.rmtree(diretorio_dados, ignore_errors=True)
+        return ingerir(caminho_csv, diretorio_dados)
+    medir(resultados, "ingestao", ingestao, 1, memoria)
+
+    # load_df: leitura das partições + colunas derivadas + tabela de estados
+    def load_df():
+        df = preprocessar(carregar_particoes(diretorio_dados, imutavel=True))
+        return df, montar_estados(df, estado_nome, populacao)
+    df, estados = medir(resultados, "load_df", load_df, args.repeticoes, memoria)
+    cubo = medir(resultados, "load_cubo", lambda: carregar_particoes(diretorio_dados, arquivo=ARQUIVO_CUBO, imutavel=True), args.repeticoes, memoria)
+
+    # Derivação das datas a partir do texto do CSV (a etapa mais cara da ingestão)
+    textos = pd.read_csv(caminho_csv, usecols=['data_inversa', 'horario'], dtype=str)
+    medir(resultados, "derivacao_datas", lambda: pd.to_datetime(
+        textos['data_inversa'] + " " + textos['horario'], format='%Y-%m-%d %H:%M:%S'), args.repeticoes, memoria)
+    del textos
+
+    # Bloco de filtros: montagem do índice e seleção de cada combinação da matriz
+    filtro = medir(resultados, "filtro.indice", lambda: FiltroIndexado(cubo, 'data'), args.repeticoes, memoria)
+    especificacoes = resolver_filtros(filtro)
+    posicoes = medir(resultados, "filtro.selecao", lambda: [filtro.posicoes(*spec) for spec in especificacoes],
+                     args.repeticoes, memoria)
+
+    # Kernel de agregação: KPIs e todas as séries em uma passada por filtro
+    tabela = medir(resultados, "agregacao.tabela", lambda: TabelaCodificada(cubo, 'data'), args.repeticoes, memoria)
+    medir(resultados, "agregacao.kernel", lambda: [agregar(tabela, p) for p in posicoes], args.repeticoes, memoria)
+    # Todas as seleções de uma vez (modo comparação): uma única bincount agrupada
+    medir(resultados, "agregacao.kernel_agrupado", lambda: agregar_grupos(tabela, posicoes), args.repeticoes, memoria)
+
+    # Agregação de cada gráfico (kernel + entrada do gráfico, somada sobre a matriz de filtros)
+    agregados_por_filtro = [{} for _ in posicoes]
+    for nome, funcao in AGREGACOES.items():
+        def agregar_todos():
+            for p, agregados in zip(posicoes, agregados_por_filtro):
+                agregados[nome] = funcao(agregar(tabela, p))
+        medir(resultados, f"agregacao.{nome}", agregar_todos, args.repeticoes, memoria)
+
+    # Construção e serialização de cada figura (sobre a matriz de filtros)
+    geojson = geojson_sintetico()
+    figuras_por_filtro = [construtores_figuras(agregados, estados, geojson) for agregados in agregados_por_filtro]
+    for nome in figuras_por_filtro[0]:
+        construidas = medir(resultados, f"figura.{nome}", lambda: [figuras[nome]() for figuras in figuras_por_filtro],
+                            args.repeticoes, memoria)
+        medir(resultados, f"serializacao.{nome}", lambda: [figura.to_json() for figura in construidas],
+              args.repeticoes, memoria)
+
+    # Reexecuções completas do app, apontando a configuração para os dados sintéticos
+    if not args.sem_app:
+        caminho_geojson = os.path.join(args.diretorio, "geojson_sintetico.json")
+        with open(caminho_geojson, "w", encoding="utf-8") as f:
+            json.dump(geojson, f)
+        config.ARQUIVO_ORIGEM = caminho_csv
+        config.DIRETORIO_DADOS = diretorio_dados
+        config.CAMINHO_GEOJSON = caminho_geojson
+        # Sem aquecimento em segundo plano nem exportação de métricas: só o caminho da reexecução é medido
+        config.AQUECIMENTO = False
+        config.CAMINHO_STATUS_AQUECIMENTO = ""
+        config.CAMINHO_METRICAS_JSONL = ""
+        config.CAMINHO_METRICAS_PROMETHEUS = ""
+        medir_app(resultados, especificacoes, args.repeticoes, memoria)
+
+    import streamlit
+    return {
+        "meta": {
+            "linhas": args.linhas,
+            "repeticoes": args.repeticoes,
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plotly": plotly.__version__,
+            "streamlit": streamlit.__version__,
+            "pico_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "etapas": resultados,
+    }
+
+
+# Comparar com um resultado de referência; devolve as etapas que ficaram mais lentas que a tolerância
+def comparar(atual, base, tolerancia):
+    regressoes = []
+    print(f"\n{'etapa':<40} {'base (ms)':>10} {'atual (ms)':>10} {'variação':>9}")
+    for nome, etapa in atual["etapas"].items():
+        if nome not in base["etapas"]:
+            continue
+        antes, depois = base["etapas"][nome]["mediana_s"], etapa["mediana_s"]
+        variacao = (depois - antes) / antes if antes else 0.0
+        regrediu = variacao > tolerancia
+        if regrediu:
+            regressoes.append(nome)
+        print(f"{nome:<40} {antes * 1000:10.1f} {depois * 1000:10.1f} {variacao:+8.0%}{'  <- REGRESSÃO' if regrediu else ''}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas do app de acidentes")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="linhas do dataset sintético (ex.: 1000000, 5000000, 20000000)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--diretorio", default="./data/benchmark", help="onde ficam o CSV sintético e as partições")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="JSON de referência para detectar regressões")
+    parser.add_argument("--atual", help="JSON já medido para comparar (sem executar os benchmarks)")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="aumento relativo da mediana considerado regressão")
+    parser.add_argument("--sem-app", action="store_true", help="não executar as reexecuções completas do app")
+    parser.add_argument("--sem-memoria", action="store_true", help="não medir o pico de memória (tracemalloc deixa tudo mais lento)")
+    args = parser.parse_args(argv)
+
+    if args.atual:
+        with open(args.atual, encoding="utf-8") as f:
+            resultado = json.load(f)
+    else:
+        resultado = executar(args)
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regressoes = comparar(resultado, base, args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} etapa(s) com regressão acima de {args.tolerancia:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
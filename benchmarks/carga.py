@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import psutil
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+from benchmarks.bench import SCRIPT_APP, geojson_sintetico
+from benchmarks.sintetico import gerar_csv
+from utils.dados import ingerir
+
+# Simulador de carga: sobe o app com `streamlit run` (headless, em um processo à parte, como um worker de produção)
+# e abre N sessões simultâneas pelo mesmo websocket que o navegador usa. Cada sessão troca UF, município e datas ao
+# acaso e clica em "Limpar Filtros"; para cada N, mede a latência das reexecuções (do envio até o fim do script),
+# a vazão e a memória (RSS) do processo do servidor.
+# Uso: python -m benchmarks.carga --sessoes 1 2 4 8 16 --reexecucoes 20 --saida carga.json
+
+# Ações sorteadas por sessão (UF aparece duas vezes: é a troca mais comum)
+ACOES = ['uf', 'uf', 'municipio', 'datas', 'limpar']
+
+
+# Uma sessão do navegador: envia reexecuções com os valores dos widgets e lê as mensagens até o fim do script
+class Sessao:
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.widgets = {}
+        self.conexao = None
+
+    async def conectar(self):
+        self.conexao = await websocket_connect(self.url, max_message_size=1 << 30)
+
+    def fechar(self):
+        self.conexao.close()
+
+    # Reexecutar o script com os estados dos widgets alterados; devolve o tempo até o script terminar
+    async def reexecutar(self, estados=()):
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = ""
+        mensagem.rerun_script.widget_states.widgets.extend(estados)
+        inicio = time.perf_counter()
+        await self.conexao.write_message(mensagem.SerializeToString(), binary=True)
+
+        # Widgets desta execução, pelo rótulo (os outros widgets mantêm os valores no servidor)
+        self.widgets = {}
+        while True:
+            dados = await self.conexao.read_message()
+            if dados is None:
+                raise RuntimeError("Conexão fechada pelo servidor")
+            resposta = ForwardMsg.FromString(dados)
+            tipo = resposta.WhichOneof('type')
+            if tipo == 'delta' and resposta.delta.WhichOneof('type') == 'new_element':
+                elemento = resposta.delta.new_element
+                tipo_elemento = elemento.WhichOneof('type')
+                if tipo_elemento == 'exception':
+                    raise RuntimeError(elemento.exception.message)
+                if tipo_elemento in ('selectbox', 'date_input', 'button'):
+                    widget = getattr(elemento, tipo_elemento)
+                    self.widgets[widget.label] = widget
+            elif tipo == 'script_finished':
+                return time.perf_counter() - inicio
+
+    # Estado de widget de uma ação sorteada
+    def acao_aleatoria(self):
+        acao = self.rng.choice(ACOES)
+        if acao == 'municipio' and 'Município' not in self.widgets:
+            acao = 'uf'
+
+        if acao in ('uf', 'municipio'):
+            seletor = self.widgets['Estado' if acao == 'uf' else 'Município']
+            estado = WidgetState(id=seletor.id)
+            estado.int_value = self.rng.randrange(len(seletor.options))
+            return acao, [estado]
+        if acao == 'datas':
+            campo_inicio, campo_fim = self.widgets['**Início**'], self.widgets['**Fim**']
+            minimo = datetime.datetime.strptime(campo_inicio.min, "%Y/%m/%d").date()
+            maximo = datetime.datetime.strptime(campo_inicio.max, "%Y/%m/%d").date()
+            inicio = minimo + datetime.timedelta(days=self.rng.randrange((maximo - minimo).days + 1))
+            fim = inicio + datetime.timedelta(days=self.rng.randrange((maximo - inicio).days + 1))
+            estados = []
+            for campo, data in ((campo_inicio, inicio), (campo_fim, fim)):
+                estado = WidgetState(id=campo.id)
+                estado.string_array_value.data.append(data.strftime("%Y/%m/%d"))
+                estados.append(estado)
+            return acao, estados
+        estado = WidgetState(id=self.widgets['Limpar Filtros'].id)
+        estado.trigger_value = True
+        return acao, [estado]
+
+
+def percentis(valores):
+    if not valores:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99]) * 1000
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': max(valores) * 1000}
+
+
+# RSS do servidor (processo do streamlit e os filhos dele)
+def rss_servidor(processo):
+    rss = processo.memory_info().rss
+    for filho in processo.children(recursive=True):
+        rss += filho.memory_info().rss
+    return rss
+
+
+# N sessões simultâneas; cada uma faz a primeira execução e depois as reexecuções aleatórias
+async def medir_nivel(url, processo, quantidade, reexecucoes, semente):
+    rss_antes = rss_servidor(processo)
+    sessoes = [Sessao(url, random.Random(semente + i)) for i in range(quantidade)]
+    latencias, primeiras = [], []
+
+    async def simular(sessao):
+        await sessao.conectar()
+        primeiras.append(await sessao.reexecutar())
+        for _ in range(reexecucoes):
+            acao, estados = sessao.acao_aleatoria()
+            latencias.append((acao, await sessao.reexecutar(estados)))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(simular(sessao) for sessao in sessoes))
+    duracao = time.perf_counter() - inicio
+    # Memória medida com as sessões ainda abertas
+    rss_depois = rss_servidor(processo)
+    for sessao in sessoes:
+        sessao.fechar()
+
+    tempos = [tempo for _, tempo in latencias]
+    por_acao = {}
+    for acao, tempo in latencias:
+        por_acao.setdefault(acao, []).append(tempo)
+    return {
+        'sessoes': quantidade,
+        'reexecucoes': len(tempos),
+        'duracao_s': duracao,
+        'vazao_por_s': (len(tempos) + len(primeiras)) / duracao,
+        'latencia': percentis(tempos),
+        'primeira_execucao': percentis(primeiras),
+        'por_acao': {acao: percentis(valores) for acao, valores in sorted(por_acao.items())},
+        'rss_mb': rss_depois / 2**20,
+        'rss_por_sessao_mb': (rss_depois - rss_antes) / 2**20 / quantidade,
+    }
+
+
+# Subir o app em uma porta livre e esperar o health check
+def iniciar_servidor(ambiente, porta, timeout=300):
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", SCRIPT_APP, "--server.headless", "true",
+         "--server.port", str(porta), "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none"],
+        env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor terminou com código {processo.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{porta}/_stcore/health", timeout=2) as resposta:
+                if resposta.status == 200:
+                    return processo
+        except OSError:
+            time.sleep(0.5)
+    processo.terminate()
+    raise RuntimeError("O servidor não respondeu ao health check")
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+async def executar(args, url, processo):
+    # A primeira sessão carrega os dados nos caches do processo, fora das medições
+    print("Carregando os dados...")
+    await medir_nivel(url, processo, 1, 0, args.semente)
+
+    niveis = []
+    print(f"\n{'sessões':>7} {'reexec.':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reexec./s':>9} {'RSS MB':>8} {'MB/sessão':>9}")
+    for quantidade in args.sessoes:
+        nivel = await medir_nivel(url, processo, quantidade, args.reexecucoes, args.semente + 1000 * quantidade)
+        niveis.append(nivel)
+        latencia = nivel['latencia']
+        print(f"{quantidade:>7} {nivel['reexecucoes']:>7} {latencia['p50_ms']:8.1f} {latencia['p95_ms']:8.1f} "
+              f"{latencia['p99_ms']:8.1f} {nivel['vazao_por_s']:9.2f} {nivel['rss_mb']:8.0f} {nivel['rss_por_sessao_mb']:9.1f}")
+    return niveis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de sessões simultâneas do app de acidentes")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="quantidades de sessões simultâneas")
+    parser.add_argument("--reexecucoes", type=int, default=20, help="ações aleatórias por sessão")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="linhas do dataset sintético")
+    parser.add_argument("--diretorio", default="./data/benchmark", help="onde ficam o CSV sintético e as partições")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--aquecimento", action="store_true", help="manter o aquecimento dos caches em segundo plano")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    # Dados sintéticos (os mesmos do bench), já ingeridos antes de o servidor subir
+    os.makedirs(args.diretorio, exist_ok=True)
+    caminho_csv = os.path.join(args.diretorio, f"sintetico_{args.linhas}.csv")
+    if not os.path.exists(caminho_csv):
+        print(f"Gerando {args.linhas} linhas em {caminho_csv}...")
+        gerar_csv(caminho_csv, args.linhas)
+    diretorio_dados = os.path.join(args.diretorio, f"particoes_{args.linhas}")
+    ingerir(caminho_csv, diretorio_dados)
+    caminho_geojson = os.path.join(args.diretorio, "geojson_sintetico.json")
+    with open(caminho_geojson, "w", encoding="utf-8") as f:
+        json.dump(geojson_sintetico(), f)
+
+    # Configuração do app pelas variáveis de ambiente; sem exportação de métricas para não sujar data/metricas
+    ambiente = dict(os.environ, ACIDENTES_ARQUIVO_ORIGEM=caminho_csv, ACIDENTES_DIRETORIO_DADOS=diretorio_dados,
+                    ACIDENTES_GEOJSON=caminho_geojson, ACIDENTES_AQUECIMENTO="1" if args.aquecimento else "0",
+                    ACIDENTES_METRICAS_JSONL="", ACIDENTES_METRICAS_PROMETHEUS="",
+                    ACIDENTES_STATUS_AQUECIMENTO="")
+    porta = porta_livre()
+    servidor = iniciar_servidor(ambiente, porta)
+    try:
+        niveis = asyncio.run(executar(args, f"ws://localhost:{porta}/_stcore/stream", psutil.Process(servidor.pid)))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    if args.saida:
+        import pandas as pd
+        import streamlit
+        resultado = {
+            "meta": {
+                "linhas": args.linhas,
+                "reexecucoes": args.reexecucoes,
+                "semente": args.semente,
+                "data": datetime.datetime.now().isoformat(timespec="seconds"),
+                "pandas": pd.__version__,
+                "streamlit": streamlit.__version__,
+                "cpus": os.cpu_count(),
+            },
+            "niveis": niveis,
+        }
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
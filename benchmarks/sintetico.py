@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.routes import populacao
+
+# Gerador de um CSV com o mesmo formato do arquivo da PRF, para os benchmarks
+
+dias_semana = ["segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo"]
+classificacoes = ["Com Vítimas Feridas", "Sem Vítimas", "Com Vítimas Fatais"]
+fases_dia = ["Pleno dia", "Plena Noite", "Anoitecer", "Amanhecer"]
+causas = [f"Causa {i:02d}" for i in range(70)]
+rodovias = [101, 116, 381, 40, 153, 364, 163, 262, 70, 277]
+
+# Quantidade de municípios por UF e linhas geradas por bloco
+MUNICIPIOS_POR_UF = 70
+LINHAS_POR_BLOCO = 1_000_000
+
+
+# Todos os horários do dia já formatados (indexar é bem mais rápido que formatar linha a linha)
+horarios = np.array([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)])
+
+
+def _bloco(rng, n, ufs, municipios, pesos, datas, datas_texto):
+    indices = rng.integers(0, len(datas), n)
+    dias = datas[indices]
+    indice_uf = rng.choice(len(ufs), n, p=pesos)
+    uf = ufs[indice_uf]
+    municipio = municipios[indice_uf * MUNICIPIOS_POR_UF + rng.integers(0, MUNICIPIOS_POR_UF, n)]
+    return pd.DataFrame({
+        'data_inversa': datas_texto[indices],
+        'dia_semana': np.array(dias_semana)[dias.weekday],
+        'horario': horarios[rng.integers(0, 86400, n)],
+        'uf': uf,
+        'br': rng.choice(rodovias, n),
+        'km': np.char.replace(np.round(rng.uniform(0, 900, n), 1).astype(str), ".", ","),
+        'municipio': municipio,
+        'causa_acidente': rng.choice(causas, n, p=np.linspace(2, 0.1, len(causas)) / np.linspace(2, 0.1, len(causas)).sum()),
+        'classificacao_acidente': rng.choice(classificacoes, n, p=[0.6, 0.33, 0.07]),
+        'fase_dia': rng.choice(fases_dia, n, p=[0.55, 0.3, 0.08, 0.07]),
+        'mortos': rng.choice([0, 1, 2, 3], n, p=[0.93, 0.055, 0.01, 0.005]),
+        'latitude': np.char.replace(np.round(rng.uniform(-33.7, 5.2, n), 6).astype(str), ".", ","),
+        'longitude': np.char.replace(np.round(rng.uniform(-73.9, -34.8, n), 6).astype(str), ".", ","),
+    })
+
+
+# Gerar o CSV em blocos (memória limitada mesmo para dezenas de milhões de linhas)
+def gerar_csv(destino, linhas, inicio="2017-01-01", fim="2023-12-31", semente=0):
+    rng = np.random.default_rng(semente)
+    ufs = np.array(list(populacao))
+    municipios = np.array([f"{uf}-MUNICIPIO-{i}" for uf in ufs for i in range(MUNICIPIOS_POR_UF)])
+    pesos = np.array(list(populacao.values()), dtype=float)
+    pesos /= pesos.sum()
+    datas = pd.date_range(inicio, fim, freq='D')
+    datas_texto = np.asarray(datas.strftime('%Y-%m-%d'))
+
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    temporario = destino + ".tmp"
+    with open(temporario, "w", encoding="utf-8", newline="") as f:
+        for i, n in enumerate(np.diff(np.r_[0:linhas:LINHAS_POR_BLOCO, linhas])):
+            _bloco(rng, int(n), ufs, municipios, pesos, datas, datas_texto).to_csv(f, index=False, header=(i == 0))
+    os.replace(temporario, destino)
+    return destino
+
+
+# python -m benchmarks.sintetico <destino.csv> <linhas>
+if __name__ == "__main__":
+    gerar_csv(sys.argv[1], int(sys.argv[2]))
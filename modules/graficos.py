@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Ordem dos dias da semana no gráfico de barras
+dias_ordenados = ["segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo"]
+
+
+# Mapa de calor dos acidentes por estado
+def grafico_mapa(df_mapa, geojson):
+    fig_mapa = px.choropleth(
+        df_mapa,
+        geojson=geojson,
+        locations='uf',
+        featureidkey="id",
+        color='Quantidade de Acidentes',
+        color_continuous_scale='sunsetdark',
+        labels={'Quantidade de Acidentes': 'Número de Acidentes'}
+    )
+
+    fig_mapa.update_geos(fitbounds="locations", visible=False, bgcolor='rgba(0,0,0,0)', projection_scale=2.0, projection_type="orthographic" )
+    fig_mapa.update_layout(coloraxis_colorbar_title=None ,height=1000, width=600, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
+            "text": "Quantidade de Acidentes por Estado",
+            "x": 0.5,  # Centraliza o título
+            "y": 0.95,  # Ajusta a posição vertical
+            "xanchor": "right",
+            "yanchor": "top",
+            "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
+        },) # Ajustando altura e largura do gráfico
+    return fig_mapa
+
+
+# Gráfico de pizza por classificação do acidente
+def grafico_pizza(df_classificacao):
+    cores = ["#fcde9c", "#e24c70", "#f58a72"]
+
+    fig_pizza = go.Figure(go.Pie(
+        labels=df_classificacao["classificacao_acidente"],
+        values=df_classificacao["Quantidade por tipo"],
+        marker=dict(colors=cores)
+    ))
+    fig_pizza.update_layout(
+        title={
+            "text": "Quantidade de Acidentes por Classificação",
+            "x": 0.5,
+            "y": 0.95,
+            "xanchor": "center",
+            "yanchor": "top",
+            "font": dict(size=20, family="Arial", color="white")
+        },
+        height=400,
+        paper_bgcolor="#222538",
+        plot_bgcolor="#222538",
+        margin=dict(l=50, r=50, t=100, b=50)  # Ajustando as margens
+    )
+    return fig_pizza
+
+
+# Gráfico de barras horizontal por fase do dia
+def grafico_barras_fase_dia(df_dias):
+    # Adicionar o texto de forma condicional para as barras
+    text_position = ['outside'] * len(df_dias)  # Todos os rótulos inicialmente fora
+    if len(df_dias):
+        # Identificar a maior barra e alterar o rótulo dela para dentro
+        text_position[df_dias["Quantidade"].idxmax()] = 'inside'
+
+    fig_barras = go.Figure(go.Bar(
+        y=df_dias["fase_dia"],
+        x=df_dias["Quantidade"],
+        orientation='h',
+        marker=dict(
+            color=df_dias["Quantidade"],
+            colorscale='sunsetdark',
+            showscale=False
+        ),
+        text=df_dias["Quantidade"],
+        textposition=text_position,  # Aplicar as posições do texto
+    ))
+
+    fig_barras.update_layout(
+        title={
+            "text": "Quantidade de Acidentes por Fase do Dia",
+            "x": 0.5,
+            "y": 0.95,
+            "xanchor": "center",
+            "yanchor": "top",
+            "font": dict(size=20, family="Arial", color="white")
+        },
+        height=585,
+        paper_bgcolor="#222538",
+        plot_bgcolor="#222538",
+        margin=dict(l=100, r=50, t=50, b=100),  # Ajustando as margens
+        bargap=0.2
+    )
+    return fig_barras
+
+
+# Gráfico de linha da evolução por ano (acidentes ou mortes) com a linha da média
+def grafico_linha_anos(df_anos, coluna, cor, titulo):
+    fig = px.line(
+        df_anos,
+        x=df_anos.index,
+        y=coluna,
+        markers=True  # Para adicionar marcadores nos pontos
+    )
+    # Ajustar a cor da linha manualmente
+    fig.update_traces(line=dict(color=cor), marker=dict(color=cor))
+
+    # Calcular a média
+    media = df_anos[coluna].mean()
+
+    # Adicionar linha horizontal da média
+    fig.add_hline(
+        y=media,
+        line_dash="dash",  # Linha tracejada
+        line_color=cor,
+        annotation_text=f"Média: {media:.1f}",
+        annotation_position="top left",
+        annotation_font=dict(size=14, color=cor)
+    )
+
+    fig.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
+        "text": titulo,
+        "x": 0.5,  # Centraliza o título
+        "y": 0.95,  # Ajusta a posição vertical
+        "xanchor": "center",
+        "yanchor": "top",
+        "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
+    })  # Altura fixa
+    return fig
+
+
+# Tendência de acidentes e mortos (eixo da direita) na granularidade da série
+def grafico_tendencia(serie, titulo):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=serie['acidentes']['data'], y=serie['acidentes']['acidentes'], name="Acidentes",
+        mode='lines', line=dict(color='#fcde9c')
+    ))
+    fig.add_trace(go.Scatter(
+        x=serie['mortos']['data'], y=serie['mortos']['mortos'], name="Mortos",
+        mode='lines', line=dict(color='#e24c70'), yaxis='y2'
+    ))
+    fig.update_layout(
+        height=500,
+        paper_bgcolor="#222538",
+        plot_bgcolor="#222538",
+        font=dict(color="white"),
+        yaxis=dict(title="Acidentes"),
+        yaxis2=dict(title="Mortos", overlaying='y', side='right', showgrid=False),
+        legend=dict(orientation='h', x=0.5, xanchor='center', y=-0.15),
+        title={
+            "text": titulo,
+            "x": 0.5,
+            "y": 0.95,
+            "xanchor": "center",
+            "yanchor": "top",
+            "font": dict(size=20, family="Arial", color="white")
+        },
+    )
+    return fig
+
+
+# Gráfico de barras dos acidentes por dia da semana
+def grafico_dia_semana(day_accidents):
+    # Ordenar os dias corretamente
+    day_accidents = day_accidents.copy()
+    day_accidents['dia_semana'] = pd.Categorical(day_accidents['dia_semana'], categories=dias_ordenados, ordered=True)
+    day_accidents = day_accidents.sort_values('dia_semana')
+
+    fig2 = px.bar(
+        day_accidents,
+        x='dia_semana',
+        y='accident_count',
+        text='accident_count',
+        color='accident_count',
+        color_continuous_scale='sunsetdark',
+        labels={'dia_semana': 'Dia da Semana', 'accident_count': 'Número de Acidentes'}
+    )
+
+    fig2.update_traces(textposition='outside')
+    fig2.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
+        "text": "Frequência de acidentes por dia da semana",
+        "x": 0.5,  # Centraliza o título
+        "y": 0.95,  # Ajusta a posição vertical
+        "xanchor": "center",
+        "yanchor": "top",
+        "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
+    })  # Altura fixa
+    return fig2
+
+
+# Gráfico de barras das principais causas dos acidentes
+def grafico_causas(top_5_causas):
+    # Colunas 'y' (causas) e 'x' (quantidade de acidentes), que também funcionam com uma seleção vazia
+    df_causas = pd.DataFrame({'y': top_5_causas.index.astype(str), 'x': top_5_causas.values})
+    fig_causas = px.bar(
+        df_causas,
+        y = 'y', # Causas dos acidentes
+        x = 'x', # Quantidade de acidentes
+        labels = {'x': 'Causas', 'y': 'Quantidade de Acidentes'},  # Rótulos dos eixos
+        title = 'Top 5 Causas de Acidentes',  # Título do gráfico
+        text_auto = True,
+        color_discrete_sequence=px.colors.sequential.Sunset  # Usando uma paleta de cores personalizada
+        , orientation='h'
+    )
+
+    # Adicionar o texto de forma condicional para as barras
+    text_position_causas = ['outside'] * len(top_5_causas)  # Todos os rótulos inicialmente fora
+    if text_position_causas:
+        text_position_causas[0] = 'inside'  # Alterar o rótulo da maior barra para dentro
+
+    fig_causas.update_traces(textposition=text_position_causas)
+
+    # Ajustando o layout do gráfico
+    fig_causas.update_layout(
+        height=500,
+        paper_bgcolor="#222538",
+        plot_bgcolor="#222538",
+        font=dict(color="white"),
+        title={
+            "x": 0.5,  # Centraliza o título
+            "y": 0.95,
+            "xanchor": "center",
+            "yanchor": "top",
+            "font": dict(size=20, family="Arial", color="white")
+        }
+    )
+    return fig_causas
+
+
+# Gráfico de linha das taxas por mil habitantes de cada estado
+def grafico_taxa_estados(estados, coluna, cor, titulo, titulo_eixo_y):
+    fig = px.line(
+        estados,
+        x='sigla',
+        y=coluna,
+        markers=True  # Para adicionar marcadores nos pontos
+    )
+    # Ajustar a cor da linha manualmente
+    fig.update_traces(line=dict(color=cor), marker=dict(color=cor))
+
+    # Calcular a média da taxa
+    media = estados[coluna].mean()
+
+    # Adicionar linha horizontal da média
+    fig.add_hline(
+        y=media,
+        line_dash="dash",  # Linha tracejada
+        line_color=cor,
+        annotation_text=f"Média: {media:.2f}",
+        annotation_position="top left",
+        annotation_font=dict(size=14, color=cor)
+    )
+
+    fig.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
+        "text": titulo,
+        "x": 0.5,  # Centraliza o título
+        "y": 0.95,  # Ajusta a posição vertical
+        "xanchor": "center",
+        "yanchor": "top",
+        "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
+    },
+    xaxis_title="Estado (UF)",  # Título do eixo X
+    yaxis_title=titulo_eixo_y,  # Título do eixo Y
+    font=dict(color="white")
+    )
+    return fig
+
+
+# Mapa de densidade dos acidentes, a partir das células da grade (centro da célula + contagem). O mapa não usa
+# tiles externos (estilo "white-bg"): o fundo são os estados do GeoJSON local, desenhados como camadas
+def grafico_densidade(celulas, limites, tamanho_celula, geojson=None):
+    lon_min, lat_min, lon_max, lat_max = limites
+    # Zoom aproximado para a janela caber no mapa
+    extensao = max(lon_max - lon_min, lat_max - lat_min, 0.05)
+    zoom = max(0.0, min(12.0, np.log2(360 / extensao) - 0.5))
+
+    fig = go.Figure(go.Densitymap(
+        lat=celulas['latitude'],
+        lon=celulas['longitude'],
+        z=celulas['acidentes'],
+        customdata=celulas[['mortos']],
+        radius=max(4, int(12 - np.log2(max(tamanho_celula / 0.01, 1)))),
+        colorscale='sunsetdark',
+        hovertemplate="Acidentes: %{z}<br>Mortos: %{customdata[0]}<extra></extra>",
+    ))
+    camadas = []
+    if geojson is not None:
+        camadas = [
+            dict(source=geojson, type="fill", color="#2e3350", below="traces"),
+            dict(source=geojson, type="line", color="#8a90b0", line=dict(width=1), below="traces"),
+        ]
+    fig.update_layout(
+        map=dict(style="white-bg", layers=camadas, center=dict(lat=(lat_min + lat_max) / 2, lon=(lon_min + lon_max) / 2),
+                 zoom=zoom),
+        height=1000,
+        paper_bgcolor="#222538",
+        margin=dict(l=0, r=0, t=60, b=0),
+        title={
+            "text": "Densidade de Acidentes",
+            "x": 0.5,
+            "y": 0.97,
+            "xanchor": "center",
+            "yanchor": "top",
+            "font": dict(size=20, family="Arial", color="white")
+        },
+    )
+    return fig
+
+
+# Modo comparação: uma linha por seleção na evolução por ano (df com as colunas ano, Seleção e a coluna pedida)
+def grafico_comparacao_anos(df, coluna, titulo):
+    fig = px.line(df, x='ano', y=coluna, color='Seleção', markers=True,
+                  color_discrete_sequence=px.colors.sequential.Sunset)
+    fig.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", font=dict(color="white"),
+                      xaxis=dict(dtick=1, title="Ano"), legend=dict(orientation='h', x=0.5, xanchor='center', y=-0.15),
+                      title={
+                          "text": titulo,
+                          "x": 0.5,
+                          "y": 0.95,
+                          "xanchor": "center",
+                          "yanchor": "top",
+                          "font": dict(size=20, family="Arial", color="white")
+                      })
+    return fig
+
+
+# Modo comparação: barras agrupadas por seleção para uma dimensão (dia da semana, classificação ou causa)
+def grafico_comparacao_barras(df, dimensao, titulo, ordem=None, horizontal=False):
+    eixos = dict(y=dimensao, x='acidentes', orientation='h') if horizontal else dict(x=dimensao, y='acidentes')
+    fig = px.bar(df, color='Seleção', barmode='group', category_orders={dimensao: ordem} if ordem else None,
+                 labels={dimensao: '', 'acidentes': 'Número de Acidentes'},
+                 color_discrete_sequence=px.colors.sequential.Sunset, **eixos)
+    fig.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", font=dict(color="white"),
+                      legend=dict(orientation='h', x=0.5, xanchor='center', y=-0.15),
+                      title={
+                          "text": titulo,
+                          "x": 0.5,
+                          "y": 0.95,
+                          "xanchor": "center",
+                          "yanchor": "top",
+                          "font": dict(size=20, family="Arial", color="white")
+                      })
+    return fig
+
+
+# Trechos críticos das rodovias: barras horizontais por trecho (o mais crítico no topo), com a coluna por km pedida
+def grafico_trechos(df, coluna, titulo):
+    df = df.assign(trecho=[f"{br} km {inicio:g}–{fim:g}" for br, inicio, fim in zip(df['br'], df['km_inicial'], df['km_final'])])
+    fig = px.bar(df, y='trecho', x=coluna, orientation='h', text_auto='.2f', hover_data=['ufs', 'acidentes', 'mortos'],
+                 labels={'trecho': '', 'acidentes_km': 'Acidentes por km', 'mortos_km': 'Mortos por km',
+                         'ufs': 'UFs', 'acidentes': 'Acidentes', 'mortos': 'Mortos'},
+                 color_discrete_sequence=['#e24c70' if coluna == 'mortos_km' else '#fcde9c'])
+    fig.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", font=dict(color="white"),
+                      yaxis=dict(autorange='reversed'),
+                      title={
+                          "text": titulo,
+                          "x": 0.5,
+                          "y": 0.95,
+                          "xanchor": "center",
+                          "yanchor": "top",
+                          "font": dict(size=20, family="Arial", color="white")
+                      })
+    return fig
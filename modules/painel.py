@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+
+import streamlit as st
+
+from modules.graficos import (grafico_barras_fase_dia, grafico_causas, grafico_densidade, grafico_dia_semana,
+                              grafico_linha_anos, grafico_mapa, grafico_pizza, grafico_taxa_estados, grafico_tendencia,
+                              grafico_trechos)
+from utils.aquecimento import Aquecimento
+from utils.backends import criar_motor
+from utils.cache import CacheLRU
+from utils.config import (ARQUIVO_ORIGEM, BACKEND_CONSULTAS, CAMINHO_GEOJSON, CAMINHO_STATUS_AQUECIMENTO, DIRETORIO_DADOS,
+                          MAX_CELULAS_DENSIDADE, MAX_FIGURAS_DENSIDADE, MAX_FIGURAS_MAPA, MAX_PONTOS_SERIE,
+                          TAMANHO_CACHE_FIGURAS, TOLERANCIA_GEOJSON)
+from utils.consultas import FiltroSpec
+from utils.dados import ingerir
+from utils.geo import carregar_geojson
+from utils.grade import limites_janela, tamanho_nivel
+from utils.metricas import Medidor
+from utils.rodovias import CRITERIOS_RANKING
+from utils.series import GRANULARIDADES
+
+# Recursos compartilhados do processo e figuras dos painéis, fora do script do app. O script e a thread de
+# aquecimento usam os mesmos recursos (st.cache_resource) e as mesmas chaves no cache de figuras.
+
+
+# As funções com st.cache_resource avisam "missing ScriptRunContext" quando chamadas fora de uma sessão; nas threads
+# do aquecimento isso é esperado
+class _SemAvisoDeContexto(logging.Filter):
+    def filter(self, registro):
+        return not threading.current_thread().name.startswith("aquecimento")
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_SemAvisoDeContexto())
+
+
+# GeoJSON dos estados brasileiros (cópia local, simplificada e com a sigla da UF como id), carregado uma vez por processo.
+# Sem a cópia local o mapa por estado fica oculto (o app nunca baixa o arquivo)
+@st.cache_resource
+def load_geojson(caminho, tolerancia):
+    try:
+        return carregar_geojson(caminho, tolerancia)
+    except FileNotFoundError as erro:
+        print(erro)
+        return None
+
+# Ingestão do arquivo de origem, uma vez por processo para cada (tamanho, data de modificação) do arquivo;
+# assinatura None quando só as partições foram publicadas (vale o manifesto existente)
+@st.cache_resource
+def load_versao_dados(caminho, diretorio, assinatura):
+    return ingerir(caminho, diretorio)
+
+def assinatura_origem(caminho):
+    try:
+        stat = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+# Motor de consultas (refeito apenas quando muda a versão dos dados ou o backend): no backend pandas, cubo
+# pré-agregado imutável, índices dos filtros, códigos do kernel de agregação e tabela de estados; no DuckDB, a visão
+# sobre os arquivos parquet. Uma única cópia por processo, compartilhada entre as sessões
+@st.cache_resource
+def load_motor(backend, diretorio, versao):
+    return criar_motor(backend, diretorio)
+
+# Cache LRU de figuras e KPIs, por estado dos filtros, compartilhado entre as sessões
+@st.cache_resource
+def load_cache_figuras(tamanho_maximo, max_mapas, max_densidade):
+    return CacheLRU(tamanho_maximo, limites_por_tipo={'mapa': max_mapas, 'densidade': max_densidade})
+
+# Aquecimento dos caches em segundo plano, um por versão dos dados
+@st.cache_resource
+def load_aquecimento(caminho_status, versao):
+    return Aquecimento(caminho_status, versao)
+
+
+# Figuras dos painéis de uma versão dos dados. Cada painel tem um método que monta a figura e a guarda no cache de
+# figuras, com a chave das entradas de que ela depende; as seções do script e o aquecimento usam os mesmos métodos
+# (e portanto as mesmas chaves). Cada figura mede a montagem (figura.*) no medidor recebido.
+class Painel:
+    def __init__(self, motor, versao, geojson, cache):
+        self.motor = motor
+        self.versao = versao
+        self.geojson = geojson
+        self.cache = cache
+
+    # Chave de um estado dos filtros no cache de figuras (inclui a versão dos dados)
+    def chave(self, spec):
+        return (self.versao,) + spec.chave()
+
+    # KPIs e séries de todos os gráficos em uma única passada sobre o cubo filtrado
+    def agregados(self, spec, medidor):
+        return self.cache.obter(('agregados',) + self.chave(spec), lambda: self.motor.consultar(spec, medidor))
+
+    # Contagem de acidentes por estado
+    def mapa(self, spec, series, medidor):
+        def montar():
+            df_mapa = series['uf'].rename(columns={"acidentes": "Quantidade de Acidentes"})
+            with medidor.span('figura.mapa'):
+                return grafico_mapa(df_mapa, self.geojson)
+        return self.cache.obter(('mapa', TOLERANCIA_GEOJSON) + self.chave(spec), montar)
+
+    def pizza(self, spec, series, medidor):
+        def montar():
+            df_classificacao = series['classificacao_acidente'].rename(columns={"acidentes": "Quantidade por tipo"})
+            with medidor.span('figura.pizza'):
+                return grafico_pizza(df_classificacao)
+        return self.cache.obter(('pizza',) + self.chave(spec), montar)
+
+    def barras(self, spec, series, medidor):
+        def montar():
+            df_dias = series['fase_dia'].rename(columns={"acidentes": "Quantidade"})
+            with medidor.span('figura.barras'):
+                return grafico_barras_fase_dia(df_dias)
+        return self.cache.obter(('barras',) + self.chave(spec), montar)
+
+    # Mapa de densidade: só as células da janela ocupada pela seleção, no nível de detalhe pedido (None = automático)
+    def densidade(self, spec, grade, nivel, medidor):
+        def montar():
+            with medidor.span('agregacao.densidade'):
+                posicoes = grade.filtro.posicoes(spec.uf, spec.municipio, spec.inicio, spec.fim)
+                janela = grade.janela(posicoes)
+                nivel_grade = grade.nivel_para_janela(janela) if nivel is None else nivel
+                celulas, nivel_grade = grade.celulas(posicoes, nivel_grade, janela, MAX_CELULAS_DENSIDADE)
+            with medidor.span('figura.densidade'):
+                return grafico_densidade(celulas, limites_janela(janela), tamanho_nivel(nivel_grade), self.geojson)
+        return self.cache.obter(('densidade', nivel, MAX_CELULAS_DENSIDADE, TOLERANCIA_GEOJSON) + self.chave(spec), montar)
+
+    def anos(self, spec, series, coluna, medidor):
+        if coluna == 'Quantidade de Acidentes':
+            nome, cor, titulo = 'anos_acidentes', '#fcde9c', "Evolução de Acidentes por Ano"
+        else:
+            nome, cor, titulo = 'anos_mortes', '#e24c70', "Evolução de Mortes por Ano"
+        def montar():
+            df_anos = contar_anos(series)
+            with medidor.span('figura.anos'):
+                return grafico_linha_anos(df_anos, coluna, cor, titulo)
+        return self.cache.obter((nome,) + self.chave(spec), montar)
+
+    def dia_semana(self, spec, series, medidor):
+        def montar():
+            day_accidents = series['dia_semana'][['dia_semana', 'acidentes']]
+            day_accidents.columns = ['dia_semana', 'accident_count']
+            with medidor.span('figura.dia_semana'):
+                return grafico_dia_semana(day_accidents)
+        return self.cache.obter(('dia_semana',) + self.chave(spec), montar)
+
+    def causas(self, spec, series, medidor):
+        def montar():
+            # As 5 principais causas já vêm do kernel de agregação
+            top_5_causas = series['causas']
+            with medidor.span('figura.causas'):
+                return grafico_causas(top_5_causas)
+        return self.cache.obter(('causas',) + self.chave(spec), montar)
+
+    # Tendência na granularidade escolhida (None = automática pelo intervalo de datas)
+    def tendencia(self, spec, granularidade, medidor):
+        def montar():
+            serie = self.motor.tendencia(spec, granularidade, MAX_PONTOS_SERIE, medidor)
+            titulo = f"Evolução {GRANULARIDADES[serie['granularidade']].lower()} de Acidentes e Mortes"
+            with medidor.span('figura.tendencia'):
+                return grafico_tendencia(serie, titulo)
+        return self.cache.obter(('tendencia', granularidade, MAX_PONTOS_SERIE) + self.chave(spec), montar)
+
+    # Trechos críticos das rodovias (janelas de `tamanho` km), ordenados pelo critério, com a figura do ranking
+    def trechos(self, spec, tamanho, top, criterio, medidor):
+        def montar():
+            trechos = self.motor.ranking(spec, tamanho, top, criterio, medidor)
+            titulo = f"Trechos de {tamanho:g} km com mais {CRITERIOS_RANKING[criterio].lower()}"
+            with medidor.span('figura.trechos'):
+                return trechos, grafico_trechos(trechos, f'{criterio}_km', titulo)
+        return self.cache.obter(('trechos', tamanho, top, criterio) + self.chave(spec), montar)
+
+    # Os gráficos por habitantes não dependem dos filtros, só da versão dos dados
+    def taxa(self, coluna, medidor):
+        if coluna == 'tx_acidentalidade_1k':
+            nome, cor, titulo, titulo_eixo_y = ('tx_acidentes', '#fcde9c', "Taxa de acidentalidade em BRs per capita",
+                                                "Taxa de Acidentalidade por mil Habitantes")
+        else:
+            nome, cor, titulo, titulo_eixo_y = ('tx_mortes', '#e24c70', "Taxa de mortalidade por acidentes em BRs per capita",
+                                                "Taxa de Mortalidade por acidentes por mil Habitantes")
+        def montar():
+            with medidor.span('figura.taxa_estados'):
+                return grafico_taxa_estados(self.motor.estados, coluna, cor, titulo, titulo_eixo_y)
+        return self.cache.obter((nome, self.versao), montar)
+
+    # Figuras das abas padrão de um filtro, com um medidor próprio (fora das métricas das sessões)
+    def aquecer(self, spec):
+        medidor = Medidor()
+        series = self.agregados(spec, medidor)['series']
+        if self.geojson is not None:
+            self.mapa(spec, series, medidor)
+        self.pizza(spec, series, medidor)
+        self.barras(spec, series, medidor)
+        self.anos(spec, series, 'Quantidade de Acidentes', medidor)
+        self.dia_semana(spec, series, medidor)
+        self.tendencia(spec, None, medidor)
+
+    # Tarefas do aquecimento: os gráficos por habitantes, a visão padrão (Brasil, período inteiro) e depois cada UF,
+    # das com mais acidentes para as com menos
+    def tarefas_aquecimento(self):
+        estados = self.motor.estados
+        periodo = (self.motor.data_minima.isoformat(), self.motor.data_maxima.isoformat())
+        ufs_populares = estados.loc[estados['Acidentes'] > 0].sort_values('Acidentes', ascending=False)['sigla']
+        tarefas = [('taxas', lambda: self.taxa('tx_acidentalidade_1k', Medidor()))]
+        tarefas += [(uf or 'Brasil', lambda uf=uf: self.aquecer(FiltroSpec(uf, None, *periodo)))
+                    for uf in [None] + list(ufs_populares)]
+        return tarefas
+
+
+# Criar DataFrame com a contagem de acidentes e mortes por ano
+def contar_anos(series):
+    df_anos = series['ano'].rename_axis('Ano')
+    df_anos.columns = ['Quantidade de Acidentes', 'Quantidade de Mortes']
+    return df_anos
+
+
+# Painel da versão dos dados com os recursos compartilhados do processo
+def carregar_painel(versao):
+    motor = load_motor(BACKEND_CONSULTAS, DIRETORIO_DADOS, versao)
+    geojson = load_geojson(CAMINHO_GEOJSON, TOLERANCIA_GEOJSON)
+    cache = load_cache_figuras(TAMANHO_CACHE_FIGURAS, MAX_FIGURAS_MAPA, MAX_FIGURAS_DENSIDADE)
+    return Painel(motor, versao, geojson, cache)
+
+
+# Iniciar o aquecimento da versão dos dados (uma vez por versão); motor e figuras são carregados já na thread
+def iniciar_aquecimento(versao):
+    aquecimento = load_aquecimento(CAMINHO_STATUS_AQUECIMENTO, versao)
+    aquecimento.iniciar(lambda: carregar_painel(versao).tarefas_aquecimento())
+    return aquecimento
+
+
+# Ingestão e aquecimento em uma thread, para o processo ficar pronto antes da primeira sessão. Chamado por
+# modules.servidor antes de subir o Streamlit; no script, o aquecimento é iniciado por iniciar_aquecimento.
+def aquecer_em_segundo_plano():
+    def aquecer():
+        iniciar_aquecimento(load_versao_dados(ARQUIVO_ORIGEM, DIRETORIO_DADOS, assinatura_origem(ARQUIVO_ORIGEM)))
+    thread = threading.Thread(target=aquecer, name="aquecimento.inicio", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,22 @@
+import os
+import sys
+
+from streamlit.web import cli
+
+from modules.painel import aquecer_em_segundo_plano
+from utils.config import AQUECIMENTO
+
+SCRIPT_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+
+# python -m modules.servidor [opções do streamlit run] -> inicia a ingestão e o aquecimento dos caches e sobe o app
+# como `streamlit run streamlit_app.py` no mesmo processo (o Streamlit não tem um gancho de inicialização do servidor)
+def main(argv=None):
+    if AQUECIMENTO:
+        aquecer_em_segundo_plano()
+    sys.argv = ["streamlit", "run", SCRIPT_APP] + list(sys.argv[1:] if argv is None else argv)
+    return cli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,91 +1,103 @@
 # %%
 
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import streamlit as st
 import pandas as pd
-import tarfile
-import plotly.express as px
-import requests
-import plotly.graph_objects as go
-from utils.routes import bandeiras
+from utils.routes import estado_nome
+from utils.bandeiras import carregar_bandeira
+from utils.config import (AQUECIMENTO, ARQUIVO_ORIGEM, BACKEND_CONSULTAS, CAMINHO_BANDEIRAS, CAMINHO_GEOJSON,
+                          CAMINHO_METRICAS_JSONL, CAMINHO_METRICAS_PROMETHEUS, CAMINHO_STATUS_AQUECIMENTO,
+                          DIRETORIO_DADOS, DIRETORIO_EXPORTACOES, INTERVALO_METRICAS, JANELA_METRICAS,
+                          MAX_FIGURAS_DENSIDADE, MAX_FIGURAS_MAPA, MAX_SELECOES_COMPARACAO, TAMANHO_CACHE_FIGURAS,
+                          TAMANHO_TRECHO_KM, TOLERANCIA_GEOJSON, TOP_TRECHOS, TRABALHADORES_FIGURAS)
+from utils.metricas import Medidor, RegistroMetricas
+from utils.dados import carregar_particoes
+from utils.grade import COLUNAS_GRADE, NIVEIS, GradeDensidade, tamanho_nivel
+from utils.series import GRANULARIDADES
+from utils.consultas import FiltroSpec
+from utils.exportacao import FORMATOS, Exportador, url_estatica
+from utils.rodovias import CRITERIOS_RANKING, rotulo_br
 from modules.nav import navbar
+from modules.painel import (Painel, assinatura_origem, iniciar_aquecimento, load_aquecimento, load_cache_figuras,
+                            load_geojson, load_motor, load_versao_dados)
+from modules.graficos import dias_ordenados, grafico_comparacao_anos, grafico_comparacao_barras
 
 
-# Baixar o GeoJSON dos estados brasileiros
-geojson_url = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
-response = requests.get(geojson_url)
-geojson = response.json()
-
-# Criar um dicionário de conversão do nome dos estados no GeoJSON
-estado_nome = {
-    'Acre': 'AC', 'Alagoas': 'AL', 'Amapá': 'AP', 'Amazonas': 'AM', 'Bahia': 'BA', 'Ceará': 'CE',
-    'Distrito Federal': 'DF', 'Espírito Santo': 'ES', 'Goiás': 'GO', 'Maranhão': 'MA', 'Mato Grosso': 'MT',
-    'Mato Grosso do Sul': 'MS', 'Minas Gerais': 'MG', 'Pará': 'PA', 'Paraíba': 'PB', 'Paraná': 'PR',
-    'Pernambuco': 'PE', 'Piauí': 'PI', 'Rio de Janeiro': 'RJ', 'Rio Grande do Norte': 'RN',
-    'Rio Grande do Sul': 'RS', 'Rondônia': 'RO', 'Roraima': 'RR', 'Santa Catarina': 'SC',
-    'São Paulo': 'SP', 'Sergipe': 'SE', 'Tocantins': 'TO'
-}
-
-# Tamanho da população de cada estado - Fonte: https://www.cnnbrasil.com.br/nacional/brasil-tem-2125-milhoes-de-habitantes-diz-ibge/#goog_rewarded
-populacao = {
-    "SP": 45973194, "MG": 21322691, "RJ": 17219679, "BA": 14850513, "PR": 11824665,
-    "RS": 11229915, "PE": 9539029, "CE": 9233656, "PA": 8664306, "SC": 8058441,
-    "GO": 7350483, "MA": 7010960, "AM": 4281209, "PB": 4145040, "ES": 4102129,
-    "MT": 3836399, "RN": 3446071, "PI": 3375646, "AL": 3220104, "DF": 2982818,
-    "MS": 2901895, "SE": 2291077, "RO": 1746227, "TO": 1577342, "AC": 880631,
-    "AP": 802837, "RR": 716793
-}
-
-# Criar dataframe com nomes, siglas e populações dos estados
-estados = pd.DataFrame(estado_nome.items(), columns=['estado', 'sigla'])
-estados['populacao'] = estados['sigla'].map(populacao)
-
-# Ajustar os nomes no GeoJSON para corresponder ao DataFrame
-for feature in geojson['features']:
-    nome_estado = feature['properties']['name']
-    feature['id'] = estado_nome.get(nome_estado, None)  # Adicionar ID com a sigla do estado
+# Copy-on-write: fatias dos dados compartilhados são views, e alterá-las nunca mexe no original
+pd.set_option("mode.copy_on_write", True)
 
 # Configuração do layout do app
 st.set_page_config(page_title="Análise de Acidentes de Trânsito", layout="wide")
 navbar()
+
+# Registro dos tempos de cada etapa, compartilhado entre as sessões (exporta p50/p95 periodicamente)
+@st.cache_resource
+def load_registro(caminho_jsonl, caminho_prometheus, janela, intervalo):
+    return RegistroMetricas(caminho_jsonl, caminho_prometheus, janela, intervalo)
+
+registro = load_registro(CAMINHO_METRICAS_JSONL, CAMINHO_METRICAS_PROMETHEUS, JANELA_METRICAS, INTERVALO_METRICAS)
+medidor = Medidor(registro)
+
 # Caminho do arquivo .tar.gz
-tar_path = "./data/accidents_2017_to_2023.tar.gz"
-
-# Função para carregar os dados
-@st.cache_data
-def load_df(tar_path):
-    with tarfile.open(tar_path, "r:gz") as tar:
-        for member in tar.getmembers():
-            if member.name.endswith(".csv"):
-                with tar.extractfile(member) as file:
-                    df = pd.read_csv(file)
-                    break
-    return df
-
-# Carregar os dados
-df = load_df(tar_path)
-
-# Converter data para formato datetime
-df['data_acidente'] = pd.to_datetime(df['data_inversa'] + " " + df['horario'], format='%Y-%m-%d %H:%M:%S')
-df = df.sort_values('data_acidente')
-df['Month'] = df['data_acidente'].apply(lambda x: str(x.year) + "-" + str(x.month))
-
-# Acrescentar dados de acidentes e mortes + taxas no dataframe estados
-estados['Acidentes'] = estados['sigla'].map(df['data_inversa'].groupby(df['uf']).count())
-estados['Mortos'] = estados['sigla'].map(df['mortos'].groupby(df['uf']).sum())
-estados['tx_acidentalidade_1k'] = estados['Acidentes'] / estados['populacao'] * 1000
-estados['tx_mortalidade_1k'] = estados['Mortos'] / estados['populacao'] * 1000
+tar_path = ARQUIVO_ORIGEM
+
+# Recursos compartilhados do processo (GeoJSON, cache de figuras) e figuras dos painéis: ficam em modules.painel
+geojson = load_geojson(CAMINHO_GEOJSON, TOLERANCIA_GEOJSON)
+cache_figuras = load_cache_figuras(TAMANHO_CACHE_FIGURAS, MAX_FIGURAS_MAPA, MAX_FIGURAS_DENSIDADE)
+
+# Grade de densidade (coordenadas de cada acidente pré-agregadas por célula), montada uma vez por versão dos dados
+@st.cache_resource
+def load_grade(diretorio, versao):
+    return GradeDensidade(carregar_particoes(diretorio, colunas=COLUNAS_GRADE, imutavel=True))
+
+# Exportador das linhas filtradas (lê as partições da seleção em blocos a cada exportação), montado só no primeiro
+# pedido de exportação de cada versão dos dados; os arquivos de versões anteriores e os vencidos são removidos.
+@st.cache_resource
+def load_exportador(diretorio, versao):
+    exportador = Exportador(diretorio, DIRETORIO_EXPORTACOES, versao)
+    exportador.limpar()
+    return exportador
+
+# A pasta das exportações precisa estar dentro da pasta estática (senão o link não seria servido): falha já na subida
+url_estatica(DIRETORIO_EXPORTACOES)
+
+# Bandeiras servidas da cópia local, lidas do disco uma vez por processo
+@st.cache_resource
+def load_bandeira(chave, origem):
+    return carregar_bandeira(chave, origem)
+
+# Pool de threads do processo que monta as figuras das seções em paralelo (None = montagem em sequência)
+@st.cache_resource
+def load_pool_figuras(trabalhadores):
+    return ThreadPoolExecutor(trabalhadores, thread_name_prefix="figuras") if trabalhadores > 0 else None
+
+# Carregar os dados (o .tar.gz só é convertido em partições quando o seu conteúdo muda)
+with medidor.span('carga.ingestao'):
+    versao_dados = load_versao_dados(tar_path, DIRETORIO_DADOS, assinatura_origem(tar_path))
+with medidor.span('carga'):
+    motor = load_motor(BACKEND_CONSULTAS, DIRETORIO_DADOS, versao_dados)
+estados = motor.estados
+painel = Painel(motor, versao_dados, geojson, cache_figuras)
+
+# Aquecimento da versão dos dados: com python -m modules.servidor já começou na subida do servidor (aqui não faz
+# nada); com streamlit run, começa na primeira execução do processo. De novo a cada nova versão dos dados.
+if AQUECIMENTO:
+    aquecimento = iniciar_aquecimento(versao_dados)
+else:
+    aquecimento = load_aquecimento(CAMINHO_STATUS_AQUECIMENTO, versao_dados)
 
 # Sidebar
 st.sidebar.header("Filtros")
 
-# Criar dicionário de mapeamento sigla -> nome completo
-mapa_estados = dict(zip(estados["sigla"], estados["estado"]))
-uf_list = sorted([mapa_estados[sigla] for sigla in df["uf"].unique()])
+# Estados presentes nos dados (a tabela estados já tem a contagem de acidentes por UF)
+uf_list = sorted(estados.loc[estados['Acidentes'] > 0, 'estado'])
 uf_list = ['Brasil'] + list(uf_list)
 
 # Definir intervalo de data possível de ser selecionado
-min_date = df['data_acidente'].min().date()
-max_date = df['data_acidente'].max().date()
+min_date = motor.data_minima
+max_date = motor.data_maxima
 
 # Função de limpar filtros
 def reset():
@@ -93,7 +105,9 @@ def reset():
     st.session_state.municipio = "Todos os Municípios"
     st.session_state.start_date = min_date
     st.session_state.end_date = max_date
-    print('Limpar Filtros')
+    st.session_state.rodovia = "Todas as BRs"
+    for chave in [chave for chave in st.session_state if str(chave).startswith("trecho_km_")]:
+        del st.session_state[chave]
 
 # Estados e Datas com estados padrão
 if "selected_uf" not in st.session_state:
@@ -101,9 +115,11 @@ if "selected_uf" not in st.session_state:
 if "municipio" not in st.session_state:
     st.session_state.municipio = "Todos os Municípios"
 if "start_date" not in st.session_state:
-    st.session_state.start_date = df["data_acidente"].min().date()
+    st.session_state.start_date = min_date
 if "end_date" not in st.session_state:
-    st.session_state.end_date = df["data_acidente"].max().date()
+    st.session_state.end_date = max_date
+if "rodovia" not in st.session_state:
+    st.session_state.rodovia = "Todas as BRs"
 
 # Filtro de UF
 selected_uf = st.sidebar.selectbox("Estado", uf_list, index=uf_list.index(st.session_state.selected_uf), key = 'selected_uf')
@@ -112,9 +128,12 @@ selected_uf = st.sidebar.selectbox("Estado", uf_list, index=uf_list.index(st.ses
 # municipio = None
 if selected_uf != 'Brasil':
     uf_sigla = estado_nome[selected_uf]  # Pegamos a sigla usando o dicionário
-    municipios_list = sorted(df[df['uf'] == uf_sigla]['municipio'].unique())
+    municipios_list = motor.municipios_por_uf.get(uf_sigla, [])
     municipios_list = ['Todos os Municípios'] + list(municipios_list)
-    
+
+    # Município escolhido em outra UF não existe na lista nova
+    if st.session_state.municipio not in municipios_list:
+        st.session_state.municipio = "Todos os Municípios"
     municipio = st.sidebar.selectbox("Município", municipios_list, index=municipios_list.index(st.session_state.municipio), key = 'municipio')
 
 # Filtro de Data
@@ -129,52 +148,121 @@ end_date = col2.date_input("**Fim**", value=max_date, min_value=min_date, max_va
 start_date = pd.to_datetime(start_date)
 end_date = pd.to_datetime(end_date)
 
+# Filtro de rodovia: BR (das que passam pelo estado escolhido) e trecho em km
+st.sidebar.header("Rodovia")
+rodovias = motor.rodovias_por_uf(estado_nome[selected_uf] if selected_uf != 'Brasil' else None)
+rodovias_list = ['Todas as BRs'] + [rotulo_br(br) for br in rodovias]
+
+# BR escolhida em outra UF pode não passar pela UF nova
+if st.session_state.rodovia not in rodovias_list:
+    st.session_state.rodovia = "Todas as BRs"
+rodovia = st.sidebar.selectbox("BR", rodovias_list, index=rodovias_list.index(st.session_state.rodovia), key='rodovia')
+
+filtro_br = None
+km_inicio = None
+km_fim = None
+if rodovia != 'Todas as BRs':
+    filtro_br = rodovias[rodovias_list.index(rodovia) - 1]
+    limites_km = motor.limites_km(filtro_br)
+    if limites_km is not None:
+        # Um slider por BR (cada BR tem a sua extensão); a rodovia inteira fica sem filtro de km
+        km_min, km_max = float(int(limites_km[0])), float(int(limites_km[1]) + 1)
+        km_inicio, km_fim = st.sidebar.slider("Trecho (km)", km_min, km_max, (km_min, km_max), step=1.0, format="%.0f",
+                                              key=f"trecho_km_{filtro_br}")
+        if (km_inicio, km_fim) == (km_min, km_max):
+            km_inicio = km_fim = None
+
 # Botão de limpar filtros
 st.sidebar.button("Limpar Filtros", on_click=reset)
 
-# Aplicar filtros
-df_filtered = df.copy()
+# Painel de depuração (opcional) com os tempos de cada etapa; preenchido no fim da execução
+debug = st.sidebar.toggle("Modo depuração", key="debug")
+painel_debug = st.sidebar.container()
+
+# Aplicar filtros (sobre o cubo, que tem uma célula por dia e categoria)
+filtro_uf = None
+filtro_municipio = None
 
 # Filtro de UF
 if selected_uf != 'Brasil':
-    uf_sigla = estado_nome[selected_uf]  # Pegamos a sigla usando o dicionário
-    df_filtered = df_filtered[df_filtered['uf'] == uf_sigla]
-    
+    filtro_uf = estado_nome[selected_uf]  # Pegamos a sigla usando o dicionário
+
     # Filtro de Município
     if municipio != 'Todos os Municípios':
-        df_filtered = df_filtered[df_filtered['municipio'] == municipio]
+        filtro_municipio = municipio
 
-# Filtro de Data
-df_filtered = df_filtered[
-    (df_filtered['data_acidente'] >= start_date) & 
-    (df_filtered['data_acidente'] <= end_date)
-]
+# Estado dos filtros normalizado, usado nas consultas e como chave do cache de figuras
+spec = FiltroSpec(filtro_uf, filtro_municipio, start_date.date().isoformat(), end_date.date().isoformat(),
+                  filtro_br, km_inicio, km_fim)
+trecho = (filtro_br, km_inicio, km_fim)
 
 # Exibir a bandeira do estado selecionado (se não for "Brasil")
 if selected_uf != 'Brasil':
     uf_sigla = estado_nome[selected_uf]  # Pegamos a sigla usando o dicionário
-    st.sidebar.image(bandeiras[uf_sigla], caption=f"Bandeira de {selected_uf}")
+    st.sidebar.image(load_bandeira(uf_sigla, CAMINHO_BANDEIRAS), caption=f"Bandeira de {selected_uf}")
 # Exibir a bandeira do Brasil, se não tiver um estado selecionado
 else:
-    st.sidebar.image(bandeiras[selected_uf], caption=f"Bandeira do Brasil")
-# Calcular o total de acidentes no DataFrame filtrado
-df_total_acidentes = float(df_filtered.value_counts().sum())
-# Contar a quantidade de acidentes por dia
-acidentes_por_dia = df_filtered.groupby(df_filtered['data_acidente'].dt.date).size().sum()
-
-# Calcular a média de acidentes por dia
-qtd_dias = (end_date - start_date).days
-media_acidentes_por_dia = df_total_acidentes / qtd_dias
-media_acidentes_por_dia = f"{media_acidentes_por_dia:.2f}"
-df_mortos = df_filtered[df_filtered['mortos'] != 0].value_counts().sum()
-
-# Calcular taxa de acidentalidade e mortalidade Brasil
-if selected_uf == 'Brasil':
-    pop = estados['populacao'].sum()
-else:
-    pop = estados['populacao'][estados['estado'] == selected_uf].values[0]
-tx_acid = df_total_acidentes / pop * 1000
-tx_mort = df_mortos / pop * 1000
+    st.sidebar.image(load_bandeira(selected_uf, CAMINHO_BANDEIRAS), caption=f"Bandeira do Brasil")
+
+# Modo comparação: vários estados, municípios (do estado escolhido) ou anos (com os demais filtros atuais)
+st.sidebar.header("Comparação")
+comparacao = {}
+if st.sidebar.toggle("Modo comparação", key="comparacao"):
+    tipo_comparacao = st.sidebar.radio("Comparar", ['Estados', 'Municípios', 'Anos'], horizontal=True, key="tipo_comparacao")
+    if tipo_comparacao == 'Estados':
+        escolhas = st.sidebar.multiselect("Estados", uf_list[1:], max_selections=MAX_SELECOES_COMPARACAO, key="comparar_ufs")
+        comparacao = {nome: FiltroSpec(estado_nome[nome], None, spec.inicio, spec.fim, *trecho) for nome in escolhas}
+    elif tipo_comparacao == 'Municípios':
+        if filtro_uf is None:
+            st.sidebar.info("Escolha um estado para comparar os seus municípios.")
+        else:
+            escolhas = st.sidebar.multiselect("Municípios", motor.municipios_por_uf.get(filtro_uf, []),
+                                              max_selections=MAX_SELECOES_COMPARACAO, key="comparar_municipios")
+            comparacao = {nome: FiltroSpec(filtro_uf, nome, spec.inicio, spec.fim, *trecho) for nome in escolhas}
+    else:
+        # Cada ano é cortado no intervalo dos dados (a média por dia usa só os dias com dados)
+        anos = list(range(min_date.year, max_date.year + 1))
+        escolhas = st.sidebar.multiselect("Anos", anos, max_selections=MAX_SELECOES_COMPARACAO, key="comparar_anos")
+        comparacao = {
+            str(ano): FiltroSpec(filtro_uf, filtro_municipio, max(pd.Timestamp(ano, 1, 1).date(), min_date).isoformat(),
+                                 min(pd.Timestamp(ano, 12, 31).date(), max_date).isoformat(), *trecho)
+            for ano in escolhas
+        }
+
+# Exportar as linhas da seleção atual; o arquivo é gravado em blocos na pasta estática e baixado por um link
+st.sidebar.header("Exportar dados")
+formato_exportacao = st.sidebar.radio("Formato", list(FORMATOS), horizontal=True, key="formato_exportacao")
+if st.sidebar.button("Gerar arquivo", key="exportar"):
+    with st.sidebar, st.spinner("Gerando arquivo..."):
+        exportador = load_exportador(DIRETORIO_DADOS, versao_dados)
+        caminho_exportacao = exportador.exportar(spec, formato_exportacao)
+    if caminho_exportacao is None:
+        st.sidebar.warning("Há muitas exportações em andamento. Tente novamente em instantes.")
+    else:
+        st.session_state.exportacao = (spec, formato_exportacao, caminho_exportacao, exportador.url(caminho_exportacao),
+                                       exportador.contar(spec), os.path.getsize(caminho_exportacao))
+
+# Link do último arquivo gerado, enquanto a seleção e o formato forem os mesmos e o arquivo não tiver vencido
+if st.session_state.get("exportacao", (None, None))[:2] == (spec, formato_exportacao):
+    _, _, caminho_exportacao, url, linhas_exportadas, tamanho_exportado = st.session_state.exportacao
+    if os.path.exists(caminho_exportacao):
+        nome_download = "acidentes" + FORMATOS[formato_exportacao]
+        st.sidebar.markdown(f'<a href="{url}" download="{nome_download}">Baixar {linhas_exportadas:,} linhas '
+                            f'({tamanho_exportado / 2**20:.1f} MB)</a>', unsafe_allow_html=True)
+    else:
+        del st.session_state.exportacao
+# KPIs e séries de todos os gráficos (o dia final entra inteiro no intervalo);
+# refeito só quando o estado dos filtros não está no cache
+agregados = painel.agregados(spec, medidor)
+series = agregados['series']
+
+# Calcular o total de acidentes e de acidentes com mortos no intervalo filtrado
+df_total_acidentes = float(agregados['kpis']['acidentes'])
+df_mortos = agregados['kpis']['acidentes_fatais']
+
+# Média de acidentes por dia e taxa de acidentalidade por mil habitantes
+media_acidentes_por_dia = f"{agregados['kpis']['media_dia']:.2f}"
+tx_acid = agregados['kpis']['tx_acidentes_1k']
 
 # KPIs
 with st.container():
@@ -212,342 +300,235 @@ with st.container():
     # Adicionando um pequeno espaço entre os containers
     st.markdown("<br>", unsafe_allow_html=True)
 
+# Renderização progressiva: na execução completa, cada painel reserva o seu espaço na página e a montagem da figura
+# vai para o pool de threads. Os espaços são preenchidos na ordem em que as figuras ficam prontas: as que terminam
+# enquanto a página ainda é desenhada são enviadas no caminho, e as outras no fim do script. Na reexecução de um fragmento (troca de aba) a figura é montada e enviada na hora.
+# As funções de montagem não chamam comandos do Streamlit (rodam fora da thread do script).
+pool_figuras = load_pool_figuras(TRABALHADORES_FIGURAS)
+pendentes = {}
+adiar_figuras = pool_figuras is not None
+
+def exibir(montar, desenhar):
+    lugar = st.empty()
+    if adiar_figuras:
+        lugar.caption("Carregando...")
+        pendentes[pool_figuras.submit(montar)] = (lugar, desenhar)
+        desenhar_prontas()
+    else:
+        desenhar(lugar, montar())
+
+# Enviar as figuras que já ficaram prontas (espera=True: esperar todas, na ordem em que terminam)
+def desenhar_prontas(espera=False):
+    for futuro in as_completed(pendentes) if espera else [futuro for futuro in pendentes if futuro.done()]:
+        lugar, desenhar = pendentes.pop(futuro)
+        desenhar(lugar, futuro.result())
+
+# Envio de um gráfico Plotly para o espaço reservado, medido como serializacao.<nome>
+def grafico(nome, **opcoes):
+    def desenhar(lugar, fig):
+        with medidor.span(f'serializacao.{nome}'):
+            lugar.plotly_chart(fig, **opcoes)
+    return desenhar
+
+# Modo comparação: KPIs e gráficos de todas as seleções, agregados em uma única passada agrupada
+def figuras_comparacao(rotulos, resultados, medidor):
+    # Séries de todas as seleções em formato longo, com a coluna 'Seleção'
+    def longo(serie):
+        return pd.concat([resultado['series'][serie].assign(**{'Seleção': rotulo})
+                          for rotulo, resultado in zip(rotulos, resultados)])
+
+    # Causas: as principais causas de cada seleção, com a quantidade de todas as seleções
+    principais = list(dict.fromkeys(causa for resultado in resultados for causa in resultado['series']['causas'].index))
+    causas = longo('causa_acidente')
+    causas = causas[causas['causa_acidente'].isin(principais)]
+    with medidor.span('figura.comparacao'):
+        return [
+            grafico_comparacao_anos(longo('ano').reset_index(names='ano').rename(columns={'acidentes': 'Acidentes'}),
+                                    'Acidentes', "Evolução de Acidentes por Ano"),
+            grafico_comparacao_barras(longo('dia_semana'), 'dia_semana', "Acidentes por dia da semana",
+                                      ordem=dias_ordenados),
+            grafico_comparacao_barras(longo('classificacao_acidente'), 'classificacao_acidente',
+                                      "Acidentes por Classificação"),
+            grafico_comparacao_barras(causas, 'causa_acidente', "Principais causas dos Acidentes", horizontal=True),
+        ]
+
+# Agregação agrupada e figuras da comparação, montadas juntas (no pool de threads, como as outras seções)
+def montar_comparacao(rotulos, especificacoes, medidor):
+    chave_comparacao = (versao_dados,) + tuple(spec.chave() for spec in especificacoes)
+    resultados = cache_figuras.obter(('comparacao',) + chave_comparacao,
+                                     lambda: motor.comparar(especificacoes, medidor))
+    figuras = cache_figuras.obter(('figuras_comparacao', tuple(rotulos)) + chave_comparacao,
+                                  lambda: figuras_comparacao(rotulos, resultados, medidor))
+    return rotulos, resultados, figuras
+
+def desenhar_comparacao(lugar, montagem):
+    rotulos, resultados, figuras = montagem
+    with lugar.container():
+        kpis_comparacao = pd.DataFrame(
+            [{'Seleção': rotulo, 'Acidentes': r['kpis']['acidentes'], 'Mortos': r['kpis']['mortos'],
+              'Acidentes com mortos': r['kpis']['acidentes_fatais'], 'Média por dia': r['kpis']['media_dia'],
+              'Acidentes por mil habitantes': r['kpis']['tx_acidentes_1k']}
+             for rotulo, r in zip(rotulos, resultados)]
+        )
+        st.dataframe(kpis_comparacao, hide_index=True, use_container_width=True,
+                     column_config={'Média por dia': st.column_config.NumberColumn(format="%.2f"),
+                                    'Acidentes por mil habitantes': st.column_config.NumberColumn(format="%.2f")})
+        col_a, col_b = st.columns(2)
+        with medidor.span('serializacao.comparacao'):
+            for i, fig in enumerate(figuras):
+                (col_a if i % 2 == 0 else col_b).plotly_chart(fig, use_container_width=True)
+
+if comparacao:
+    with st.container():
+        st.subheader("Comparação")
+        exibir(lambda: montar_comparacao(list(comparacao), list(comparacao.values()), medidor), desenhar_comparacao)
+        st.markdown("<br>", unsafe_allow_html=True)
+
 ### Dashboard 1
-# Contagem de acidentes por estado
-df_mapa = df_filtered.groupby("uf").size().reset_index(name="Quantidade de Acidentes") 
+# As figuras de cada painel vêm de painel (modules.painel), guardadas no cache de figuras com a chave das entradas de
+# que dependem; cada seção mede a montagem (figura.*) e o envio (serializacao.*).
+# Abas calculadas sob demanda: só o conteúdo da aba escolhida é montado e enviado ao navegador
+def aba_escolhida(opcoes, key):
+    return st.radio("Aba", opcoes, horizontal=True, key=key, label_visibility="collapsed")
+
+# Cada seção com abas é um fragmento: trocar de aba (ou o detalhe do mapa) reexecuta só a seção, e as figuras das
+# outras seções continuam como estão. Nas reexecuções completas, cada figura vem do cache enquanto as entradas
+# de que ela depende (chave dos filtros, nível de detalhe, versão dos dados) não mudam.
+@st.fragment
+def secao_mapa():
+    aba = aba_escolhida(['Acidentes por Estado', 'Densidade de Acidentes'], 'aba_mapa')
+    if aba == 'Acidentes por Estado':
+        # Criar mapa de calor dos acidentes por estado
+        if geojson is None:
+            st.warning(f"Mapa por estado indisponível: o GeoJSON dos estados não foi encontrado em {CAMINHO_GEOJSON}. "
+                       "Gere a cópia local com `python -m utils.geo`.")
+        else:
+            exibir(lambda: painel.mapa(spec, series, medidor), grafico('mapa'))  # Removido use_container_width=True
+    else:
+        # Nível de detalhe da grade: automático (pela área selecionada) ou o lado da célula em graus
+        opcoes_detalhe = ['Automático'] + [f"{tamanho_nivel(nivel):g}°" for nivel in reversed(range(NIVEIS))]
+        detalhe = st.select_slider("Detalhe do mapa", options=opcoes_detalhe, value='Automático', key='detalhe_densidade')
+        nivel = None if detalhe == 'Automático' else NIVEIS - opcoes_detalhe.index(detalhe)
+        if spec.br is not None:
+            st.caption("A grade de densidade não tem BR nem km: o mapa mostra a seleção sem o filtro de rodovia.")
+        grade = load_grade(DIRETORIO_DADOS, versao_dados)
+        exibir(lambda: painel.densidade(spec, grade, nivel, medidor), grafico('densidade', use_container_width=True))
+
+@st.fragment
+def secao_anos():
+    aba = aba_escolhida(['Acidentes', 'Mortes'], 'aba_anos')
+    # Criar gráfico de linha com altura fixa
+    if aba == 'Acidentes':
+        coluna = 'Quantidade de Acidentes'
+    else:
+        coluna = 'Quantidade de Mortes'
+    exibir(lambda: painel.anos(spec, series, coluna, medidor), grafico('anos', use_container_width=True))
+
+@st.fragment
+def secao_dia_causas():
+    aba = aba_escolhida(['Acidentes por dia da semana', 'Principais causas dos Acidentes'], 'aba_dia_causas')
+    if aba == 'Acidentes por dia da semana':
+        # Agrupar os dados por dia da semana e contar os acidentes
+        exibir(lambda: painel.dia_semana(spec, series, medidor), grafico('dia_semana', use_container_width=True))
+    else: # Gráfico das principais causas dos acidentes
+        exibir(lambda: painel.causas(spec, series, medidor), grafico('causas', use_container_width=True))
+
+@st.fragment
+def secao_tendencia():
+    opcoes = {'Automática': None, **{nome: codigo for codigo, nome in GRANULARIDADES.items()}}
+    escolha = aba_escolhida(list(opcoes), 'granularidade_tendencia')
+    exibir(lambda: painel.tendencia(spec, opcoes[escolha], medidor), grafico('tendencia', use_container_width=True))
+
+# Gráfico e tabela do ranking de trechos no mesmo espaço reservado
+def desenhar_trechos(lugar, resultado):
+    trechos, fig_trechos = resultado
+    with medidor.span('serializacao.trechos'), lugar.container():
+        st.plotly_chart(fig_trechos, use_container_width=True)
+        st.dataframe(trechos, hide_index=True, use_container_width=True,
+                     column_config={'br': 'BR', 'km_inicial': 'km inicial', 'km_final': 'km final', 'ufs': 'UFs',
+                                    'acidentes': 'Acidentes', 'mortos': 'Mortos',
+                                    'acidentes_km': st.column_config.NumberColumn("Acidentes por km", format="%.2f"),
+                                    'mortos_km': st.column_config.NumberColumn("Mortos por km", format="%.2f")})
+
+@st.fragment
+def secao_trechos():
+    st.subheader("Trechos críticos das rodovias")
+    col_tamanho, col_top, col_criterio = st.columns(3)
+    tamanhos = sorted({0.5, 1.0, 2.0, 5.0, 10.0, TAMANHO_TRECHO_KM})
+    tamanho = col_tamanho.select_slider("Tamanho do trecho (km)", options=tamanhos, value=TAMANHO_TRECHO_KM,
+                                        format_func=lambda km: f"{km:g}", key='tamanho_trecho')
+    top = col_top.slider("Quantidade de trechos", 5, 30, TOP_TRECHOS, key='top_trechos')
+    criterio = col_criterio.radio("Ordenar por", list(CRITERIOS_RANKING), format_func=CRITERIOS_RANKING.get,
+                                  horizontal=True, key='criterio_trechos')
+    exibir(lambda: painel.trechos(spec, tamanho, top, criterio, medidor), desenhar_trechos)
+
+@st.fragment
+def secao_habitantes():
+    aba = aba_escolhida(['Acidentes por Habitantes', 'Mortes por Habitantes'], 'aba_habitantes')
+    if aba == 'Acidentes por Habitantes':
+        coluna = 'tx_acidentalidade_1k'
+    else:
+        # Gráfico de mortes por 1k Habitantes
+        coluna = 'tx_mortalidade_1k'
+    exibir(lambda: painel.taxa(coluna, medidor), grafico('taxa_estados', use_container_width=True))
 
 with st.container():
     col1, col2 = st.columns([0.6, 0.4]) 
     
     with col1:
-        # Criar mapa de calor dos acidentes por estado
-        fig_mapa = px.choropleth(
-            df_mapa,
-            geojson=geojson,
-            locations='uf',
-            featureidkey="id",
-            color='Quantidade de Acidentes',
-            color_continuous_scale='sunsetdark',
-            labels={'Quantidade de Acidentes': 'Número de Acidentes'}
-        )
-        
-
-        fig_mapa.update_geos(fitbounds="locations", visible=False, bgcolor='rgba(0,0,0,0)', projection_scale=2.0, projection_type="orthographic" )
-        fig_mapa.update_layout(coloraxis_colorbar_title=None ,height=1000, width=600, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
-                "text": "Quantidade de Acidentes por Estado",
-                "x": 0.5,  # Centraliza o título
-                "y": 0.95,  # Ajusta a posição vertical
-                "xanchor": "right",
-                "yanchor": "top",
-                "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
-            },) # Ajustando altura e largura do gráfico
-
-        col1.plotly_chart(fig_mapa)  # Removido use_container_width=True
+        secao_mapa()
     
     with col2:
         # Criando o gráfico de pizza
-        df_classificacao = df_filtered.groupby("classificacao_acidente").size().reset_index(name="Quantidade por tipo")
-        cores = ["#fcde9c", "#e24c70", "#f58a72"]
-
-        fig_pizza = go.Figure(go.Pie(
-            labels=df_classificacao["classificacao_acidente"],
-            values=df_classificacao["Quantidade por tipo"],
-            marker=dict(colors=cores)
-        ))
-        fig_pizza.update_layout(
-            title={
-                "text": "Quantidade de Acidentes por Classificação",
-                "x": 0.5,
-                "y": 0.95,
-                "xanchor": "center",
-                "yanchor": "top",
-                "font": dict(size=20, family="Arial", color="white")
-            },
-            height=400,
-            paper_bgcolor="#222538",
-            plot_bgcolor="#222538",
-            margin=dict(l=50, r=50, t=100, b=50)  # Ajustando as margens
-        )
-        col2.plotly_chart(fig_pizza)
+        exibir(lambda: painel.pizza(spec, series, medidor), grafico('pizza'))
 
         # Adicionando o gráfico abaixo do gráfico de pizza
         with st.container():
             # Criando o gráfico de barras horizontal
-            df_dias = df_filtered.groupby("fase_dia").size().reset_index(name="Quantidade")
-
-            # Identificar a maior barra
-            maior_barra_index = df_dias["Quantidade"].idxmax()
-
-            # Adicionar o texto de forma condicional para as barras
-            text_position = ['outside'] * len(df_dias)  # Todos os rótulos inicialmente fora
-            text_position[maior_barra_index] = 'inside'  # Alterar o rótulo da maior barra para dentro
-
-            fig_barras = go.Figure(go.Bar(
-                y=df_dias["fase_dia"],
-                x=df_dias["Quantidade"],
-                orientation='h',
-                marker=dict(
-                    color=df_dias["Quantidade"],
-                    colorscale='sunsetdark',
-                    showscale=False
-                ),
-                text=df_dias["Quantidade"],
-                textposition=text_position,  # Aplicar as posições do texto
-            ))
-
-            fig_barras.update_layout(
-                title={
-                    "text": "Quantidade de Acidentes por Fase do Dia",
-                    "x": 0.5,
-                    "y": 0.95,
-                    "xanchor": "center",
-                    "yanchor": "top",
-                    "font": dict(size=20, family="Arial", color="white")
-                },
-                height=585,
-                paper_bgcolor="#222538",
-                plot_bgcolor="#222538",
-                margin=dict(l=100, r=50, t=50, b=100),  # Ajustando as margens
-                bargap=0.2
-            )
-
-            col2.plotly_chart(fig_barras)
-
-# Criar DataFrame com a contagem de acidentes e mortes por ano
-df_anos = (
-    df_filtered.groupby(df_filtered['data_acidente'].dt.year)
-    .agg(acidentes=('data_acidente', 'count'), mortes=('mortos', 'sum'))
-    .reset_index()
-)
-df_anos.columns = ['Ano', 'Quantidade de Acidentes', 'Quantidade de Mortes']
-df_anos.set_index('Ano', inplace=True)
+            exibir(lambda: painel.barras(spec, series, medidor), grafico('barras'))
 
 with st.container():
 
     col3, col4 = st.columns(2)
     with col3:
-        tab1, tab2 = st.tabs(['Acidentes', 'Mortes'])
-        with tab1:
-            # Criar gráfico de linha com altura fixa
-            fig1 = px.line(
-                df_anos,
-                x=df_anos.index,
-                y='Quantidade de Acidentes',
-                markers=True  # Para adicionar marcadores nos pontos
-            )
-            # Ajustar a cor da linha manualmente
-            fig1.update_traces(line=dict(color='#fcde9c'), marker=dict(color='#fcde9c'))
-
-            # Calcular a média de acidentes
-            media_acidentes = df_anos['Quantidade de Acidentes'].mean()
-
-            # Adicionar linha horizontal da média
-            fig1.add_hline(
-                y=media_acidentes,
-                line_dash="dash",  # Linha tracejada
-                line_color="#fcde9c",  # Cor branca para contraste
-                annotation_text=f"Média: {media_acidentes:.1f}",
-                annotation_position="top left",
-                annotation_font=dict(size=14, color="#fcde9c")
-            )
-
-            fig1.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
-                "text": "Evolução de Acidentes por Ano",
-                "x": 0.5,  # Centraliza o título
-                "y": 0.95,  # Ajusta a posição vertical
-                "xanchor": "center",
-                "yanchor": "top",
-                "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
-            })  # Altura fixa
-
-            st.plotly_chart(fig1, use_container_width=True)
-        with tab2:
-            # Criar gráfico de linha com altura fixa
-            fig3 = px.line(
-                df_anos,
-                x=df_anos.index,
-                y='Quantidade de Mortes',
-                markers=True  # Para adicionar marcadores nos pontos
-            )
-            # Ajustar a cor da linha manualmente
-            fig3.update_traces(line=dict(color='#e24c70'), marker=dict(color='#e24c70'))
-
-            # Calcular a média de mortes
-            media_mortes = df_anos['Quantidade de Mortes'].mean()
-
-            # Adicionar linha horizontal da média
-            fig3.add_hline(
-                y=media_mortes,
-                line_dash="dash",  # Linha tracejada
-                line_color="#e24c70",  # Cor branca para contraste
-                annotation_text=f"Média: {media_mortes:.1f}",
-                annotation_position="top left",
-                annotation_font=dict(size=14, color="#e24c70")
-            )
-
-            fig3.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
-                "text": "Evolução de Mortes por Ano",
-                "x": 0.5,  # Centraliza o título
-                "y": 0.95,  # Ajusta a posição vertical
-                "xanchor": "center",
-                "yanchor": "top",
-                "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
-            })  # Altura fixa
-
-            st.plotly_chart(fig3, use_container_width=True)
+        secao_anos()
     with col4:
-        tab3, tab4 = st.tabs(['Acidentes por dia da semana', 'Principais causas dos Acidentes'])
-        with tab3:
-            # Agrupar os dados por dia da semana e contar os acidentes
-            day_accidents = df_filtered['dia_semana'].value_counts().reset_index()
-            day_accidents.columns = ['dia_semana', 'accident_count']
-
-            # Ordenar os dias corretamente
-            dias_ordenados = ["segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo"]
-            day_accidents['dia_semana'] = pd.Categorical(day_accidents['dia_semana'], categories=dias_ordenados, ordered=True)
-            day_accidents = day_accidents.sort_values('dia_semana')
-
-            fig2 = px.bar(
-                day_accidents, 
-                x='dia_semana', 
-                y='accident_count', 
-                text='accident_count', 
-                color='accident_count',
-                color_continuous_scale='sunsetdark', 
-                labels={'dia_semana': 'Dia da Semana', 'accident_count': 'Número de Acidentes'} 
-            )
-
-            fig2.update_traces(textposition='outside')
-            fig2.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
-                "text": "Frequência de acidentes por dia da semana",
-                "x": 0.5,  # Centraliza o título
-                "y": 0.95,  # Ajusta a posição vertical
-                "xanchor": "center",
-                "yanchor": "top",
-                "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
-            })  # Altura fixa
-            st.plotly_chart(fig2, use_container_width=True)
-        
-        with tab4: # Gráfico das principais causas dos acidentes
-            
-            # Encontrar as 5 principais causas
-            top_5_causas = df_filtered['causa_acidente'].value_counts().head(5)
-
-            # Criar o gráfico de barras
-            fig_causas = px.bar(
-                top_5_causas,
-                y = top_5_causas.index, # Causas dos acidentes
-                x = top_5_causas.values, # Quantidade de acidentes
-                labels = {'x': 'Causas', 'y': 'Quantidade de Acidentes'},  # Rótulos dos eixos
-                title = 'Top 5 Causas de Acidentes',  # Título do gráfico
-                text_auto = True,
-                color_discrete_sequence=px.colors.sequential.Sunset  # Usando uma paleta de cores personalizada
-                # color = top_5_causas.index,  # Colorir barras por causa do acidente
-                , orientation='h'
-            )
-
-            # Adicionar o texto de forma condicional para as barras
-            text_position_causas = ['outside'] * len(top_5_causas)  # Todos os rótulos inicialmente fora
-            text_position_causas[0] = 'inside'  # Alterar o rótulo da maior barra para dentro
-
-            # Removendo a legenda
-            fig_causas.update_traces(textposition=text_position_causas)
-
-            # Ajustando o layout do gráfico
-            fig_causas.update_layout(
-                height=500,
-                paper_bgcolor="#222538",
-                plot_bgcolor="#222538",
-                font=dict(color="white"),
-                title={
-                    "x": 0.5,  # Centraliza o título
-                    "y": 0.95,
-                    "xanchor": "center",
-                    "yanchor": "top",
-                    "font": dict(size=20, family="Arial", color="white")
-                }
-            )
-
-            # Exibir o gráfico no Streamlit
-            st.plotly_chart(fig_causas, use_container_width=True)
+        secao_dia_causas()
 
 with st.container():
-    tab5, tab6 = st.tabs(['Acidentes por Habitantes', 'Mortes por Habitantes'])
-
-    with tab5:
-        # Criar gráfico de linha com altura fixa
-        fig_acidentes = px.line(
-            estados,
-            x='sigla',
-            y='tx_acidentalidade_1k',
-            markers=True  # Para adicionar marcadores nos pontos
-        )
-        # Ajustar a cor da linha manualmente
-        fig_acidentes.update_traces(line=dict(color='#fcde9c'), marker=dict(color='#fcde9c'))
-
-        # Calcular a média de mortes
-        media_tx_acid = estados["tx_acidentalidade_1k"].mean()
-
-        # Adicionar linha horizontal da média
-        fig_acidentes.add_hline(
-            y=media_tx_acid,
-            line_dash="dash",  # Linha tracejada
-            line_color="#fcde9c",  # Cor branca para contraste
-            annotation_text=f"Média: {media_tx_acid:.2f}",
-            annotation_position="top left",
-            annotation_font=dict(size=14, color="#fcde9c")
-        )
+    secao_tendencia()
 
-        fig_acidentes.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
-            "text": "Taxa de acidentalidade em BRs per capita",
-            "x": 0.5,  # Centraliza o título
-            "y": 0.95,  # Ajusta a posição vertical
-            "xanchor": "center",
-            "yanchor": "top",
-            "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
-        },
-        xaxis_title="Estado (UF)",  # Título do eixo X
-        yaxis_title="Taxa de Acidentalidade por mil Habitantes",  # Título do eixo Y
-        font=dict(color="white")
-        )
-
-        st.plotly_chart(fig_acidentes, use_container_width=True)
-
-    with tab6:
-        # Gráfico de mortes por 1k Habitantes
-        fig_mortes = px.line(
-            estados,
-            x='sigla',
-            y='tx_mortalidade_1k',
-            markers=True  # Para adicionar marcadores nos pontos
-        )
-        # Ajustar a cor da linha manualmente
-        fig_mortes.update_traces(line=dict(color='#e24c70'), marker=dict(color='#e24c70'))
-
-        # Calcular a média de mortes
-        media_tx_mort = estados["tx_mortalidade_1k"].mean()
-
-        # Adicionar linha horizontal da média
-        fig_mortes.add_hline(
-            y=media_tx_mort,
-            line_dash="dash",  # Linha tracejada
-            line_color="#e24c70",  # Cor branca para contraste
-            annotation_text=f"Média: {media_tx_mort:.2f}",
-            annotation_position="top left",
-            annotation_font=dict(size=14, color="#e24c70")
-        )
-
-        fig_mortes.update_layout(height=500, paper_bgcolor="#222538", plot_bgcolor="#222538", title={
-            "text": "Taxa de mortalidade por acidentes em BRs per capita",
-            "x": 0.5,  # Centraliza o título
-            "y": 0.95,  # Ajusta a posição vertical
-            "xanchor": "center",
-            "yanchor": "top",
-            "font": dict(size=20, family="Arial", color="white")  # Aumentando tamanho e mudando fonte
-        },
-        xaxis_title="Estado (UF)",  # Título do eixo X
-        yaxis_title="Taxa de Mortalidade por acidentes por mil Habitantes",  # Título do eixo Y
-        font=dict(color="white")
-        )
+with st.container():
+    secao_trechos()
 
-        st.plotly_chart(fig_mortes, use_container_width=True)
\ No newline at end of file
+with st.container():
+    secao_habitantes()
+
+# Preencher os espaços reservados à medida que as figuras ficam prontas; daqui em diante (reexecuções de fragmento)
+# as figuras são enviadas na hora
+with medidor.span('figuras.espera'):
+    desenhar_prontas(espera=True)
+adiar_figuras = False
+
+# Tempo total da execução e exportação periódica dos percentis
+medidor.finalizar()
+registro.exportar_se_necessario()
+
+if debug:
+    with painel_debug:
+        st.subheader("Tempos desta execução")
+        spans = pd.DataFrame(medidor.spans, columns=['etapa', 'ms'])
+        spans['ms'] = spans['ms'] * 1000
+        st.dataframe(spans, hide_index=True, use_container_width=True)
+
+        st.subheader("Percentis (janela móvel)")
+        percentis = pd.DataFrame.from_dict(registro.percentis(), orient='index')
+        percentis[['p50', 'p95']] = percentis[['p50', 'p95']] * 1000
+        st.dataframe(percentis[['p50', 'p95', 'contagem']].rename(columns={'p50': 'p50 ms', 'p95': 'p95 ms'}),
+                     use_container_width=True)
+
+        st.subheader("Cache de figuras")
+        st.json(cache_figuras.estatisticas())
+
+        st.subheader("Aquecimento")
+        st.json(aquecimento.estado())
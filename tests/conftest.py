@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dados import ingerir
+
+MUNICIPIOS = {'MG': ['BETIM', 'CONTAGEM'], 'RJ': ['NITEROI', 'RESENDE'], 'SP': ['CAMPINAS', 'REGISTRO', 'BETIM']}
+
+
+# CSV no formato da PRF (datas e horários separados, vírgula decimal nas coordenadas e no km), ordenado por data,
+# de novembro de 2019 a fevereiro de 2020: três UFs (com um município de mesmo nome em duas delas), linhas sem BR
+# e linhas com BR sem km
+def gravar_csv_sintetico(caminho, quantidade=3000, semente=0):
+    rng = np.random.default_rng(semente)
+    segundos = np.sort(rng.integers(0, 120 * 86400, quantidade))
+    datas = pd.Timestamp('2019-11-01') + pd.to_timedelta(segundos, unit='s')
+    ufs = rng.choice(list(MUNICIPIOS), quantidade)
+    municipios = [MUNICIPIOS[uf][i % len(MUNICIPIOS[uf])] for i, uf in zip(rng.integers(0, 6, quantidade), ufs)]
+    br = rng.choice([0, 101, 116, 381], quantidade, p=[0.1, 0.3, 0.4, 0.2])
+    km = rng.uniform(0, 400, quantidade).round(1)
+    mortos = rng.poisson(0.3, quantidade)
+
+    def virgula(valores):
+        return [f"{valor:.6f}".replace(".", ",") for valor in valores]
+
+    df = pd.DataFrame({
+        'data_inversa': datas.strftime('%Y-%m-%d'),
+        'horario': datas.strftime('%H:%M:%S'),
+        'uf': ufs,
+        'municipio': municipios,
+        'br': np.where(br == 0, '', br.astype(str)),
+        'km': np.where(rng.random(quantidade) < 0.05, '', virgula(km)),
+        'causa_acidente': rng.choice(['Velocidade', 'Sono', 'Animais na Pista'], quantidade),
+        'classificacao_acidente': np.where(mortos > 0, 'Com Vítimas Fatais',
+                                           rng.choice(['Com Vítimas Feridas', 'Sem Vítimas'], quantidade)),
+        'fase_dia': rng.choice(['Pleno dia', 'Plena Noite', 'Anoitecer'], quantidade),
+        'dia_semana': datas.day_name(),
+        'mortos': mortos,
+        'latitude': virgula(rng.uniform(-23, -19, quantidade)),
+        'longitude': virgula(rng.uniform(-48, -42, quantidade)),
+    })
+    df.to_csv(caminho, index=False)
+    return caminho
+
+
+# Armazenamento particionado pequeno (4 partições mensais), compartilhado pelos testes que só o leem
+@pytest.fixture(scope='session')
+def particoes(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp('dados')
+    ingerir(str(gravar_csv_sintetico(pasta / 'acidentes.csv')), str(pasta / 'particoes'))
+    return str(pasta / 'particoes')
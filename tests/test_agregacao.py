@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.agregacao import DIMENSOES_AGREGADAS, TabelaCodificada, agregar, agregar_grupos
+from utils.filtros import FiltroIndexado
+
+CATEGORIAS = {
+    'uf': ['MG', 'RJ', 'SP'],
+    'municipio': ['A', 'B', 'C', 'D'],
+    'classificacao_acidente': ['Com Vítimas Fatais', 'Com Vítimas Feridas', 'Sem Vítimas'],
+    'fase_dia': ['Anoitecer', 'Pleno dia', 'Plena Noite'],
+    'dia_semana': ['domingo', 'segunda-feira', 'sábado'],
+    'causa_acidente': [f'causa {i}' for i in range(8)],
+}
+
+
+# Linhas sintéticas ordenadas por data (2019 a 2021), com ~10% de categorias nulas em cada coluna
+def linhas_sinteticas(quantidade=3000, semente=0):
+    rng = np.random.default_rng(semente)
+    segundos = np.sort(rng.integers(0, 3 * 365 * 86400, quantidade))
+    df = pd.DataFrame({'data_acidente': pd.Timestamp('2019-01-01') + pd.to_timedelta(segundos, unit='s')})
+    for coluna, categorias in CATEGORIAS.items():
+        codigos = rng.integers(0, len(categorias), quantidade)
+        codigos[rng.random(quantidade) < 0.1] = -1
+        df[coluna] = pd.Categorical.from_codes(codigos, categories=categorias)
+    df['mortos'] = rng.poisson(0.3, quantidade).astype('int16')
+    return df
+
+
+# Referência ingênua: groupby do pandas sobre as linhas selecionadas (categorias nulas ficam de fora das séries)
+def agregar_ingenuo(linhas):
+    esperado = {
+        'kpis': {
+            'acidentes': len(linhas),
+            'mortos': int(linhas['mortos'].sum()),
+            'acidentes_fatais': int((linhas['mortos'] != 0).sum()),
+        },
+        'series': {},
+    }
+    for dimensao in DIMENSOES_AGREGADAS:
+        grupos = linhas.groupby(dimensao, observed=True)['mortos']
+        esperado['series'][dimensao] = pd.DataFrame({'acidentes': grupos.size(), 'mortos': grupos.sum()})
+    grupos = linhas.groupby(linhas['data_acidente'].dt.year)['mortos']
+    esperado['series']['ano'] = pd.DataFrame({'acidentes': grupos.size(), 'mortos': grupos.sum()})
+    return esperado
+
+
+def conferir(resultado, esperado):
+    for medida, valor in esperado['kpis'].items():
+        assert resultado['kpis'][medida] == valor
+    for dimensao in DIMENSOES_AGREGADAS:
+        serie = resultado['series'][dimensao].set_index(dimensao)
+        referencia = esperado['series'][dimensao]
+        assert list(serie.index) == list(referencia.index)
+        assert serie['acidentes'].tolist() == referencia['acidentes'].tolist()
+        assert serie['mortos'].tolist() == referencia['mortos'].tolist()
+    anos = resultado['series']['ano']
+    assert anos.index.tolist() == esperado['series']['ano'].index.tolist()
+    assert anos['acidentes'].tolist() == esperado['series']['ano']['acidentes'].tolist()
+    assert anos['mortos'].tolist() == esperado['series']['ano']['mortos'].tolist()
+
+
+@pytest.fixture(scope='module')
+def linhas():
+    return linhas_sinteticas()
+
+
+@pytest.fixture(scope='module')
+def tabela(linhas):
+    return TabelaCodificada(linhas, 'data_acidente')
+
+
+@pytest.fixture(scope='module')
+def filtro(linhas):
+    return FiltroIndexado(linhas, 'data_acidente')
+
+
+# (UF, município, início, fim); a última seleção não tem nenhuma linha
+SELECOES = [
+    (None, None, None, None),
+    ('SP', None, None, None),
+    ('RJ', 'B', '2020-03-01', '2020-09-30'),
+    (None, None, '2021-02-10', '2021-02-10'),
+    ('MG', None, '2030-01-01', '2030-12-31'),
+]
+
+
+def selecionar_ingenuo(linhas, uf, municipio, inicio, fim):
+    mascara = np.ones(len(linhas), dtype=bool)
+    if uf is not None:
+        mascara &= (linhas['uf'] == uf).to_numpy()
+    if municipio is not None:
+        mascara &= (linhas['municipio'] == municipio).to_numpy()
+    dias = linhas['data_acidente'].dt.normalize()
+    if inicio is not None:
+        mascara &= (dias >= pd.Timestamp(inicio)).to_numpy()
+    if fim is not None:
+        mascara &= (dias <= pd.Timestamp(fim)).to_numpy()
+    return linhas[mascara]
+
+
+@pytest.mark.parametrize('selecao', SELECOES)
+def test_agregar_igual_ao_groupby(linhas, tabela, filtro, selecao):
+    resultado = agregar(tabela, filtro.posicoes(*selecao))
+    conferir(resultado, agregar_ingenuo(selecionar_ingenuo(linhas, *selecao)))
+
+
+def test_agregar_grupos_igual_ao_agregar(linhas, tabela, filtro):
+    grupos = [filtro.posicoes(*selecao) for selecao in SELECOES]
+    resultados = agregar_grupos(tabela, grupos)
+    assert len(resultados) == len(SELECOES)
+    for resultado, selecao in zip(resultados, SELECOES):
+        conferir(resultado, agregar_ingenuo(selecionar_ingenuo(linhas, *selecao)))
+
+
+def test_selecao_vazia(tabela):
+    resultado = agregar(tabela, np.empty(0, dtype=np.intp), dias=0, populacao=1000)
+    assert resultado['kpis'] == {'acidentes': 0, 'mortos': 0, 'acidentes_fatais': 0, 'media_dia': None,
+                                 'tx_acidentes_1k': 0.0}
+    assert all(len(serie) == 0 for serie in resultado['series'].values())
+    assert agregar_grupos(tabela, []) == []
+
+
+# O dia final entra inteiro: um acidente às 23:59 do último dia está na seleção
+def test_data_final_inclusiva():
+    df = pd.DataFrame({'data_acidente': pd.to_datetime(['2020-01-01 00:00', '2020-01-31 23:59', '2020-02-01 00:00'])})
+    for coluna, categorias in CATEGORIAS.items():
+        df[coluna] = pd.Categorical.from_codes([0, 0, 0], categories=categorias)
+    df['mortos'] = np.array([1, 2, 4], dtype='int16')
+    posicoes = FiltroIndexado(df, 'data_acidente').posicoes(inicio='2020-01-01', fim='2020-01-31')
+    resultado = agregar(TabelaCodificada(df, 'data_acidente'), posicoes, dias=31)
+    assert resultado['kpis']['acidentes'] == 2
+    assert resultado['kpis']['mortos'] == 3
+
+
+# Linhas com categoria nula contam nos totais, mas não aparecem nas séries da dimensão
+def test_categorias_nulas(linhas, tabela):
+    resultado = agregar(tabela)
+    nulas = linhas['causa_acidente'].isna()
+    assert nulas.any()
+    assert resultado['kpis']['acidentes'] == len(linhas)
+    assert resultado['series']['causa_acidente']['acidentes'].sum() == (~nulas).sum()
+
+
+def test_principais_causas(linhas, tabela):
+    resultado = agregar(tabela, top_causas=3)
+    esperado = linhas['causa_acidente'].value_counts(sort=False).nlargest(3)
+    assert resultado['series']['causas'].index.tolist() == esperado.index.tolist()
+    assert resultado['series']['causas'].tolist() == esperado.tolist()
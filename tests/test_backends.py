@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from utils.backends import MotorDuckDB, diferencas
+from utils.config import MAX_SELECOES_COMPARACAO
+from utils.consultas import FiltroSpec, MotorConsultas, especificacoes_padrao
+
+# Seleções além do lote padrão: município (inclusive o mesmo nome em outra UF), intervalos que começam e terminam
+# no meio de semanas e meses, BR inteira, trecho de km, BR na UF e seleções vazias
+SELECOES = [
+    FiltroSpec('SP', 'BETIM'),
+    FiltroSpec('MG', 'BETIM', '2019-11-20', '2020-01-10'),
+    FiltroSpec('RJ', 'NITEROI', '2020-02-01', '2020-02-01'),
+    FiltroSpec(None, None, '2019-12-03', '2020-02-12'),
+    FiltroSpec(br=116),
+    FiltroSpec(br=101, km_inicio=50, km_fim=220.5),
+    FiltroSpec(br=381, km_inicio=100),
+    FiltroSpec('SP', None, '2020-01-01', None, 116, None, 300),
+    FiltroSpec('MG', 'CONTAGEM', None, None, 101),
+    FiltroSpec('SP', 'INEXISTENTE'),
+    FiltroSpec(br=9999),
+]
+
+
+@pytest.fixture(scope='module')
+def motores(particoes):
+    return MotorConsultas(particoes), MotorDuckDB(particoes)
+
+
+@pytest.fixture(scope='module')
+def especificacoes(motores):
+    return especificacoes_padrao(motores[0]) + SELECOES
+
+
+def test_consultar(motores, especificacoes):
+    pandas_, duckdb_ = motores
+    for spec in especificacoes:
+        assert diferencas(pandas_.consultar(spec), duckdb_.consultar(spec)) == [], spec
+
+
+# Comparações em lotes do tamanho máximo da interface (só com o cubo, só com BR e misturados)
+def test_comparar(motores, especificacoes):
+    pandas_, duckdb_ = motores
+    for inicio in range(0, len(especificacoes), MAX_SELECOES_COMPARACAO):
+        lote = especificacoes[inicio:inicio + MAX_SELECOES_COMPARACAO]
+        for spec, resultado_a, resultado_b in zip(lote, pandas_.comparar(lote), duckdb_.comparar(lote)):
+            assert diferencas(resultado_a, resultado_b) == [], spec
+
+
+@pytest.mark.parametrize('granularidade', [None, 'D', 'W', 'M'])
+def test_tendencia(motores, especificacoes, granularidade):
+    pandas_, duckdb_ = motores
+    for spec in especificacoes:
+        serie_a, serie_b = pandas_.tendencia(spec, granularidade), duckdb_.tendencia(spec, granularidade)
+        assert serie_a['granularidade'] == serie_b['granularidade']
+        for nome in ['acidentes', 'mortos']:
+            pd.testing.assert_frame_equal(serie_a[nome].reset_index(drop=True), serie_b[nome].reset_index(drop=True))
+
+
+@pytest.mark.parametrize('tamanho, criterio', [(1.0, 'mortos'), (5.0, 'acidentes')])
+def test_ranking(motores, especificacoes, tamanho, criterio):
+    pandas_, duckdb_ = motores
+    for spec in [FiltroSpec()] + [spec for spec in especificacoes if spec.br is not None or spec.uf == 'SP']:
+        pd.testing.assert_frame_equal(pandas_.ranking(spec, tamanho, criterio=criterio),
+                                      duckdb_.ranking(spec, tamanho, criterio=criterio))
+
+
+# Os controles da barra lateral (BRs de cada UF e km de cada BR) vêm do mesmo manifesto nos dois motores
+def test_rodovias(motores):
+    pandas_, duckdb_ = motores
+    for uf in [None, 'MG', 'RJ', 'SP']:
+        assert pandas_.rodovias_por_uf(uf) == duckdb_.rodovias_por_uf(uf)
+    for br in pandas_.rodovias_por_uf():
+        assert pandas_.limites_km(br) == duckdb_.limites_km(br)
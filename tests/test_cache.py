@@ -0,0 +1,96 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.cache import CacheLRU
+
+
+# Referência: lista em ordem de uso (o mais antigo primeiro); o item novo entra no fim, saem os mais antigos do
+# mesmo tipo acima do limite do tipo e depois os mais antigos no geral
+class LRUIngenuo:
+    def __init__(self, tamanho_maximo, limites_por_tipo):
+        self.tamanho_maximo = tamanho_maximo
+        self.limites_por_tipo = limites_por_tipo
+        self.itens = []
+
+    def obter(self, chave):
+        if chave in self.itens:
+            self.itens.remove(chave)
+            self.itens.append(chave)
+            return True
+        self.itens.append(chave)
+        limite = self.limites_por_tipo.get(chave[0])
+        do_tipo = [item for item in self.itens if item[0] == chave[0]]
+        if limite is not None:
+            for antiga in do_tipo[:max(0, len(do_tipo) - limite)]:
+                self.itens.remove(antiga)
+        while len(self.itens) > self.tamanho_maximo:
+            self.itens.pop(0)
+        return False
+
+
+@pytest.mark.parametrize('semente', range(5))
+def test_igual_ao_lru_ingenuo(semente):
+    rng = random.Random(semente)
+    limites = {'mapa': 2, 'densidade': 3}
+    cache = CacheLRU(8, limites_por_tipo=limites)
+    referencia = LRUIngenuo(8, limites)
+    acertos = 0
+    for _ in range(2000):
+        chave = (rng.choice(['mapa', 'densidade', 'pizza', 'barras']), rng.randrange(6))
+        valor = cache.obter(chave, lambda chave=chave: ('figura',) + chave)
+        assert valor == ('figura',) + chave
+        acertos += referencia.obter(chave)
+        assert list(cache._itens) == referencia.itens
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (acertos, 2000 - acertos)
+    por_tipo = {}
+    for tipo, _ in referencia.itens:
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
+    assert estatisticas['itens_por_tipo'] == por_tipo
+    assert estatisticas['itens_por_tipo'].get('mapa', 0) <= 2 and estatisticas['itens_por_tipo'].get('densidade', 0) <= 3
+
+
+# O limite de um tipo só remove itens desse tipo, mesmo que outros tenham sido usados há mais tempo
+def test_limite_por_tipo_nao_remove_outros_tipos():
+    cache = CacheLRU(10, limites_por_tipo={'mapa': 2})
+    cache.obter(('pizza', 1), lambda: 'p')
+    for i in range(4):
+        cache.obter(('mapa', i), lambda: 'm')
+    assert list(cache._itens) == [('pizza', 1), ('mapa', 2), ('mapa', 3)]
+
+
+# Usar um item o torna o mais recente: o limite geral remove o usado há mais tempo
+def test_uso_renova_o_item():
+    cache = CacheLRU(2)
+    construidos = []
+    cache.obter(('a',), lambda: construidos.append('a'))
+    cache.obter(('b',), lambda: construidos.append('b'))
+    cache.obter(('a',), lambda: construidos.append('a'))
+    cache.obter(('c',), lambda: construidos.append('c'))
+    assert ('a',) in cache and ('b',) not in cache and len(cache) == 2
+    assert construidos == ['a', 'b', 'c']
+    cache.limpar()
+    assert len(cache) == 0 and cache.estatisticas()['itens_por_tipo'] == {}
+
+
+# Muitas threads ao mesmo tempo: os contadores fecham e os limites continuam valendo
+def test_threads_simultaneas():
+    cache = CacheLRU(16, limites_por_tipo={'mapa': 4})
+    barreira = threading.Barrier(8)
+
+    def sessao(semente):
+        rng = random.Random(semente)
+        barreira.wait()
+        for _ in range(500):
+            chave = (rng.choice(['mapa', 'pizza']), rng.randrange(20))
+            assert cache.obter(chave, lambda: chave) == chave
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(sessao, range(8)))
+    estatisticas = cache.estatisticas()
+    assert estatisticas['acertos'] + estatisticas['falhas'] == 8 * 500
+    assert len(cache) <= 16 and estatisticas['itens_por_tipo'].get('mapa', 0) <= 4
+    assert sum(estatisticas['itens_por_tipo'].values()) == len(cache)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import gravar_csv_sintetico
+from utils import dados
+from utils.dados import (COLUNAS_CATEGORICAS, VERSAO_ESQUEMA, carregar_particoes, hash_arquivo, ingerir, ler_csv,
+                         ler_manifesto, ler_origem, versao_manifesto)
+
+
+@pytest.fixture(scope='module')
+def csv(tmp_path_factory):
+    return str(gravar_csv_sintetico(tmp_path_factory.mktemp('origem') / 'acidentes.csv'))
+
+
+# O CSV da PRF sai com os tipos definitivos: categorias, inteiros pequenos, coordenadas e km com vírgula decimal
+# em float32 (inválidos como NaN), BR 0 quando ausente e a data montada a partir de data e horário
+def test_ler_csv_tipos(csv):
+    df = ler_csv(csv)
+    bruto = pd.read_csv(csv, dtype=str, keep_default_na=False)
+    for coluna in COLUNAS_CATEGORICAS:
+        assert isinstance(df[coluna].dtype, pd.CategoricalDtype)
+        assert df[coluna].astype(str).tolist() == bruto[coluna].tolist()
+    assert df['mortos'].dtype == np.int16 and df['br'].dtype == np.int16
+    assert df['latitude'].dtype == df['longitude'].dtype == df['km'].dtype == np.float32
+    assert df['data_acidente'].tolist() == pd.to_datetime(bruto['data_inversa'] + ' ' + bruto['horario']).tolist()
+    assert (df['br'] == 0).tolist() == (bruto['br'] == '').tolist()
+    assert df['km'].isna().tolist() == (bruto['km'] == '').tolist()
+    km = pd.to_numeric(bruto['km'].str.replace(',', '.'), errors='coerce').astype(np.float32)
+    assert np.array_equal(df['km'], km, equal_nan=True)
+    assert 'data_inversa' not in df.columns and 'horario' not in df.columns
+
+
+# O CSV dentro de um .tar.gz ou de um .zip é lido igual ao CSV direto
+@pytest.mark.parametrize('extensao', ['.tar.gz', '.zip'])
+def test_ler_origem_compactada(csv, tmp_path, extensao):
+    compactado = str(tmp_path / f'acidentes{extensao}')
+    if extensao == '.zip':
+        with zipfile.ZipFile(compactado, 'w') as arquivo_zip:
+            arquivo_zip.write(csv, 'dados/acidentes.csv')
+    else:
+        with tarfile.open(compactado, 'w:gz') as tar:
+            tar.add(csv, 'dados/acidentes.csv')
+    assert ler_origem(compactado).equals(ler_csv(csv))
+
+
+def test_hash_arquivo_em_blocos(csv):
+    with open(csv, 'rb') as f:
+        esperado = hashlib.sha256(f.read()).hexdigest()
+    assert hash_arquivo(csv, tamanho_bloco=1000) == esperado
+
+
+# As partições gravadas devolvem as mesmas linhas e tipos do CSV, em ordem de data, e o manifesto registra as
+# linhas e o intervalo de cada mês
+def test_particoes_iguais_ao_csv(csv, tmp_path):
+    diretorio = str(tmp_path / 'particoes')
+    ingerir(csv, diretorio)
+    esperado = ler_csv(csv).sort_values('data_acidente', kind='stable', ignore_index=True)
+    df = carregar_particoes(diretorio)[esperado.columns]
+    for coluna in COLUNAS_CATEGORICAS:
+        assert df[coluna].astype(str).tolist() == esperado[coluna].astype(str).tolist()
+    outras = [coluna for coluna in esperado.columns if coluna not in COLUNAS_CATEGORICAS]
+    assert df[outras].equals(esperado[outras])
+
+    particoes = ler_manifesto(diretorio)['particoes']
+    meses = esperado['data_acidente'].dt.to_period('M').astype(str)
+    assert sorted(particoes) == sorted(meses.unique())
+    for mes, info in particoes.items():
+        do_mes = esperado.loc[meses == mes, 'data_acidente']
+        assert info['linhas'] == len(do_mes)
+        assert (pd.Timestamp(info['inicio']), pd.Timestamp(info['fim'])) == (do_mes.iloc[0], do_mes.iloc[-1])
+
+
+# Arquivos das partições com a data de modificação de cada um
+def arquivos_particoes(diretorio):
+    return {str(caminho.relative_to(diretorio)): caminho.stat().st_mtime_ns
+            for caminho in sorted(pathlib.Path(diretorio).glob('ano=*/mes=*/*.parquet'))}
+
+
+# Ingerir de novo o mesmo arquivo, o mesmo arquivo tocado ou uma cópia com outro nome não regrava nenhuma partição
+# e mantém a versão; um arquivo com um mês já ingerido substitui só esse mês
+def test_ingestao_idempotente(csv, tmp_path):
+    diretorio = str(tmp_path / 'particoes')
+    versao = ingerir(csv, diretorio)
+    arquivos = arquivos_particoes(diretorio)
+    assert ingerir(csv, diretorio) == versao
+
+    tocado = shutil.copy2(csv, tmp_path / 'copia.csv')
+    os.utime(tocado, (1, 1))
+    assert ingerir(str(tocado), diretorio) == versao
+    assert arquivos_particoes(diretorio) == arquivos
+    assert len(ler_manifesto(diretorio)['fontes']) == 1
+
+    # Dezembro de novo, com outro conteúdo: versão nova, só os arquivos de dezembro mudam
+    df = pd.read_csv(csv, dtype=str, keep_default_na=False)
+    dezembro = df[df['data_inversa'].str.startswith('2019-12')].iloc[::2]
+    dezembro.to_csv(tmp_path / 'dezembro.csv', index=False)
+    nova_versao = ingerir(str(tmp_path / 'dezembro.csv'), diretorio)
+    assert nova_versao != versao
+    mudaram = {nome for nome, mtime in arquivos_particoes(diretorio).items() if arquivos[nome] != mtime}
+    assert mudaram == {os.path.join('ano=2019', 'mes=12', nome) for nome in ('acidentes.parquet', 'cubo.parquet')}
+    manifesto = ler_manifesto(diretorio)
+    assert manifesto['particoes']['2019-12']['linhas'] == len(dezembro)
+    assert manifesto['particoes']['2020-01']['linhas'] == (df['data_inversa'].str.startswith('2020-01')).sum()
+    assert versao_manifesto(manifesto) == nova_versao
+
+
+# Sem o arquivo de origem vale o manifesto existente; sem manifesto, erro
+def test_ingestao_sem_origem(csv, tmp_path):
+    diretorio = str(tmp_path / 'particoes')
+    with pytest.raises(FileNotFoundError):
+        ingerir(str(tmp_path / 'inexistente.csv'), diretorio)
+    versao = ingerir(csv, diretorio)
+    assert ingerir(str(tmp_path / 'inexistente.csv'), diretorio) == versao
+
+
+# Um manifesto de outra versão do esquema (ou corrompido) faz a ingestão reconstruir as partições
+def test_manifesto_de_outro_esquema(csv, tmp_path):
+    diretorio = str(tmp_path / 'particoes')
+    versao = ingerir(csv, diretorio)
+    caminho = os.path.join(diretorio, 'manifesto.json')
+    with open(caminho, encoding='utf-8') as f:
+        manifesto = json.load(f)
+    manifesto['versao_esquema'] = VERSAO_ESQUEMA - 1
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f)
+    assert ingerir(csv, diretorio) == versao
+    assert ler_manifesto(diretorio)['versao_esquema'] == VERSAO_ESQUEMA
+
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write('{')
+    assert ingerir(csv, diretorio) == versao
+
+
+# Ingestões simultâneas do mesmo arquivo: uma lê e grava, as outras esperam e encontram o arquivo já ingerido
+def test_ingestoes_simultaneas(csv, tmp_path, monkeypatch):
+    diretorio = str(tmp_path / 'particoes')
+    leituras = []
+
+    def ler_devagar(caminho):
+        leituras.append(caminho)
+        time.sleep(0.2)
+        return ler_origem(caminho)
+
+    monkeypatch.setattr(dados, 'ler_origem', ler_devagar)
+    with ThreadPoolExecutor(4) as pool:
+        versoes = list(pool.map(lambda _: ingerir(csv, diretorio), range(4)))
+    assert len(set(versoes)) == 1 and len(leituras) == 1
+    assert len(ler_manifesto(diretorio)['fontes']) == 1
+    assert not list(pathlib.Path(diretorio).rglob('*.tmp'))
+    assert len(carregar_particoes(diretorio)) == len(ler_csv(csv))
@@ -0,0 +1,101 @@
+import os
+import time
+
+import numpy as np
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import pytest
+
+from utils import exportacao
+from utils.consultas import FiltroSpec
+from utils.dados import carregar_particoes
+from utils.exportacao import Exportador
+from utils.filtros import FiltroIndexado
+from utils.rodovias import IndiceRodovias
+
+SELECOES = [
+    FiltroSpec(),
+    FiltroSpec('SP'),
+    FiltroSpec('SP', 'BETIM', '2019-12-10', '2020-01-20'),
+    FiltroSpec(None, None, '2019-12-31', '2020-01-01'),
+    FiltroSpec('MG', None, None, None, 116),
+    FiltroSpec(None, None, '2020-01-01', None, 101, 10, 200),
+    FiltroSpec('RJ', None, None, None, 381, 100.5, None),
+    FiltroSpec(None, None, None, None, 116, None, 50.5),
+    FiltroSpec('XX'),
+    FiltroSpec(None, None, None, None, 9999),
+    FiltroSpec('RJ', None, '2030-01-01'),
+]
+
+
+@pytest.fixture(scope='module')
+def linhas(particoes):
+    return carregar_particoes(particoes, imutavel=True)
+
+
+@pytest.fixture
+def exportador(particoes, tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao, 'PASTA_ESTATICA', str(tmp_path))
+    return Exportador(particoes, str(tmp_path / 'exportacoes'), 'abcdef0123', linhas_por_bloco=97)
+
+
+# Referência: as posições do motor de filtros (sem BR) ou do índice das rodovias (com BR) sobre todas as linhas
+def posicoes_referencia(linhas, spec):
+    if spec.br is None:
+        posicoes = FiltroIndexado(linhas, 'data_acidente').posicoes(spec.uf, spec.municipio, spec.inicio, spec.fim)
+        return np.arange(len(linhas))[posicoes]
+    rodovias = IndiceRodovias(linhas)
+    selecao = rodovias.posicoes(spec.br, spec.km_inicio, spec.km_fim, spec.uf, spec.municipio, spec.inicio, spec.fim)
+    return np.sort(rodovias.ordem[selecao])
+
+
+# O arquivo exportado tem exatamente as linhas da seleção, na ordem das partições, nos dois formatos
+@pytest.mark.parametrize('spec', SELECOES)
+def test_exportar_igual_a_selecao(linhas, exportador, spec):
+    esperado = carregar_particoes(exportador.diretorio).iloc[posicoes_referencia(linhas, spec)].reset_index(drop=True)
+    assert exportador.contar(spec) == len(esperado)
+
+    parquet = pq.read_table(exportador.exportar(spec, 'Parquet'))
+    assert parquet.schema.remove_metadata().equals(exportador.esquema)
+    csv = pacsv.read_csv(exportador.exportar(spec, 'CSV')).to_pandas()
+    assert parquet.num_rows == len(csv) == len(esperado)
+    if len(esperado):
+        assert parquet.to_pandas().equals(esperado)
+        assert (csv['data_acidente'].to_numpy() == esperado['data_acidente'].to_numpy()).all()
+        assert (csv['uf'] == esperado['uf'].astype(str)).all()
+        assert np.allclose(csv['km'], esperado['km'], equal_nan=True)
+
+
+# Só as partições do intervalo e, com BR, as que têm a BR são lidas
+def test_particoes_podadas(exportador):
+    assert exportador.particoes(FiltroSpec()) == ['2019-11', '2019-12', '2020-01', '2020-02']
+    assert exportador.particoes(FiltroSpec(None, None, '2019-12-15', '2020-01-05')) == ['2019-12', '2020-01']
+    assert exportador.particoes(FiltroSpec(None, None, None, None, 9999)) == []
+
+
+# A mesma seleção reaproveita o arquivo (renovando a validade); a limpeza remove as outras versões, os vencidos e,
+# acima do limite de tamanho, os pedidos há mais tempo
+def test_reaproveitar_e_limpar(exportador):
+    caminho = exportador.exportar(FiltroSpec('SP'), 'CSV')
+    os.utime(caminho, (time.time() - 30,) * 2)
+    assert exportador.exportar(FiltroSpec('SP'), 'CSV') == caminho
+    assert os.path.getmtime(caminho) > time.time() - 10
+    assert exportador.url(caminho) == f"app/static/exportacoes/{os.path.basename(caminho)}"
+
+    outra_versao = os.path.join(exportador.destino, 'acidentes-00000000-velho.csv.gz')
+    vencido = os.path.join(exportador.destino, 'acidentes-abcdef01-vencido.csv.gz')
+    for arquivo in (outra_versao, vencido):
+        open(arquivo, 'w').write('x')
+    os.utime(vencido, (time.time() - exportador.validade - 1,) * 2)
+    exportador.limpar()
+    assert os.listdir(exportador.destino) == [os.path.basename(caminho)]
+
+    exportador.max_bytes = 0
+    novo = exportador.exportar(FiltroSpec('RJ'), 'Parquet')
+    assert os.listdir(exportador.destino) == [os.path.basename(novo)]
+
+
+def test_destino_fora_da_pasta_estatica(particoes, tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao, 'PASTA_ESTATICA', str(tmp_path / 'static'))
+    with pytest.raises(ValueError):
+        Exportador(particoes, str(tmp_path / 'exportacoes'))
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.filtros import FiltroIndexado
+
+UFS = ['MG', 'RJ', 'SP']
+MUNICIPIOS = ['BETIM', 'CAMPINAS', 'NITEROI']
+
+
+# Linhas ordenadas por data, com o mesmo município em mais de uma UF, ~5% de UF ou município nulos e vários
+# acidentes no mesmo instante
+def linhas_sinteticas(quantidade=5000, semente=0):
+    rng = np.random.default_rng(semente)
+    minutos = np.sort(rng.integers(0, 365 * 24 * 60, quantidade))
+    ufs = rng.integers(0, len(UFS), quantidade)
+    municipios = rng.integers(0, len(MUNICIPIOS), quantidade)
+    ufs[rng.random(quantidade) < 0.05] = -1
+    municipios[rng.random(quantidade) < 0.05] = -1
+    return pd.DataFrame({
+        'data': pd.Timestamp('2020-01-01') + pd.to_timedelta(minutos, unit='min'),
+        'uf': pd.Categorical.from_codes(ufs, categories=UFS),
+        'municipio': pd.Categorical.from_codes(municipios, categories=MUNICIPIOS),
+    })
+
+
+@pytest.fixture(scope='module')
+def linhas():
+    return linhas_sinteticas()
+
+
+@pytest.fixture(scope='module')
+def filtro(linhas):
+    return FiltroIndexado(linhas, 'data')
+
+
+# Referência: máscara booleana sobre todas as linhas (o dia final entra inteiro; município só vale com UF)
+def mascara(linhas, uf, municipio, inicio, fim):
+    selecao = np.ones(len(linhas), dtype=bool)
+    if inicio is not None:
+        selecao &= linhas['data'] >= pd.Timestamp(inicio).normalize()
+    if fim is not None:
+        selecao &= linhas['data'] < pd.Timestamp(fim).normalize() + pd.Timedelta(days=1)
+    if uf is not None:
+        selecao &= linhas['uf'] == uf
+        if municipio is not None:
+            selecao &= linhas['municipio'] == municipio
+    return np.flatnonzero(selecao)
+
+
+@pytest.mark.parametrize('uf, municipio', [(None, None), ('SP', None), ('SP', 'BETIM'), ('MG', 'BETIM'),
+                                           ('RJ', 'CAMPINAS'), ('XX', None), ('SP', 'INEXISTENTE')])
+@pytest.mark.parametrize('inicio, fim', [(None, None), ('2020-03-01', '2020-03-01'), ('2020-02-10 13:45', None),
+                                         (None, '2020-06-30'), ('2020-12-31', '2021-05-01'), ('2020-05-01', '2020-04-01')])
+def test_posicoes_iguais_a_mascara(linhas, filtro, uf, municipio, inicio, fim):
+    posicoes = filtro.posicoes(uf, municipio, inicio, fim)
+    esperado = mascara(linhas, uf, municipio, inicio, fim)
+    # Sem UF, uma fatia contínua das linhas; com UF, posições em ordem crescente
+    if uf is None:
+        assert isinstance(posicoes, slice)
+    else:
+        assert (np.diff(posicoes) > 0).all()
+    assert np.arange(len(linhas))[posicoes].tolist() == esperado.tolist()
+    assert filtro.selecionar(linhas, uf, municipio, inicio, fim).equals(linhas.iloc[esperado])
+
+
+def test_municipios_por_uf(linhas, filtro):
+    pares = linhas.dropna().groupby(['uf', 'municipio'], observed=True).size().index
+    esperado = {}
+    for uf, municipio in pares:
+        esperado.setdefault(uf, []).append(municipio)
+    assert filtro.municipios_por_uf == esperado
+
+
+def test_exige_ordem_por_data(linhas):
+    with pytest.raises(ValueError):
+        FiltroIndexado(linhas.iloc[::-1].reset_index(drop=True), 'data')
+    vazio = FiltroIndexado(linhas.iloc[:0], 'data')
+    assert vazio.posicoes() == slice(0, 0) and len(vazio.posicoes('SP')) == 0
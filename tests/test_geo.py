@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils.geo import _distancias, carregar_geojson, simplificar_geometria, simplificar_linha
+from utils.routes import estado_nome
+
+# GeoJSON versionado no repositório
+CAMINHO_GEOJSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'geo',
+                               'brazil-states.geojson')
+
+
+# Distância de cada ponto original à linha simplificada (o menor entre os segmentos)
+def distancia_a_linha(pontos, linha):
+    distancias = np.full(len(pontos), np.inf)
+    for inicio, fim in zip(linha[:-1], linha[1:]):
+        segmento = fim - inicio
+        comprimento = segmento @ segmento
+        t = np.clip((pontos - inicio) @ segmento / comprimento, 0, 1) if comprimento else np.zeros(len(pontos))
+        projecoes = inicio + t[:, None] * segmento
+        distancias = np.minimum(distancias, np.hypot(*(pontos - projecoes).T))
+    return distancias
+
+
+@pytest.mark.parametrize('tolerancia', [0.001, 0.01, 0.1])
+def test_simplificar_linha_dentro_da_tolerancia(tolerancia):
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 1, 2000)
+    pontos = np.column_stack([x, np.sin(6 * x) * 0.2 + rng.normal(0, 0.002, len(x))])
+    simplificada = simplificar_linha(pontos, tolerancia)
+    assert len(simplificada) < len(pontos)
+    assert (simplificada[0] == pontos[0]).all() and (simplificada[-1] == pontos[-1]).all()
+    # Douglas-Peucker: nenhum ponto descartado fica mais longe que a tolerância da linha simplificada
+    assert distancia_a_linha(pontos, simplificada).max() <= tolerancia + 1e-12
+
+
+def test_distancias_segmento_degenerado():
+    pontos = np.array([[0.0, 0.0], [3.0, 4.0], [0.0, 0.0]])
+    assert _distancias(pontos).tolist() == [0.0, 5.0, 0.0]
+
+
+def test_aneis_continuam_fechados():
+    angulos = np.linspace(0, 2 * np.pi, 500)
+    anel = np.column_stack([np.cos(angulos), np.sin(angulos)])
+    anel[-1] = anel[0]
+    minusculo = [[0, 0], [1e-4, 0], [1e-4, 1e-4], [0, 0]]
+    geometria = {'type': 'MultiPolygon', 'coordinates': [[anel.tolist()], [minusculo]]}
+    simplificada = simplificar_geometria(geometria, 0.05)
+    grande, pequeno = simplificada['coordinates']
+    assert 4 <= len(grande[0]) < len(anel) and grande[0][0] == grande[0][-1]
+    # Anéis que ficariam com menos de 4 pontos são mantidos como estão
+    assert pequeno[0] == minusculo
+
+
+# O GeoJSON versionado tem os 27 estados com a sigla como id, e a simplificação ao carregar só reduz pontos
+def test_geojson_versionado():
+    geojson = carregar_geojson(CAMINHO_GEOJSON, tolerancia=0.0)
+    assert sorted(feature['id'] for feature in geojson['features']) == sorted(estado_nome.values())
+
+    def pontos(dados):
+        total = 0
+        for feature in dados['features']:
+            geometria = feature['geometry']
+            poligonos = [geometria['coordinates']] if geometria['type'] == 'Polygon' else geometria['coordinates']
+            total += sum(len(anel) for poligono in poligonos for anel in poligono)
+        return total
+
+    assert pontos(carregar_geojson(CAMINHO_GEOJSON, tolerancia=0.05)) < pontos(geojson)
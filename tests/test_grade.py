@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.grade import JANELA_BRASIL, LIMITES_BRASIL, NIVEIS, TAMANHO_CELULA, GradeDensidade, limites_janela
+
+UFS = ['AC', 'MG', 'RJ', 'SP']
+
+
+# Célula (x, y) do nível mais fino mais a oeste e mais ao sul de cada UF. São índices em que a volta por graus
+# (limite + x * TAMANHO_CELULA, depois / TAMANHO_CELULA) dá um pouco mais que x, o caso que perdia a borda da janela.
+BORDAS = [(148, 2042), (2698, 1349), (2848, 949), (2348, 999)]
+
+
+# Acidentes sintéticos com coordenadas espalhadas por uma caixa de cada UF (alguns sem coordenada), mais um
+# acidente na célula de borda de cada UF
+def acidentes_sinteticos(quantidade=4000, semente=0):
+    rng = np.random.default_rng(semente)
+    ufs = rng.integers(0, len(UFS), quantidade)
+    centros = np.array([[-70.0, -9.5], [-44.5, -18.5], [-43.0, -22.5], [-48.0, -22.0]])
+    longitude = centros[ufs, 0] + rng.uniform(-2.5, 2.5, quantidade)
+    latitude = centros[ufs, 1] + rng.uniform(-2.0, 2.0, quantidade)
+    longitude[rng.random(quantidade) < 0.02] = np.nan
+    ufs[:len(UFS)] = np.arange(len(UFS))
+    for i, (x, y) in enumerate(BORDAS):
+        longitude[i] = LIMITES_BRASIL[0] + (x + 0.5) * TAMANHO_CELULA
+        latitude[i] = LIMITES_BRASIL[1] + (y + 0.5) * TAMANHO_CELULA
+    segundos = np.sort(rng.integers(0, 2 * 365 * 86400, quantidade))
+    return pd.DataFrame({
+        'data_acidente': pd.Timestamp('2021-01-01') + pd.to_timedelta(segundos, unit='s'),
+        'uf': pd.Categorical.from_codes(ufs, categories=UFS),
+        'municipio': pd.Categorical.from_codes(np.zeros(quantidade, dtype=np.int8), categories=['X']),
+        'mortos': rng.poisson(0.3, quantidade).astype('int16'),
+        'latitude': latitude.astype(np.float32),
+        'longitude': longitude.astype(np.float32),
+    })
+
+
+@pytest.fixture(scope='module')
+def acidentes():
+    return acidentes_sinteticos()
+
+
+@pytest.fixture(scope='module')
+def grade(acidentes):
+    return GradeDensidade(acidentes)
+
+
+# As células da janela da seleção somam todos os acidentes com coordenada da seleção, em qualquer nível
+# (inclusive os da coluna mais a oeste e da linha mais ao sul da janela)
+@pytest.mark.parametrize('uf', [None] + UFS)
+def test_celulas_somam_a_selecao(acidentes, grade, uf):
+    selecao = acidentes if uf is None else acidentes[acidentes['uf'] == uf]
+    com_coordenada = selecao.dropna(subset=['longitude', 'latitude'])
+    posicoes = grade.filtro.posicoes(uf)
+    janela = grade.janela(posicoes)
+    if uf is not None:
+        assert janela[:2] == BORDAS[UFS.index(uf)]
+    for nivel in [0, grade.nivel_para_janela(janela), NIVEIS - 1]:
+        celulas, _ = grade.celulas(posicoes, nivel, janela)
+        assert celulas['acidentes'].sum() == len(com_coordenada)
+        assert celulas['mortos'].sum() == com_coordenada['mortos'].sum()
+
+
+def test_janela_em_celulas(acidentes, grade):
+    posicoes = grade.filtro.posicoes('SP')
+    x_min, y_min, x_max, y_max = grade.janela(posicoes)
+    assert all(isinstance(valor, int) for valor in (x_min, y_min, x_max, y_max))
+    assert x_min == grade.x[posicoes].min() and x_max == grade.x[posicoes].max() + 1
+    lon_min, lat_min, lon_max, lat_max = limites_janela((x_min, y_min, x_max, y_max))
+    sp = acidentes[acidentes['uf'] == 'SP']
+    assert lon_min <= sp['longitude'].min() + 1e-4 and sp['longitude'].max() < lon_max + 1e-4
+    assert lat_min <= sp['latitude'].min() + 1e-4 and sp['latitude'].max() < lat_max + 1e-4
+    assert limites_janela(JANELA_BRASIL) == pytest.approx(LIMITES_BRASIL)
+
+
+def test_selecao_vazia(grade):
+    posicoes = grade.filtro.posicoes('SP', inicio='2030-01-01')
+    janela = grade.janela(posicoes)
+    assert janela == JANELA_BRASIL
+    celulas, _ = grade.celulas(posicoes, grade.nivel_para_janela(janela), janela)
+    assert len(celulas) == 0
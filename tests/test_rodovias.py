@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.rodovias import IndiceRodovias, ranquear_trechos, resumir_rodovias, rotulo_br, tabelas_rodovias
+
+
+# Referência por força bruta: para cada acidente, a janela [km, km + tamanho) da mesma BR; ordem pelo critério,
+# desempate pela outra medida e depois por (BR, km); trechos que se sobrepõem a um já escolhido são descartados
+def ranquear_ingenuo(br, km, mortos, ufs, tamanho, top, criterio):
+    janelas = []
+    for i in range(len(km)):
+        dentro = [j for j in range(len(km)) if br[j] == br[i] and km[i] <= km[j] < km[i] + tamanho]
+        janelas.append((i, len(dentro), sum(int(mortos[j]) for j in dentro), {ufs[j] for j in dentro} - {None}))
+    if criterio == 'mortos':
+        janelas.sort(key=lambda janela: (-janela[2], -janela[1], janela[0]))
+    else:
+        janelas.sort(key=lambda janela: (-janela[1], -janela[2], janela[0]))
+
+    escolhidas = []
+    for i, acidentes, soma_mortos, ufs_janela in janelas:
+        if len(escolhidas) == top:
+            break
+        if any(br[j] == br[i] and abs(km[j] - km[i]) < tamanho for j, *_ in escolhidas):
+            continue
+        escolhidas.append((i, acidentes, soma_mortos, ufs_janela))
+    return [(rotulo_br(br[i]), float(km[i]), ", ".join(sorted(u)), a, m) for i, a, m, u in escolhidas]
+
+
+# Acidentes em poucas BRs, ordenados por (BR, km), com km em múltiplos de 0,5 (exatos em float32)
+def acidentes_sinteticos(quantidade=400, semente=0):
+    rng = np.random.default_rng(semente)
+    br = rng.choice(np.array([101, 116, 381], dtype=np.int16), quantidade)
+    km = (rng.integers(0, 120, quantidade) / 2).astype(np.float32)
+    ordem = np.lexsort((km, br))
+    ufs = np.array(['SP', 'MG', None], dtype=object)[rng.integers(0, 3, quantidade)]
+    return br[ordem], km[ordem], rng.poisson(0.4, quantidade).astype(np.int16)[ordem], ufs[ordem]
+
+
+@pytest.mark.parametrize('tamanho', [1.0, 2.5, 10.0])
+@pytest.mark.parametrize('criterio', ['mortos', 'acidentes'])
+def test_ranking_igual_forca_bruta(tamanho, criterio):
+    br, km, mortos, ufs = acidentes_sinteticos()
+    ranking = ranquear_trechos(br, km, mortos, ufs, tamanho, 8, criterio)
+    esperado = ranquear_ingenuo(br, km, mortos, ufs, tamanho, 8, criterio)
+    obtido = list(zip(ranking['br'], ranking['km_inicial'], ranking['ufs'], ranking['acidentes'], ranking['mortos']))
+    assert obtido == esperado
+    assert (ranking['km_final'] == (ranking['km_inicial'] + tamanho).round(3)).all()
+    assert np.allclose(ranking['mortos_km'], ranking['mortos'] / tamanho)
+
+
+# Uma janela nunca passa de uma BR para a seguinte, mesmo com km próximos
+def test_janela_nao_cruza_br():
+    br = np.array([101, 101, 116], dtype=np.int16)
+    km = np.array([10.0, 10.5, 10.2], dtype=np.float32)
+    ranking = ranquear_trechos(br, km, np.array([1, 1, 5], dtype=np.int16), np.array(['SP'] * 3, dtype=object),
+                               tamanho=1.0, top=5, criterio='acidentes')
+    assert ranking.iloc[0][['br', 'acidentes', 'mortos']].tolist() == ['BR-101', 2, 2]
+    assert ranking.iloc[1][['br', 'acidentes', 'mortos']].tolist() == ['BR-116', 1, 5]
+
+
+def test_ranking_vazio():
+    vazio = np.empty(0, dtype=np.float32)
+    ranking = ranquear_trechos(vazio.astype(np.int16), vazio, vazio.astype(np.int16), vazio.astype(object))
+    assert isinstance(ranking, pd.DataFrame)
+    assert len(ranking) == 0
+    assert 'mortos_km' in ranking.columns
+
+
+# Resumos por partição (gravados no manifesto) juntados dão as mesmas tabelas que as linhas inteiras
+def test_tabelas_rodovias_por_particao():
+    br, km, mortos, ufs = acidentes_sinteticos(semente=1)
+    km[br == 381] = np.nan
+    df = pd.DataFrame({'uf': pd.Categorical(ufs), 'br': br, 'km': km})
+    df.loc[:9, 'br'] = 0
+    partes = [df.iloc[:150], df.iloc[150:300], df.iloc[300:]]
+    particoes = {f"p{i}": {'rodovias': resumir_rodovias(parte)} for i, parte in enumerate(partes)}
+    brs_por_uf, limites_km = tabelas_rodovias({'particoes': particoes})
+
+    com_br = df[df['br'] != 0]
+    assert brs_por_uf == {uf: sorted(set(com_br.loc[com_br['uf'] == uf, 'br'].astype(int)))
+                          for uf in ['MG', 'SP']}
+    assert list(limites_km) == sorted(set(com_br['br'].astype(int)))
+    assert limites_km[381] is None
+    for rodovia in [101, 116]:
+        km_br = com_br.loc[com_br['br'] == rodovia, 'km']
+        assert limites_km[rodovia] == (round(float(km_br.min()), 3), round(float(km_br.max()), 3))
+
+
+# Posições do índice contra uma máscara sobre as linhas: o trecho inclui os dois km das pontas e nunca as linhas sem
+# km, com qualquer combinação de km inicial e final
+@pytest.mark.parametrize('br, km_inicio, km_fim', [(116, None, None), (116, 100.0, None), (116, None, 250.5),
+                                                   (101, 50.0, 220.0), (101, 500.0, 10.0), (9999, None, None)])
+@pytest.mark.parametrize('uf', [None, 'SP'])
+def test_posicoes_do_indice(br, km_inicio, km_fim, uf):
+    rng = np.random.default_rng(3)
+    quantidade = 2000
+    km = rng.uniform(0, 400, quantidade).round(1).astype(np.float32)
+    km[rng.random(quantidade) < 0.1] = np.nan
+    df = pd.DataFrame({
+        'data_acidente': pd.Timestamp('2020-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 10**7, quantidade)), 's'),
+        'uf': pd.Categorical(rng.choice(['MG', 'SP'], quantidade)),
+        'municipio': pd.Categorical(rng.choice(['A', 'B'], quantidade)),
+        'br': rng.choice([0, 101, 116], quantidade).astype(np.int16),
+        'km': km,
+        'mortos': rng.poisson(0.3, quantidade).astype(np.int16),
+    })
+    indice = IndiceRodovias(df)
+    posicoes = np.sort(indice.ordem[indice.posicoes(br, km_inicio, km_fim, uf)])
+
+    mascara = (df['br'] == br).to_numpy()
+    if km_inicio is not None or km_fim is not None:
+        mascara &= df['km'].notna().to_numpy()
+    if km_inicio is not None:
+        mascara &= (df['km'] >= km_inicio).to_numpy()
+    if km_fim is not None:
+        mascara &= (df['km'] <= km_fim).to_numpy()
+    if uf is not None:
+        mascara &= (df['uf'] == uf).to_numpy()
+    assert posicoes.tolist() == np.flatnonzero(mascara).tolist()
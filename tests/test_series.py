@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dados import ARQUIVO_CUBO, carregar_particoes
+from utils.series import SeriesTemporais, lttb
+
+
+@pytest.mark.parametrize('n, max_pontos', [(1000, 50), (501, 500), (10, 3), (7, 4)])
+def test_lttb_extremos_e_tamanho(n, max_pontos):
+    rng = np.random.default_rng(n)
+    escolhidos = lttb(np.arange(n), rng.normal(size=n), max_pontos)
+    assert len(escolhidos) == max_pontos
+    assert escolhidos[0] == 0
+    assert escolhidos[-1] == n - 1
+    assert (np.diff(escolhidos) > 0).all()
+
+
+# Sem redução quando a série já cabe no limite (ou o limite não comporta os dois extremos e um ponto)
+@pytest.mark.parametrize('n, max_pontos', [(10, 10), (10, 20), (10, 2), (0, 5)])
+def test_lttb_sem_reducao(n, max_pontos):
+    assert lttb(np.arange(n), np.zeros(n), max_pontos).tolist() == list(range(n))
+
+
+def test_lttb_preserva_pico():
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb(np.arange(1000), y, 20)
+
+
+@pytest.fixture(scope='module')
+def linhas(particoes):
+    return carregar_particoes(particoes)
+
+
+@pytest.fixture(scope='module')
+def series(particoes):
+    return SeriesTemporais(carregar_particoes(particoes, arquivo=ARQUIVO_CUBO))
+
+
+# Referência: as linhas da seleção somadas por período, com zero nos períodos sem acidentes
+def serie_ingenua(linhas, uf, municipio, inicio, fim, granularidade):
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    selecao = linhas[(linhas['data_acidente'] >= inicio) & (linhas['data_acidente'] < fim + pd.Timedelta(days=1))]
+    if uf is not None:
+        selecao = selecao[selecao['uf'] == uf]
+        if municipio is not None:
+            selecao = selecao[selecao['municipio'] == municipio]
+    periodos = selecao['data_acidente'].dt.to_period(granularidade).dt.start_time
+    baldes = pd.period_range(inicio, fim, freq=granularidade).start_time
+    return (selecao.groupby(periodos)[['mortos']].agg(acidentes=('mortos', 'size'), mortos=('mortos', 'sum'))
+            .reindex(baldes, fill_value=0))
+
+
+# Os períodos inteiros vêm das tabelas semanal e mensal e as bordas da diária: o resultado é o mesmo de somar as
+# linhas, com intervalos que começam e terminam no meio de semanas e meses
+@pytest.mark.parametrize('uf, municipio', [(None, None), ('SP', None), ('SP', 'BETIM'), ('MG', 'BETIM')])
+@pytest.mark.parametrize('inicio, fim, granularidade', [
+    ('2019-11-01', '2020-02-28', 'D'),
+    ('2019-11-06', '2020-02-12', 'W'),
+    ('2019-11-06', '2020-02-12', 'M'),
+    ('2019-11-01', '2020-01-31', 'M'),
+    ('2019-11-04', '2020-01-26', 'W'),
+    ('2019-12-03', '2019-12-05', 'W'),
+    ('2019-12-10', '2019-12-20', 'M'),
+])
+def test_serie_igual_a_soma_das_linhas(linhas, series, uf, municipio, inicio, fim, granularidade):
+    serie = series.serie(uf, municipio, inicio, fim, granularidade, max_pontos=1000)
+    esperado = serie_ingenua(linhas, uf, municipio, inicio, fim, granularidade)
+    assert serie['granularidade'] == granularidade and not serie['reduzida']
+    assert serie['acidentes']['data'].tolist() == list(esperado.index)
+    assert serie['acidentes']['acidentes'].tolist() == esperado['acidentes'].tolist()
+    assert serie['mortos']['mortos'].tolist() == esperado['mortos'].tolist()
+
+
+def test_granularidade_automatica_e_reducao(series):
+    assert series.serie()['granularidade'] == 'D'
+    assert series.serie(inicio='2019-11-01', fim='2020-06-01')['granularidade'] == 'W'
+    assert series.serie(inicio='2017-01-01', fim='2020-02-28')['granularidade'] == 'M'
+    reduzida = series.serie(granularidade='D', max_pontos=30)
+    assert reduzida['reduzida'] and len(reduzida['acidentes']) == len(reduzida['mortos']) == 30
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Dimensões categóricas agregadas pelo kernel (além do ano)
+DIMENSOES_AGREGADAS = ['uf', 'classificacao_acidente', 'fase_dia', 'dia_semana', 'causa_acidente']
+
+
+# Códigos inteiros de todas as dimensões, montados uma vez sobre o cubo (ou sobre as linhas brutas).
+# Cada dimensão ocupa uma faixa própria de "bins" (deslocamento + código), então uma única bincount
+# sobre a matriz de códigos soma todas as dimensões ao mesmo tempo.
+class TabelaCodificada:
+    def __init__(self, df, coluna_data, dimensoes=DIMENSOES_AGREGADAS):
+        # Cubo: já traz as somas por célula; linhas brutas: cada linha é um acidente
+        if 'acidentes' in df.columns:
+            self.acidentes = df['acidentes'].to_numpy()
+            self.mortos = df['mortos'].to_numpy()
+            self.acidentes_fatais = df['acidentes_fatais'].to_numpy()
+        else:
+            self.acidentes = np.ones(len(df), dtype=np.int32)
+            self.mortos = df['mortos'].to_numpy()
+            self.acidentes_fatais = (self.mortos != 0).astype(np.int32)
+
+        anos = df[coluna_data].dt.year.to_numpy()
+        self.ano_inicial = int(anos.min()) if len(anos) else 0
+        quantidade_anos = int(anos.max()) - self.ano_inicial + 1 if len(anos) else 0
+
+        # Rótulos e faixa de bins de cada dimensão; o último bin de cada faixa recebe os valores nulos
+        self.rotulos = {dimensao: np.asarray(df[dimensao].cat.categories) for dimensao in dimensoes}
+        self.rotulos['ano'] = np.arange(self.ano_inicial, self.ano_inicial + quantidade_anos)
+        self.faixas = {}
+        deslocamento = 0
+        for dimensao, rotulos in self.rotulos.items():
+            self.faixas[dimensao] = (deslocamento, deslocamento + len(rotulos))
+            deslocamento += len(rotulos) + 1
+        self.total_bins = deslocamento
+
+        self.codigos = np.empty((len(df), len(self.rotulos)), dtype=np.int32)
+        for j, dimensao in enumerate(dimensoes):
+            inicio, fim = self.faixas[dimensao]
+            codigos = df[dimensao].cat.codes.to_numpy()
+            self.codigos[:, j] = np.where(codigos < 0, fim, codigos + inicio)
+        self.codigos[:, -1] = anos - self.ano_inicial + self.faixas['ano'][0]
+        self.codigos.flags.writeable = False
+
+    def __len__(self):
+        return len(self.codigos)
+
+
+# Somas de acidentes e mortos por valor de uma dimensão (só os valores presentes na seleção)
+def _serie(tabela, dimensao, soma_acidentes, soma_mortos):
+    inicio, fim = tabela.faixas[dimensao]
+    acidentes = soma_acidentes[inicio:fim]
+    presentes = acidentes > 0
+    return pd.DataFrame({
+        dimensao: tabela.rotulos[dimensao][presentes],
+        'acidentes': acidentes[presentes].astype(np.int64),
+        'mortos': soma_mortos[inicio:fim][presentes].astype(np.int64),
+    })
+
+
+# KPIs e séries de uma seleção a partir das somas por bin
+def _resultado(tabela, soma_acidentes, soma_mortos, acidentes_fatais, dias, populacao, top_causas):
+    # Os totais saem da faixa do ano (que nunca é nula), sem outra passada pelos dados
+    inicio, fim = tabela.faixas['ano']
+    total_acidentes = int(soma_acidentes[inicio:fim].sum())
+    kpis = {
+        'acidentes': total_acidentes,
+        'mortos': int(soma_mortos[inicio:fim].sum()),
+        'acidentes_fatais': int(acidentes_fatais),
+        'media_dia': total_acidentes / dias if dias else None,
+        'tx_acidentes_1k': total_acidentes / populacao * 1000 if populacao else None,
+    }
+
+    series = {dimensao: _serie(tabela, dimensao, soma_acidentes, soma_mortos) for dimensao in tabela.rotulos}
+    series['ano'] = series['ano'].set_index('ano')
+
+    # Principais causas: em caso de empate, vale a ordem das categorias (igual ao nlargest)
+    causas = series['causa_acidente']
+    ordem = np.argsort(-causas['acidentes'].to_numpy(), kind='stable')[:top_causas]
+    series['causas'] = causas['acidentes'].iloc[ordem].set_axis(causas['causa_acidente'].iloc[ordem])
+
+    return {'kpis': kpis, 'series': series}
+
+
+# Kernel de agregação: uma passada sobre as posições selecionadas produz os KPIs e todas as séries dos gráficos.
+# posicoes = slice ou array de posições (FiltroIndexado.posicoes); dias e populacao completam a média e a taxa.
+def agregar(tabela, posicoes=slice(None), dias=None, populacao=None, top_causas=5):
+    codigos = tabela.codigos[posicoes]
+    acidentes = tabela.acidentes[posicoes]
+    indices = codigos.ravel()
+    largura = codigos.shape[1]
+
+    # Uma bincount por medida, sobre os bins de todas as dimensões de uma vez
+    soma_acidentes = np.bincount(indices, weights=np.repeat(acidentes, largura), minlength=tabela.total_bins)
+    soma_mortos = np.bincount(indices, weights=np.repeat(tabela.mortos[posicoes], largura), minlength=tabela.total_bins)
+    acidentes_fatais = tabela.acidentes_fatais[posicoes].sum()
+    return _resultado(tabela, soma_acidentes, soma_mortos, acidentes_fatais, dias, populacao, top_causas)
+
+
+# Várias seleções de uma vez (modo comparação): as posições de todos os grupos são juntadas e cada grupo ganha
+# a própria faixa de bins (grupo * total_bins + bin), então a mesma passada agrega todos os grupos.
+# grupos = lista de posições; dias e populacoes = listas alinhadas com os grupos (ou None).
+def agregar_grupos(tabela, grupos, dias=None, populacoes=None, top_causas=5):
+    quantidade = len(grupos)
+    dias = dias or [None] * quantidade
+    populacoes = populacoes or [None] * quantidade
+    posicoes = [np.arange(len(tabela))[grupo] if isinstance(grupo, slice) else np.asarray(grupo) for grupo in grupos]
+    tamanhos = np.array([len(grupo) for grupo in posicoes], dtype=np.int64)
+    todas = np.concatenate(posicoes) if quantidade else np.empty(0, dtype=np.intp)
+    grupo_de_cada = np.repeat(np.arange(quantidade, dtype=np.intp), tamanhos)
+
+    # Índices já em intp (o tipo que a bincount usa internamente), com o deslocamento de cada grupo somado
+    indices = np.take(tabela.codigos, todas, axis=0).astype(np.intp)
+    indices += (grupo_de_cada * tabela.total_bins)[:, None]
+    acidentes = np.take(tabela.acidentes, todas).astype(np.float64)
+    mortos = np.take(tabela.mortos, todas).astype(np.float64)
+
+    # Uma bincount por coluna de códigos (sem repetir os pesos para cada dimensão)
+    minimo = quantidade * tabela.total_bins
+    soma_acidentes = np.zeros(minimo)
+    soma_mortos = np.zeros(minimo)
+    for j in range(indices.shape[1]):
+        soma_acidentes += np.bincount(indices[:, j], weights=acidentes, minlength=minimo)
+        soma_mortos += np.bincount(indices[:, j], weights=mortos, minlength=minimo)
+    acidentes_fatais = np.bincount(grupo_de_cada, weights=np.take(tabela.acidentes_fatais, todas), minlength=quantidade)
+
+    soma_acidentes = soma_acidentes.reshape(quantidade, tabela.total_bins)
+    soma_mortos = soma_mortos.reshape(quantidade, tabela.total_bins)
+    return [
+        _resultado(tabela, soma_acidentes[g], soma_mortos[g], acidentes_fatais[g], dias[g], populacoes[g], top_causas)
+        for g in range(quantidade)
+    ]
@@ -0,0 +1,177 @@
+import argparse
+import atexit
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from utils.config import ARQUIVO_ORIGEM, CAMINHO_STATUS_AQUECIMENTO, DIRETORIO_DADOS
+from utils.dados import ingerir
+
+
+# Arquivo de status de um processo: data/aquecimento.json -> data/aquecimento.<pid>.json
+def caminho_status_processo(caminho, pid=None):
+    raiz, extensao = os.path.splitext(caminho)
+    return f"{raiz}.{os.getpid() if pid is None else pid}{extensao}"
+
+
+# Aquecimento dos caches em segundo plano: executa uma lista de tarefas (nome, função) em uma thread daemon,
+# na ordem dada, e grava o progresso no arquivo JSON do processo (lido pela verificação de prontidão).
+# O status é gravado já na criação; o arquivo é removido quando o processo termina normalmente.
+class Aquecimento:
+    def __init__(self, caminho_status=CAMINHO_STATUS_AQUECIMENTO, versao=None):
+        self.caminho_status = caminho_status_processo(caminho_status) if caminho_status else ""
+        self.status = {'estado': 'parado', 'concluidos': 0, 'total': 0, 'atual': None, 'erros': [],
+                       'inicio': None, 'fim': None, 'pid': os.getpid(), 'versao': versao}
+        self._thread = None
+        self._trava = threading.Lock()
+        self._trava_arquivo = threading.Lock()
+        if self.caminho_status:
+            remover_status_mortos(caminho_status)
+            atexit.register(self._remover_status)
+        self._gravar_status()
+
+    # Iniciar a thread (só na primeira chamada; as seguintes não fazem nada). Devolve True se iniciou agora.
+    # tarefas = lista de (nome, função) ou uma função que monta a lista já dentro da thread (ex.: depois de carregar
+    # os dados), para quem inicia não esperar.
+    def iniciar(self, tarefas):
+        with self._trava:
+            if self._thread is not None:
+                return False
+            self.status.update(estado='aquecendo', atual='preparando', inicio=time.time())
+            self._thread = threading.Thread(target=self._executar, args=(tarefas,), name="aquecimento", daemon=True)
+            self._thread.start()
+        self._gravar_status()
+        return True
+
+    def _executar(self, tarefas):
+        try:
+            tarefas = list(tarefas() if callable(tarefas) else tarefas)
+        except Exception as erro:
+            with self._trava:
+                self.status.update(estado='erro', atual=None, fim=time.time())
+                self.status['erros'].append(f"preparando: {erro!r}")
+            self._gravar_status()
+            return
+        with self._trava:
+            self.status['total'] = len(tarefas)
+        self._gravar_status()
+        for nome, funcao in tarefas:
+            with self._trava:
+                self.status['atual'] = nome
+            try:
+                funcao()
+            except Exception as erro:
+                # Uma tarefa com erro não impede as outras; a consulta é refeita normalmente pela sessão
+                with self._trava:
+                    self.status['erros'].append(f"{nome}: {erro!r}")
+            with self._trava:
+                self.status['concluidos'] += 1
+            self._gravar_status()
+        with self._trava:
+            self.status.update(estado='pronto', atual=None, fim=time.time())
+        self._gravar_status()
+
+    def estado(self):
+        with self._trava:
+            return dict(self.status, erros=list(self.status['erros']))
+
+    # Gravação atômica (arquivo temporário + os.replace), para a verificação nunca ler um JSON pela metade
+    def _gravar_status(self):
+        if not self.caminho_status:
+            return
+        with self._trava_arquivo:
+            status = self.estado()
+            os.makedirs(os.path.dirname(self.caminho_status) or ".", exist_ok=True)
+            temporario = f"{self.caminho_status}.tmp"
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                json.dump(status, arquivo, ensure_ascii=False)
+            os.replace(temporario, self.caminho_status)
+
+    def _remover_status(self):
+        try:
+            os.remove(self.caminho_status)
+        except FileNotFoundError:
+            pass
+
+
+def processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processo de outro usuário: existe
+        return True
+    return True
+
+
+# Arquivos de status de cada processo: (pid, caminho)
+def _arquivos_status(caminho):
+    raiz, extensao = os.path.splitext(caminho)
+    for arquivo_status in sorted(glob.glob(f"{glob.escape(raiz)}.*{extensao}")):
+        pid = arquivo_status[len(raiz) + 1:len(arquivo_status) - len(extensao)]
+        if pid.isdigit():
+            yield int(pid), arquivo_status
+
+
+# Remover os status deixados por processos que caíram (chamado por cada processo novo do app)
+def remover_status_mortos(caminho=CAMINHO_STATUS_AQUECIMENTO):
+    for pid, arquivo_status in _arquivos_status(caminho):
+        if not processo_vivo(pid):
+            try:
+                os.remove(arquivo_status)
+            except FileNotFoundError:
+                pass
+
+
+# Último status gravado por cada processo do app (lista vazia se nenhum aquecimento começou). Cada status ganha
+# 'vivo': o arquivo de um processo que caiu fica para trás, e esse processo não conta como pronto.
+def ler_status(caminho=CAMINHO_STATUS_AQUECIMENTO):
+    status = []
+    for pid, arquivo_status in _arquivos_status(caminho):
+        try:
+            with open(arquivo_status, encoding="utf-8") as arquivo:
+                status_processo = json.load(arquivo)
+        except FileNotFoundError:
+            continue
+        status_processo['vivo'] = processo_vivo(pid)
+        status.append(status_processo)
+    return status
+
+
+# Pronto: há ao menos um processo vivo, todos terminaram o aquecimento e nenhum status é de um processo que caiu
+def pronto(status):
+    return any(s['vivo'] for s in status) and all(s['vivo'] and s['estado'] == 'pronto' for s in status)
+
+
+# python -m utils.aquecimento -> prepara o estado em disco (ingestão do arquivo de origem nas partições)
+# python -m utils.aquecimento --verificar [--pid PID] -> imprime o status de cada processo (ou só o do PID) e termina
+# com 0 só se estiver pronto
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aquecimento dos dados e verificação de prontidão do app")
+    parser.add_argument("--verificar", action="store_true", help="verificar se o aquecimento do app terminou")
+    parser.add_argument("--status", default=CAMINHO_STATUS_AQUECIMENTO,
+                        help="arquivo de status do aquecimento (cada processo grava <nome>.<pid>.json)")
+    parser.add_argument("--pid", type=int, help="verificar só o processo com este PID")
+    parser.add_argument("--origem", default=ARQUIVO_ORIGEM, help="arquivo de origem dos dados")
+    parser.add_argument("--diretorio", default=DIRETORIO_DADOS, help="armazenamento particionado")
+    args = parser.parse_args(argv)
+
+    if args.verificar:
+        status = ler_status(args.status)
+        if args.pid is not None:
+            status = [s for s in status if s['pid'] == args.pid]
+        print(json.dumps(status, ensure_ascii=False))
+        return 0 if pronto(status) else 1
+
+    inicio = time.perf_counter()
+    versao = ingerir(args.origem, args.diretorio)
+    print(f"dados prontos (versão {versao}) em {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.agregacao import DIMENSOES_AGREGADAS
+from utils.config import BACKEND_CONSULTAS, DIRETORIO_DADOS, MAX_PONTOS_SERIE, MAX_SELECOES_COMPARACAO
+from utils.consultas import FiltroSpec, MotorConsultas, especificacoes_padrao
+from utils.dados import ARQUIVO_CUBO, ARQUIVO_DADOS, caminho_particao, ler_manifesto, montar_estados, selecionar_particoes, versao_manifesto
+from utils.metricas import Medidor
+from utils.rodovias import ranquear_trechos, tabelas_rodovias
+from utils.routes import estado_nome, populacao
+from utils.series import granularidade_automatica, montar_serie
+
+# Truncamento das datas no DuckDB para cada granularidade das séries
+TRUNCAMENTO = {'D': 'day', 'W': 'week', 'M': 'month'}
+
+# Valores somados de cada fonte (acidentes, mortos, acidentes fatais): o cubo já traz as somas por célula; nas
+# linhas (seleções com BR) cada linha é um acidente
+MEDIDAS = {
+    'cubo': ("acidentes", "mortos", "acidentes_fatais"),
+    'linhas': ("1", "mortos", "CAST(mortos <> 0 AS INTEGER)"),
+}
+COLUNA_DATA = {'cubo': 'data', 'linhas': 'data_acidente'}
+
+
+# Motor de consultas com a mesma interface do MotorConsultas, mas sem carregar o cubo na memória: cada consulta
+# é um SQL do DuckDB sobre os arquivos parquet das partições (só as colunas usadas são lidas, os filtros de UF e
+# município vão para a leitura do parquet e o filtro de datas descarta as partições ano=/mes= fora do intervalo).
+# O cubo não tem BR nem km: as seleções com BR consultam as linhas dos acidentes (view "linhas").
+# O DuckDB é opcional e só é importado quando este motor é usado.
+class MotorDuckDB:
+    def __init__(self, diretorio=DIRETORIO_DADOS):
+        import duckdb
+
+        manifesto = ler_manifesto(diretorio)
+        self.versao = versao_manifesto(manifesto)
+        particoes = selecionar_particoes(manifesto)
+        if not particoes:
+            raise FileNotFoundError(f"Nenhuma partição de dados em {diretorio}")
+        self._conexao = duckdb.connect()
+        for view, arquivo in (('cubo', ARQUIVO_CUBO), ('linhas', ARQUIVO_DADOS)):
+            lista = ", ".join("'" + os.path.join(caminho_particao(diretorio, particao), arquivo).replace("'", "''") + "'"
+                              for particao in particoes)
+            self._conexao.execute(f"CREATE VIEW {view} AS SELECT * FROM read_parquet([{lista}], hive_partitioning = true)")
+
+        self.estados = montar_estados(self._sql(
+            "SELECT uf, CAST(sum(acidentes) AS BIGINT) AS acidentes, CAST(sum(mortos) AS BIGINT) AS mortos "
+            "FROM cubo GROUP BY uf"
+        ), estado_nome, populacao)
+        datas = self._sql("SELECT min(data) AS minima, max(data) AS maxima FROM cubo")
+        self.data_minima = datas['minima'].iloc[0].date()
+        self.data_maxima = datas['maxima'].iloc[0].date()
+        self.municipios_por_uf = {}
+        pares = self._sql("SELECT DISTINCT uf, municipio FROM cubo WHERE uf IS NOT NULL AND municipio IS NOT NULL")
+        for uf, municipio in sorted(zip(pares['uf'], pares['municipio'])):
+            self.municipios_por_uf.setdefault(uf, []).append(municipio)
+        # BRs de cada UF e menor e maior km de cada BR, do resumo gravado no manifesto na ingestão
+        self.brs_por_uf, self.limites_rodovias = tabelas_rodovias(manifesto)
+
+    # Cada consulta usa o próprio cursor (as sessões do Streamlit rodam em threads diferentes)
+    def _sql(self, consulta, parametros=None):
+        with self._conexao.cursor() as cursor:
+            return cursor.execute(consulta, parametros or []).df()
+
+    def rodovias_por_uf(self, uf=None):
+        return list(self.limites_rodovias) if uf is None else self.brs_por_uf.get(uf, [])
+
+    def limites_km(self, br):
+        return self.limites_rodovias.get(br)
+
+    # Condição WHERE e parâmetros de uma seleção; o dia final entra inteiro
+    def _onde(self, spec, inicio, fim, fonte='cubo'):
+        data = COLUNA_DATA[fonte]
+        condicoes = [f"{data} >= ?", f"{data} < ?", "ano BETWEEN ? AND ?"]
+        parametros = [inicio, fim + pd.Timedelta(days=1), inicio.year, fim.year]
+        if spec.uf is not None:
+            condicoes.append("uf = ?")
+            parametros.append(spec.uf)
+            if spec.municipio is not None:
+                condicoes.append("municipio = ?")
+                parametros.append(spec.municipio)
+        if fonte == 'linhas':
+            # Sem BR: todas as linhas com BR (o trecho só vale com uma BR escolhida)
+            if spec.br is None:
+                condicoes.append("br <> 0")
+            else:
+                condicoes.append("br = ?")
+                parametros.append(spec.br)
+                if spec.km_inicio is not None:
+                    condicoes.append("km >= ?")
+                    parametros.append(spec.km_inicio)
+                if spec.km_fim is not None:
+                    condicoes.append("km <= ?")
+                    parametros.append(spec.km_fim)
+        return " AND ".join(condicoes), parametros
+
+    def _intervalo(self, spec):
+        inicio = pd.Timestamp(spec.inicio or self.data_minima).normalize()
+        fim = pd.Timestamp(spec.fim or self.data_maxima).normalize()
+        if spec.uf is None:
+            pop = self.estados['populacao'].sum()
+        else:
+            pop = self.estados.loc[self.estados['sigla'] == spec.uf, 'populacao'].iloc[0]
+        return inicio, fim, (fim - inicio).days + 1, pop
+
+    # Linhas de uma seleção com as colunas comuns às duas fontes (dimensões, data e valores das medidas), marcadas
+    # com o número da seleção
+    def _selecao(self, numero, spec, inicio, fim):
+        fonte = 'cubo' if spec.br is None else 'linhas'
+        onde, parametros = self._onde(spec, inicio, fim, fonte)
+        acidentes, mortos, acidentes_fatais = MEDIDAS[fonte]
+        return (f"SELECT {numero} AS selecao, {', '.join(DIMENSOES_AGREGADAS)}, {COLUNA_DATA[fonte]} AS data, "
+                f"{acidentes} AS acidentes, {mortos} AS mortos, {acidentes_fatais} AS acidentes_fatais "
+                f"FROM {fonte} WHERE {onde}"), parametros
+
+    # KPIs e séries de cada seleção em uma única consulta: as seleções são juntadas com UNION ALL e todas as
+    # dimensões saem de GROUPING SETS agrupados também pelo número da seleção; GROUPING_ID diz a que conjunto
+    # cada linha pertence
+    def _agregar(self, especificacoes, medidor, span):
+        if not especificacoes:
+            return []
+        intervalos = [self._intervalo(spec) for spec in especificacoes]
+        selecoes, parametros = [], []
+        for numero, (spec, (inicio, fim, _, _)) in enumerate(zip(especificacoes, intervalos)):
+            consulta, parametros_selecao = self._selecao(numero, spec, inicio, fim)
+            selecoes.append(consulta)
+            parametros += parametros_selecao
+        expressoes = DIMENSOES_AGREGADAS + ['year(data)']
+        with medidor.span(span):
+            grupos = self._sql(
+                f"SELECT selecao, {', '.join(f'{expressao} AS d{j}' for j, expressao in enumerate(expressoes))}, "
+                f"GROUPING_ID({', '.join(expressoes)}) AS conjunto, CAST(sum(acidentes) AS BIGINT) AS acidentes, "
+                "CAST(sum(mortos) AS BIGINT) AS mortos, CAST(sum(acidentes_fatais) AS BIGINT) AS acidentes_fatais "
+                f"FROM ({' UNION ALL '.join(selecoes)}) "
+                f"GROUP BY GROUPING SETS ({', '.join(f'(selecao, {expressao})' for expressao in expressoes)}, (selecao))",
+                parametros,
+            )
+        por_selecao = dict(tuple(grupos.groupby('selecao')))
+        return [self._resultado(spec, por_selecao.get(numero, grupos.iloc[:0]), dias, pop)
+                for numero, (spec, (_, _, dias, pop)) in enumerate(zip(especificacoes, intervalos))]
+
+    def consultar(self, spec, medidor=None):
+        return self._agregar([spec], medidor or Medidor(), 'agregacao')[0]
+
+    # Uma única consulta para todas as seleções (cada uma lê só as partições e linhas dela)
+    def comparar(self, especificacoes, medidor=None):
+        return self._agregar(especificacoes, medidor or Medidor(), 'agregacao.comparacao')
+
+    # KPIs e séries de uma seleção a partir das linhas dos GROUPING SETS dela
+    def _resultado(self, spec, grupos, dias, pop):
+        dimensoes = DIMENSOES_AGREGADAS + ['ano']
+        todos = (1 << len(dimensoes)) - 1
+        total = grupos[grupos['conjunto'] == todos]
+        total_acidentes = int(total['acidentes'].fillna(0).sum())
+        kpis = {
+            'acidentes': total_acidentes,
+            'mortos': int(total['mortos'].fillna(0).sum()),
+            'acidentes_fatais': int(total['acidentes_fatais'].fillna(0).sum()),
+            'media_dia': total_acidentes / dias if dias else None,
+            'tx_acidentes_1k': total_acidentes / pop * 1000 if pop else None,
+        }
+
+        # Séries na ordem dos rótulos, só com os valores presentes (como no kernel do motor em memória)
+        series = {}
+        for j, dimensao in enumerate(dimensoes):
+            linhas = grupos[(grupos['conjunto'] == todos - (1 << (len(dimensoes) - 1 - j))) & grupos[f'd{j}'].notna()]
+            linhas = linhas.sort_values(f'd{j}')
+            series[dimensao] = pd.DataFrame({
+                dimensao: linhas[f'd{j}'].to_numpy(dtype=np.int64 if dimensao == 'ano' else object),
+                'acidentes': linhas['acidentes'].to_numpy(dtype=np.int64),
+                'mortos': linhas['mortos'].to_numpy(dtype=np.int64),
+            })
+        series['ano'] = series['ano'].set_index('ano')
+        causas = series['causa_acidente']
+        ordem = np.argsort(-causas['acidentes'].to_numpy(), kind='stable')[:5]
+        series['causas'] = causas['acidentes'].iloc[ordem].set_axis(causas['causa_acidente'].iloc[ordem])
+
+        return {'kpis': kpis, 'series': series, 'spec': spec}
+
+    def tendencia(self, spec, granularidade=None, max_pontos=MAX_PONTOS_SERIE, medidor=None):
+        medidor = medidor or Medidor()
+        inicio, fim, _, _ = self._intervalo(spec)
+        granularidade = granularidade or granularidade_automatica(inicio, fim)
+        fonte = 'cubo' if spec.br is None else 'linhas'
+        periodo = f"date_trunc('{TRUNCAMENTO[granularidade]}', {COLUNA_DATA[fonte]})"
+        onde, parametros = self._onde(spec, inicio, fim, fonte)
+        acidentes, mortos, _ = MEDIDAS[fonte]
+        with medidor.span('agregacao.tendencia'):
+            somas = self._sql(
+                f"SELECT {periodo} AS data, CAST(sum({acidentes}) AS BIGINT) AS acidentes, "
+                f"CAST(sum({mortos}) AS BIGINT) AS mortos "
+                f"FROM {fonte} WHERE {onde} GROUP BY 1",
+                parametros,
+            )
+            # Somas no mesmo tipo das colunas do cubo (int32), como nas séries do motor em memória
+            return montar_serie(pd.to_datetime(somas['data']).to_numpy(), somas['acidentes'].to_numpy(dtype=np.int32),
+                                somas['mortos'].to_numpy(dtype=np.int32), inicio, fim, granularidade, max_pontos)
+
+    # Trechos críticos: as linhas da seleção vêm ordenadas por (BR, km) e passam pelas mesmas janelas do motor em memória
+    def ranking(self, spec, tamanho=1.0, top=10, criterio='mortos', medidor=None):
+        medidor = medidor or Medidor()
+        inicio, fim, _, _ = self._intervalo(spec)
+        onde, parametros = self._onde(spec, inicio, fim, 'linhas')
+        with medidor.span('filtro.rodovia'):
+            linhas = self._sql(f"SELECT br, km, mortos, uf FROM linhas WHERE {onde} AND km IS NOT NULL "
+                               "ORDER BY br, km", parametros)
+        with medidor.span('agregacao.ranking'):
+            return ranquear_trechos(linhas['br'].to_numpy(dtype=np.int16), linhas['km'].to_numpy(dtype=np.float32),
+                                    linhas['mortos'].to_numpy(), linhas['uf'].to_numpy(dtype=object), tamanho, top, criterio)
+
+
+# Motores disponíveis, escolhidos pela configuração ACIDENTES_BACKEND
+BACKENDS = {'pandas': MotorConsultas, 'duckdb': MotorDuckDB}
+
+
+def criar_motor(backend=BACKEND_CONSULTAS, diretorio=DIRETORIO_DADOS):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend!r} (opções: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](diretorio)
+
+
+# Diferenças entre os resultados dos dois motores para uma seleção (lista vazia = idênticos)
+def diferencas(resultado_a, resultado_b):
+    encontradas = []
+    if resultado_a['kpis'] != resultado_b['kpis']:
+        encontradas.append(f"kpis: {resultado_a['kpis']} != {resultado_b['kpis']}")
+    for nome, serie in resultado_a['series'].items():
+        try:
+            if isinstance(serie, pd.Series):
+                pd.testing.assert_series_equal(serie, resultado_b['series'][nome])
+            else:
+                pd.testing.assert_frame_equal(serie, resultado_b['series'][nome])
+        except AssertionError as erro:
+            encontradas.append(f"{nome}: {erro}")
+    return encontradas
+
+
+# python -m utils.backends --verificar -> compara os dois motores no lote padrão de consultas, nas comparações e nas
+# séries temporais
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motores de consulta do dashboard")
+    parser.add_argument("--diretorio", default=DIRETORIO_DADOS, help="armazenamento particionado")
+    parser.add_argument("--verificar", action="store_true", help="verificar se pandas e DuckDB dão resultados idênticos")
+    args = parser.parse_args(argv)
+    if not args.verificar:
+        parser.print_help()
+        return 0
+
+    pandas_, duckdb_ = MotorConsultas(args.diretorio), MotorDuckDB(args.diretorio)
+    especificacoes = especificacoes_padrao(pandas_)
+    # Um município de cada UF, no período inteiro
+    especificacoes += [FiltroSpec(uf, municipios[0]) for uf, municipios in sorted(pandas_.municipios_por_uf.items())]
+    # Cada BR inteira, a primeira metade dela e, com a UF de mais acidentes, a BR no estado
+    uf_principal = pandas_.estados.sort_values('Acidentes', ascending=False)['sigla'].iloc[0]
+    for br in pandas_.rodovias_por_uf():
+        limites = pandas_.limites_km(br)
+        especificacoes.append(FiltroSpec(br=br))
+        if limites is not None:
+            especificacoes.append(FiltroSpec(br=br, km_inicio=limites[0], km_fim=(limites[0] + limites[1]) / 2))
+        if br in pandas_.rodovias_por_uf(uf_principal):
+            especificacoes.append(FiltroSpec(uf_principal, br=br, inicio=f"{pandas_.data_maxima.year}-01-01"))
+
+    falhas = 0
+    for spec in especificacoes:
+        for diferenca in diferencas(pandas_.consultar(spec), duckdb_.consultar(spec)):
+            falhas += 1
+            print(f"{spec}: {diferenca}", file=sys.stderr)
+    # Comparações em lotes do tamanho máximo da interface (há lotes só com o cubo, só com BR e misturados)
+    for inicio in range(0, len(especificacoes), MAX_SELECOES_COMPARACAO):
+        lote = especificacoes[inicio:inicio + MAX_SELECOES_COMPARACAO]
+        for spec, resultado_a, resultado_b in zip(lote, pandas_.comparar(lote), duckdb_.comparar(lote)):
+            for diferenca in diferencas(resultado_a, resultado_b):
+                falhas += 1
+                print(f"{spec} comparação: {diferenca}", file=sys.stderr)
+    for spec in especificacoes[::7]:
+        for granularidade in [None, 'D', 'W', 'M']:
+            serie_a = pandas_.tendencia(spec, granularidade)
+            serie_b = duckdb_.tendencia(spec, granularidade)
+            for nome in ['acidentes', 'mortos']:
+                try:
+                    pd.testing.assert_frame_equal(serie_a[nome].reset_index(drop=True), serie_b[nome].reset_index(drop=True))
+                except AssertionError as erro:
+                    falhas += 1
+                    print(f"{spec} tendência {granularidade} {nome}: {erro}", file=sys.stderr)
+    for spec in [FiltroSpec()] + [spec for spec in especificacoes if spec.br is not None]:
+        for tamanho, criterio in [(1.0, 'mortos'), (5.0, 'acidentes')]:
+            try:
+                pd.testing.assert_frame_equal(pandas_.ranking(spec, tamanho, criterio=criterio),
+                                              duckdb_.ranking(spec, tamanho, criterio=criterio))
+            except AssertionError as erro:
+                falhas += 1
+                print(f"{spec} ranking {tamanho} {criterio}: {erro}", file=sys.stderr)
+
+    print(f"{len(especificacoes)} consultas comparadas, {falhas} diferenças", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
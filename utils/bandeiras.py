@@ -0,0 +1,95 @@
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+
+import requests
+from PIL import Image, ImageDraw
+
+from utils.config import CAMINHO_BANDEIRAS
+from utils.routes import bandeiras
+
+# Tamanho máximo (largura, altura) das miniaturas geradas
+TAMANHO_MAXIMO = (320, 224)
+
+# Imagem usada quando a bandeira não tem miniatura local (versionada junto com as miniaturas)
+SEM_BANDEIRA = "sem_bandeira.png"
+
+# O Wikimedia exige um User-Agent identificando quem faz a requisição
+CABECALHOS = {"User-Agent": "Streamlit-accidents-brasil/1.0 (geracao das bandeiras locais)"}
+
+
+# URL da versão rasterizada (PNG) do arquivo no Wikimedia, na largura pedida
+def url_miniatura(url, largura):
+    # Já é uma miniatura: só trocar a largura
+    if "/thumb/" in url:
+        return re.sub(r"/\d+px-", f"/{largura}px-", url)
+    # Arquivo original (.svg): montar o caminho /thumb/.../<largura>px-<nome>.png
+    prefixo, caminho = url.split("/wikipedia/commons/", 1)
+    nome = caminho.rsplit("/", 1)[-1]
+    return f"{prefixo}/wikipedia/commons/thumb/{caminho}/{largura}px-{nome}.png"
+
+
+# Baixar, reduzir e gravar cada bandeira com o hash do conteúdo no nome do arquivo
+def gerar_bandeiras(destino=CAMINHO_BANDEIRAS):
+    os.makedirs(destino, exist_ok=True)
+    manifesto = {}
+    for chave, url in bandeiras.items():
+        resposta = requests.get(url_miniatura(url, TAMANHO_MAXIMO[0]), headers=CABECALHOS, timeout=60)
+        resposta.raise_for_status()
+
+        imagem = Image.open(io.BytesIO(resposta.content))
+        imagem.thumbnail(TAMANHO_MAXIMO)
+        buffer = io.BytesIO()
+        imagem.save(buffer, format="PNG", optimize=True)
+        conteudo = buffer.getvalue()
+
+        nome_arquivo = f"{hashlib.sha256(conteudo).hexdigest()[:16]}.png"
+        with open(os.path.join(destino, nome_arquivo), "wb") as f:
+            f.write(conteudo)
+        manifesto[chave] = nome_arquivo
+        print(f"{chave}: {nome_arquivo} ({len(conteudo) / 1024:.1f} KB)")
+
+    # Remover miniaturas antigas que não estão mais no manifesto
+    for arquivo in os.listdir(destino):
+        if arquivo.endswith(".png") and arquivo != SEM_BANDEIRA and arquivo not in manifesto.values():
+            os.remove(os.path.join(destino, arquivo))
+
+    with open(os.path.join(destino, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    gerar_sem_bandeira(destino)
+    return manifesto
+
+
+# Imagem neutra (cinza, do tamanho das miniaturas) para quando a bandeira não está disponível localmente
+def gerar_sem_bandeira(destino=CAMINHO_BANDEIRAS):
+    imagem = Image.new("RGB", TAMANHO_MAXIMO, "#d9dbe3")
+    desenho = ImageDraw.Draw(imagem)
+    desenho.rectangle([0, 0, TAMANHO_MAXIMO[0] - 1, TAMANHO_MAXIMO[1] - 1], outline="#8a90b0", width=4)
+    desenho.text((TAMANHO_MAXIMO[0] / 2, TAMANHO_MAXIMO[1] / 2), "sem miniatura local", fill="#2e3350",
+                 anchor="mm", font_size=20)
+    caminho = os.path.join(destino, SEM_BANDEIRA)
+    imagem.save(caminho, format="PNG", optimize=True)
+    return caminho
+
+
+# Conteúdo da bandeira local (bytes); sem a miniatura local, usa a imagem neutra (nunca uma URL externa)
+def carregar_bandeira(chave, origem=CAMINHO_BANDEIRAS):
+    try:
+        with open(os.path.join(origem, "manifesto.json"), encoding="utf-8") as f:
+            nome_arquivo = json.load(f)[chave]
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        nome_arquivo = SEM_BANDEIRA
+    try:
+        with open(os.path.join(origem, nome_arquivo), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        with open(os.path.join(origem, SEM_BANDEIRA), "rb") as f:
+            return f.read()
+
+
+# python -m utils.bandeiras [destino] -> gera as miniaturas locais
+if __name__ == "__main__":
+    gerar_bandeiras(sys.argv[1] if len(sys.argv) > 1 else CAMINHO_BANDEIRAS)
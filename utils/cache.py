@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+
+
+# Cache LRU com tamanho máximo e contadores de acertos/falhas, seguro para uso entre sessões (threads).
+# limites_por_tipo limita à parte os tipos de item mais pesados (o tipo é o primeiro elemento da chave): um mapa
+# guarda a própria cópia do GeoJSON e um mapa de densidade até MAX_CELULAS_DENSIDADE células, então o limite geral
+# (em quantidade de itens) sozinho não segura a memória.
+class CacheLRU:
+    def __init__(self, tamanho_maximo, limites_por_tipo=None):
+        self.tamanho_maximo = tamanho_maximo
+        self.limites_por_tipo = dict(limites_por_tipo or {})
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._por_tipo = {}
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    # Devolver o valor da chave, construindo-o (fora da trava) quando ainda não estiver no cache
+    def obter(self, chave, construir):
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+
+        valor = construir()
+        with self._trava:
+            if chave not in self._itens:
+                self._por_tipo[chave[0]] = self._por_tipo.get(chave[0], 0) + 1
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            # Remover os itens do mesmo tipo usados há mais tempo, e depois os usados há mais tempo no geral
+            limite = self.limites_por_tipo.get(chave[0])
+            if limite is not None and self._por_tipo[chave[0]] > limite:
+                antigas = [c for c in self._itens if c[0] == chave[0]]
+                for antiga in antigas[:len(antigas) - limite]:
+                    self._remover(antiga)
+            while len(self._itens) > self.tamanho_maximo:
+                self._remover(next(iter(self._itens)))
+        return valor
+
+    def _remover(self, chave):
+        del self._itens[chave]
+        self._por_tipo[chave[0]] -= 1
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self._por_tipo.clear()
+
+    def estatisticas(self):
+        with self._trava:
+            total = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'tamanho_maximo': self.tamanho_maximo,
+                'itens_por_tipo': {tipo: n for tipo, n in self._por_tipo.items() if n},
+                'limites_por_tipo': dict(self.limites_por_tipo),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+            }
@@ -0,0 +1,67 @@
+import os
+
+# Configurações do app, lidas de variáveis de ambiente (com valores padrão para rodar localmente)
+
+# GeoJSON dos estados brasileiros guardado no repositório (já simplificado)
+CAMINHO_GEOJSON = os.environ.get("ACIDENTES_GEOJSON", "./data/geo/brazil-states.geojson")
+
+# Tolerância (em graus) da simplificação das fronteiras dos estados; 0 desativa a simplificação
+TOLERANCIA_GEOJSON = float(os.environ.get("ACIDENTES_TOLERANCIA_GEOJSON", "0.01"))
+
+# Quantidade máxima de itens (figuras e KPIs) no cache LRU compartilhado entre as sessões
+TAMANHO_CACHE_FIGURAS = int(os.environ.get("ACIDENTES_TAMANHO_CACHE_FIGURAS", "512"))
+
+# Máximo de mapas dos estados (cada um com a sua cópia do GeoJSON) e de mapas de densidade (até
+# MAX_CELULAS_DENSIDADE células cada) dentro desse cache, os itens mais pesados
+MAX_FIGURAS_MAPA = int(os.environ.get("ACIDENTES_MAX_FIGURAS_MAPA", "32"))
+MAX_FIGURAS_DENSIDADE = int(os.environ.get("ACIDENTES_MAX_FIGURAS_DENSIDADE", "32"))
+
+# Miniaturas locais das bandeiras (geradas com python -m utils.bandeiras)
+CAMINHO_BANDEIRAS = os.environ.get("ACIDENTES_BANDEIRAS", "./assets/bandeiras")
+
+# Arquivo de origem dos dados (.tar.gz, .zip ou .csv), ingerido no armazenamento particionado na inicialização
+ARQUIVO_ORIGEM = os.environ.get("ACIDENTES_ARQUIVO_ORIGEM", "./data/accidents_2017_to_2023.tar.gz")
+
+# Armazenamento particionado por mês (parquet + cubo agregado de cada mês, com um manifesto)
+DIRETORIO_DADOS = os.environ.get("ACIDENTES_DIRETORIO_DADOS", "./data/particoes")
+
+# Exportação dos tempos de cada etapa (p50/p95 em janela móvel); caminho vazio desativa a exportação
+CAMINHO_METRICAS_JSONL = os.environ.get("ACIDENTES_METRICAS_JSONL", "./data/metricas/spans.jsonl")
+CAMINHO_METRICAS_PROMETHEUS = os.environ.get("ACIDENTES_METRICAS_PROMETHEUS", "./data/metricas/acidentes.prom")
+JANELA_METRICAS = int(os.environ.get("ACIDENTES_JANELA_METRICAS", "1000"))
+INTERVALO_METRICAS = float(os.environ.get("ACIDENTES_INTERVALO_METRICAS", "15"))
+
+# Máximo de células enviadas ao navegador pelo mapa de densidade (acima disso a grade fica mais grossa)
+MAX_CELULAS_DENSIDADE = int(os.environ.get("ACIDENTES_MAX_CELULAS_DENSIDADE", "20000"))
+
+# Máximo de pontos de cada série temporal enviada ao navegador (acima disso a série é reduzida com LTTB)
+MAX_PONTOS_SERIE = int(os.environ.get("ACIDENTES_MAX_PONTOS_SERIE", "500"))
+
+# Aquecimento dos caches em segundo plano (visão padrão e as 27 UFs); "0" desativa. O progresso fica no arquivo de status.
+AQUECIMENTO = os.environ.get("ACIDENTES_AQUECIMENTO", "1") != "0"
+CAMINHO_STATUS_AQUECIMENTO = os.environ.get("ACIDENTES_STATUS_AQUECIMENTO", "./data/aquecimento.json")
+
+# Exportação das linhas filtradas: pasta dentro de ./static (servida pelo Streamlit em app/static/), linhas gravadas
+# por bloco e máximo de exportações simultâneas no processo
+DIRETORIO_EXPORTACOES = os.environ.get("ACIDENTES_DIRETORIO_EXPORTACOES", "./static/exportacoes")
+LINHAS_POR_BLOCO_EXPORTACAO = int(os.environ.get("ACIDENTES_LINHAS_POR_BLOCO_EXPORTACAO", "65536"))
+MAX_EXPORTACOES = int(os.environ.get("ACIDENTES_MAX_EXPORTACOES", "2"))
+# Validade de um arquivo exportado (minutos desde o último pedido) e tamanho máximo da pasta de exportações (MB);
+# a cada exportação os arquivos vencidos e, acima do limite, os mais antigos são removidos
+VALIDADE_EXPORTACOES_MIN = float(os.environ.get("ACIDENTES_VALIDADE_EXPORTACOES_MIN", "60"))
+MAX_MB_EXPORTACOES = float(os.environ.get("ACIDENTES_MAX_MB_EXPORTACOES", "1024"))
+
+# Máximo de seleções (estados, municípios ou anos) comparadas ao mesmo tempo no modo comparação
+MAX_SELECOES_COMPARACAO = int(os.environ.get("ACIDENTES_MAX_SELECOES_COMPARACAO", "6"))
+
+# Motor das consultas de filtro e agregação: "pandas" (cubo em memória) ou "duckdb" (consultas sobre os arquivos
+# parquet das partições, sem carregar o cubo; requer o pacote duckdb)
+BACKEND_CONSULTAS = os.environ.get("ACIDENTES_BACKEND", "pandas")
+
+# Ranking dos trechos críticos das rodovias: tamanho padrão da janela deslizante (km) e quantidade padrão de trechos
+TAMANHO_TRECHO_KM = float(os.environ.get("ACIDENTES_TAMANHO_TRECHO_KM", "1"))
+TOP_TRECHOS = int(os.environ.get("ACIDENTES_TOP_TRECHOS", "10"))
+
+# Threads que montam as figuras das seções em paralelo (a página é preenchida à medida que cada uma fica pronta);
+# padrão: uma por núcleo além do primeiro, no máximo 4. "0" monta as figuras em sequência, na ordem da página
+TRABALHADORES_FIGURAS = int(os.environ.get("ACIDENTES_TRABALHADORES_FIGURAS", str(min(4, (os.cpu_count() or 1) - 1))))
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, astuple, dataclass
+
+import pandas as pd
+
+from utils.agregacao import TabelaCodificada, agregar, agregar_grupos
+from utils.config import DIRETORIO_DADOS, MAX_PONTOS_SERIE
+from utils.dados import ARQUIVO_CUBO, carregar_particoes, ler_manifesto, montar_estados, versao_manifesto
+from utils.filtros import FiltroIndexado
+from utils.metricas import Medidor
+from utils.rodovias import COLUNAS_RODOVIAS, COLUNAS_TABELA_RODOVIAS, IndiceRodovias, tabelas_rodovias
+from utils.routes import estado_nome, populacao
+from utils.series import SeriesTemporais, granularidade_automatica, montar_serie
+
+
+# Estado dos filtros do dashboard; None = sem filtro (Brasil, todos os municípios, período inteiro, todas as BRs,
+# rodovia inteira). O trecho [km_inicio, km_fim] só vale com uma BR escolhida.
+@dataclass(frozen=True)
+class FiltroSpec:
+    uf: str = None
+    municipio: str = None
+    inicio: str = None
+    fim: str = None
+    br: int = None
+    km_inicio: float = None
+    km_fim: float = None
+
+    # Chave normalizada (usada nos caches)
+    def chave(self):
+        return astuple(self)
+
+
+# Consultas do dashboard sem depender do Streamlit: carrega o cubo de uma versão dos dados uma vez
+# e responde cada FiltroSpec com os KPIs e as séries prontas para os gráficos.
+# O cubo não tem BR nem km: as BRs de cada UF e os km de cada BR vêm do manifesto; o ranking de trechos usa o índice
+# das rodovias (montado na primeira vez que for pedido) e as seleções com BR, a tabela do kernel de agregação sobre
+# as linhas do índice (montada só quando alguma seleção tiver BR).
+class MotorConsultas:
+    def __init__(self, diretorio=DIRETORIO_DADOS):
+        self.diretorio = diretorio
+        self._rodovias = None
+        self._tabela_rodovias = None
+        self._trava_rodovias = threading.Lock()
+        manifesto = ler_manifesto(diretorio)
+        self.versao = versao_manifesto(manifesto)
+        self.brs_por_uf, self.limites_rodovias = tabelas_rodovias(manifesto)
+        self.cubo = carregar_particoes(diretorio, arquivo=ARQUIVO_CUBO, imutavel=True)
+        self.filtro = FiltroIndexado(self.cubo, 'data')
+        self.municipios_por_uf = self.filtro.municipios_por_uf
+        self.tabela = TabelaCodificada(self.cubo, 'data')
+        self.estados = montar_estados(self.cubo, estado_nome, populacao)
+        self.series = SeriesTemporais(self.cubo)
+        self.data_minima = self.cubo['data'].iloc[0].date()
+        self.data_maxima = self.cubo['data'].iloc[-1].date()
+
+    # Intervalo da seleção, dias do intervalo (contando o dia inicial e o final) e população
+    def _intervalo(self, spec):
+        inicio = pd.Timestamp(spec.inicio or self.data_minima)
+        fim = pd.Timestamp(spec.fim or self.data_maxima)
+        if spec.uf is None:
+            pop = self.estados['populacao'].sum()
+        else:
+            pop = self.estados.loc[self.estados['sigla'] == spec.uf, 'populacao'].iloc[0]
+        return inicio, fim, (fim - inicio).days + 1, pop
+
+    # Índice das rodovias (carregado uma vez, mesmo com várias sessões pedindo ao mesmo tempo)
+    @property
+    def rodovias(self):
+        with self._trava_rodovias:
+            if self._rodovias is None:
+                self._rodovias = IndiceRodovias(
+                    carregar_particoes(self.diretorio, colunas=COLUNAS_RODOVIAS, imutavel=True))
+            return self._rodovias
+
+    # Tabela do kernel de agregação sobre as linhas do índice das rodovias, na ordem do índice
+    @property
+    def tabela_rodovias(self):
+        rodovias = self.rodovias
+        with self._trava_rodovias:
+            if self._tabela_rodovias is None:
+                linhas = carregar_particoes(self.diretorio, colunas=COLUNAS_TABELA_RODOVIAS, imutavel=True)
+                self._tabela_rodovias = TabelaCodificada(linhas.iloc[rodovias.ordem], 'data_acidente')
+            return self._tabela_rodovias
+
+    # BRs com acidentes na UF (todas, sem UF) e menor e maior km de uma BR, para os controles do filtro de rodovia
+    def rodovias_por_uf(self, uf=None):
+        return list(self.limites_rodovias) if uf is None else self.brs_por_uf.get(uf, [])
+
+    def limites_km(self, br):
+        return self.limites_rodovias.get(br)
+
+    def _posicoes_rodovia(self, spec, inicio, fim):
+        return self.rodovias.posicoes(spec.br, spec.km_inicio, spec.km_fim, spec.uf, spec.municipio, inicio, fim)
+
+    def consultar(self, spec, medidor=None):
+        medidor = medidor or Medidor()
+        inicio, fim, dias, pop = self._intervalo(spec)
+
+        if spec.br is not None:
+            with medidor.span('filtro.rodovia'):
+                posicoes = self._posicoes_rodovia(spec, inicio, fim)
+            with medidor.span('agregacao'):
+                resultado = agregar(self.tabela_rodovias, posicoes, dias=dias, populacao=pop)
+            resultado['spec'] = spec
+            return resultado
+
+        with medidor.span('filtro'):
+            posicoes = self.filtro.posicoes(spec.uf, spec.municipio, inicio, fim)
+        with medidor.span('agregacao'):
+            resultado = agregar(self.tabela, posicoes, dias=dias, populacao=pop)
+        resultado['spec'] = spec
+        return resultado
+
+    # Várias seleções (modo comparação) em uma única passada agrupada; resultados na ordem das especificações.
+    # Com BR em todas (o painel compara com o mesmo trecho), a passada é sobre a tabela das rodovias.
+    def comparar(self, especificacoes, medidor=None):
+        medidor = medidor or Medidor()
+        com_br = [spec.br is not None for spec in especificacoes]
+        if any(com_br) and not all(com_br):
+            return [self.consultar(spec, medidor) for spec in especificacoes]
+        intervalos = [self._intervalo(spec) for spec in especificacoes]
+
+        if all(com_br) and especificacoes:
+            with medidor.span('filtro.rodovia'):
+                grupos = [self._posicoes_rodovia(spec, inicio, fim)
+                          for spec, (inicio, fim, _, _) in zip(especificacoes, intervalos)]
+            tabela = self.tabela_rodovias
+        else:
+            with medidor.span('filtro'):
+                grupos = [self.filtro.posicoes(spec.uf, spec.municipio, inicio, fim)
+                          for spec, (inicio, fim, _, _) in zip(especificacoes, intervalos)]
+            tabela = self.tabela
+        with medidor.span('agregacao.comparacao'):
+            resultados = agregar_grupos(tabela, grupos, dias=[intervalo[2] for intervalo in intervalos],
+                                        populacoes=[intervalo[3] for intervalo in intervalos])
+        for spec, resultado in zip(especificacoes, resultados):
+            resultado['spec'] = spec
+        return resultados
+
+    # Série de acidentes e mortos da seleção; granularidade None = escolhida pelo tamanho do intervalo
+    def tendencia(self, spec, granularidade=None, max_pontos=MAX_PONTOS_SERIE, medidor=None):
+        medidor = medidor or Medidor()
+        with medidor.span('agregacao.tendencia'):
+            if spec.br is not None:
+                inicio, fim, _, _ = self._intervalo(spec)
+                inicio, fim = inicio.normalize(), fim.normalize()
+                datas, acidentes, mortos = self.rodovias.somas_diarias(self._posicoes_rodovia(spec, inicio, fim))
+                return montar_serie(datas, acidentes, mortos, inicio, fim,
+                                    granularidade or granularidade_automatica(inicio, fim), max_pontos)
+            return self.series.serie(spec.uf, spec.municipio, spec.inicio or self.data_minima,
+                                     spec.fim or self.data_maxima, granularidade, max_pontos)
+
+    # Trechos críticos (janelas de `tamanho` km) da seleção; sem BR, o ranking inclui todas as rodovias
+    def ranking(self, spec, tamanho=1.0, top=10, criterio='mortos', medidor=None):
+        medidor = medidor or Medidor()
+        inicio, fim, _, _ = self._intervalo(spec)
+        with medidor.span('filtro.rodovia'):
+            posicoes = self._posicoes_rodovia(spec, inicio, fim)
+        with medidor.span('agregacao.ranking'):
+            return self.rodovias.ranking(posicoes, tamanho, top, criterio)
+
+
+# Resultado em formato JSON (séries como listas de registros)
+def serializar(resultado):
+    series = {}
+    for nome, serie in resultado['series'].items():
+        if isinstance(serie, pd.Series):
+            serie = serie.rename_axis(serie.index.name or 'indice').reset_index()
+        elif nome == 'ano':
+            serie = serie.reset_index()
+        series[nome] = serie.to_dict(orient='records')
+    return {'spec': asdict(resultado['spec']), 'kpis': resultado['kpis'], 'series': series}
+
+
+# Lote padrão: Brasil e cada UF, no período inteiro e em cada ano
+def especificacoes_padrao(motor):
+    periodos = [(None, None)] + [
+        (f"{ano}-01-01", f"{ano}-12-31") for ano in range(motor.data_minima.year, motor.data_maxima.year + 1)
+    ]
+    ufs = [None] + sorted(motor.estados.loc[motor.estados['Acidentes'] > 0, 'sigla'])
+    return [FiltroSpec(uf, None, inicio, fim) for uf in ufs for inicio, fim in periodos]
+
+
+# Cada processo do pool carrega o próprio motor uma única vez
+_motor = None
+
+
+def _iniciar_processo(diretorio):
+    global _motor
+    _motor = MotorConsultas(diretorio)
+
+
+def _consultar_serializado(spec):
+    return serializar(_motor.consultar(spec))
+
+
+# Executar um lote de consultas em paralelo; devolve os resultados na ordem das especificações
+def consultar_lote(especificacoes, diretorio=DIRETORIO_DADOS, processos=None):
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo, initargs=(diretorio,)) as pool:
+        return list(pool.map(_consultar_serializado, especificacoes, chunksize=8))
+
+
+# python -m utils.consultas --saida relatorios.jsonl -> relatórios de Brasil e das 27 UFs, por ano e no período inteiro
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-calcular os relatórios do dashboard em paralelo")
+    parser.add_argument("--diretorio", default=DIRETORIO_DADOS, help="armazenamento particionado")
+    parser.add_argument("--saida", default="-", help="arquivo JSON-lines de saída (- = stdout)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count(), help="processos do pool")
+    args = parser.parse_args(argv)
+
+    especificacoes = especificacoes_padrao(MotorConsultas(args.diretorio))
+    resultados = consultar_lote(especificacoes, args.diretorio, args.processos)
+
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "w", encoding="utf-8")
+    try:
+        for resultado in resultados:
+            saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"{len(resultados)} consultas", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
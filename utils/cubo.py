@@ -0,0 +1,14 @@
+# Dimensões do cubo de agregação (uma célula por combinação observada)
+DIMENSOES = ['data', 'uf', 'municipio', 'classificacao_acidente', 'fase_dia', 'dia_semana', 'causa_acidente']
+
+
+# Pré-agregar os acidentes por dia e por categoria; o resultado fica ordenado por data
+def construir_cubo(df):
+    cubo = (
+        df.assign(data=df['data_acidente'].dt.normalize(), fatal=df['mortos'] != 0)
+        .groupby(DIMENSOES, observed=True, sort=True)
+        .agg(acidentes=('mortos', 'size'), mortos=('mortos', 'sum'), acidentes_fatais=('fatal', 'sum'))
+        .reset_index()
+    )
+    return cubo.astype({'acidentes': 'int32', 'mortos': 'int32', 'acidentes_fatais': 'int32'})
+
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import sys
+import tarfile
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from utils.config import DIRETORIO_DADOS
+from utils.cubo import construir_cubo
+from utils.rodovias import resumir_rodovias
+
+# Colunas categóricas (gravadas como dicionário no parquet)
+COLUNAS_CATEGORICAS = ['uf', 'municipio', 'classificacao_acidente', 'fase_dia', 'dia_semana', 'causa_acidente']
+
+# Colunas numéricas mantidas e seus tipos
+COLUNAS_NUMERICAS = {'mortos': 'int16'}
+
+# Colunas do CSV original usadas para montar a data do acidente
+COLUNAS_DATA = ['data_inversa', 'horario']
+
+# Coordenadas do acidente; no CSV da PRF vêm como texto com vírgula decimal
+COLUNAS_COORDENADAS = ['latitude', 'longitude']
+
+# Rodovia (número da BR, 0 = sem BR) e quilômetro do acidente; no CSV da PRF o km também vem com vírgula decimal
+COLUNAS_RODOVIA = ['br', 'km']
+
+# Incrementar sempre que o formato das partições mudar, para forçar a reconstrução do armazenamento
+VERSAO_ESQUEMA = 6
+
+# Trava das ingestões dentro do processo (a trava de arquivo, abaixo, cobre os outros processos)
+_trava_ingestao = threading.Lock()
+
+# Arquivos de cada partição mensal (ano=AAAA/mes=MM/)
+ARQUIVO_DADOS = "acidentes.parquet"
+ARQUIVO_CUBO = "cubo.parquet"
+
+
+# Calcular o hash do conteúdo do arquivo em blocos (sem carregar tudo na memória)
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+# Ler somente as colunas usadas, já com os tipos definitivos
+def ler_csv(arquivo):
+    df = pd.read_csv(
+        arquivo,
+        usecols=COLUNAS_CATEGORICAS + list(COLUNAS_NUMERICAS) + COLUNAS_DATA + COLUNAS_COORDENADAS + COLUNAS_RODOVIA,
+        dtype={
+            **{coluna: 'category' for coluna in COLUNAS_CATEGORICAS},
+            **{coluna: str for coluna in COLUNAS_DATA + COLUNAS_COORDENADAS + COLUNAS_RODOVIA},
+        },
+    )
+    for coluna, tipo in COLUNAS_NUMERICAS.items():
+        df[coluna] = df[coluna].fillna(0).astype(tipo)
+
+    # Coordenadas inválidas ou ausentes ficam como NaN
+    for coluna in COLUNAS_COORDENADAS:
+        df[coluna] = pd.to_numeric(df[coluna].str.replace(",", ".", regex=False), errors='coerce').astype('float32')
+
+    # BR vem como "116" ou "116.0"; sem BR (ou inválida) fica 0. Km inválido ou ausente fica como NaN.
+    df['br'] = pd.to_numeric(df['br'], errors='coerce').fillna(0).astype('int16')
+    df['km'] = pd.to_numeric(df['km'].str.replace(",", ".", regex=False), errors='coerce').astype('float32')
+
+    # Converter data para formato datetime
+    df['data_acidente'] = pd.to_datetime(df.pop('data_inversa') + " " + df.pop('horario'), format='%Y-%m-%d %H:%M:%S')
+    return df
+
+
+# Ler o CSV de origem: .csv direto, ou o primeiro CSV dentro de um .tar.gz/.zip
+def ler_origem(caminho):
+    if caminho.endswith(".csv"):
+        return ler_csv(caminho)
+    if caminho.endswith(".zip"):
+        with zipfile.ZipFile(caminho) as arquivo_zip:
+            for nome in arquivo_zip.namelist():
+                if nome.endswith(".csv"):
+                    with arquivo_zip.open(nome) as file:
+                        return ler_csv(file)
+    else:
+        with tarfile.open(caminho, "r:*") as tar:
+            for member in tar.getmembers():
+                if member.name.endswith(".csv"):
+                    with tar.extractfile(member) as file:
+                        return ler_csv(file)
+    raise FileNotFoundError(f"Nenhum arquivo .csv encontrado em {caminho}")
+
+
+def _ler_manifesto(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifesto = None
+    if manifesto is None or manifesto.get("versao_esquema") != VERSAO_ESQUEMA:
+        return {"versao_esquema": VERSAO_ESQUEMA, "fontes": {}, "particoes": {}}
+    return manifesto
+
+
+# Nome temporário único por processo e thread, para gravações simultâneas não usarem o mesmo arquivo
+def _temporario(caminho):
+    return f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _gravar_manifesto(caminho, manifesto):
+    # Gravação atômica para não deixar um manifesto pela metade se o processo cair
+    temporario = _temporario(caminho)
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _gravar_parquet(df, caminho):
+    temporario = _temporario(caminho)
+    df.to_parquet(temporario, engine="pyarrow", index=False)
+    os.replace(temporario, caminho)
+
+
+def caminho_particao(diretorio, particao):
+    ano, mes = particao.split("-")
+    return os.path.join(diretorio, f"ano={ano}", f"mes={mes}")
+
+
+# Versão do conjunto de dados: muda sempre que alguma partição é acrescentada ou substituída
+def versao_manifesto(manifesto):
+    conteudo = json.dumps(
+        [(particao, info["fonte"]) for particao, info in sorted(manifesto["particoes"].items())]
+    )
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def ler_manifesto(diretorio=DIRETORIO_DADOS):
+    return _ler_manifesto(os.path.join(diretorio, "manifesto.json"))
+
+
+# Trava exclusiva de arquivo (entre processos) enquanto o bloco roda; sem fcntl (Windows), só a trava do processo vale
+class _TravaArquivo:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def __enter__(self):
+        self._arquivo = open(self.caminho, "a")
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *excecao):
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+        self._arquivo.close()
+
+
+# Acrescentar um arquivo de origem ao armazenamento particionado por mês.
+# Só as partições (meses) presentes no arquivo são gravadas; se um mês já existir, a versão nova o substitui.
+# Uma ingestão por vez (threads e processos); quem esperou relê o manifesto e encontra o arquivo já ingerido.
+# Sem o arquivo de origem (deploy só com data/particoes/), vale o manifesto existente.
+# Devolve a versão do conjunto de dados.
+def ingerir(caminho, diretorio=DIRETORIO_DADOS):
+    os.makedirs(diretorio, exist_ok=True)
+    with _trava_ingestao, _TravaArquivo(os.path.join(diretorio, ".ingestao.lock")):
+        return _ingerir(caminho, diretorio)
+
+
+def _ingerir(caminho, diretorio):
+    caminho_manifesto = os.path.join(diretorio, "manifesto.json")
+    manifesto = _ler_manifesto(caminho_manifesto)
+
+    try:
+        stat = os.stat(caminho)
+    except FileNotFoundError:
+        if manifesto["particoes"]:
+            return versao_manifesto(manifesto)
+        raise FileNotFoundError(f"Arquivo de origem {caminho} não encontrado e nenhuma partição em {diretorio}")
+
+    # Mesmo arquivo (nome, tamanho e data de modificação) já ingerido: nem recalcular o hash
+    for fonte in manifesto["fontes"].values():
+        if (fonte["arquivo"], fonte["tamanho"], fonte["mtime"]) == (os.path.basename(caminho), stat.st_size, stat.st_mtime):
+            return versao_manifesto(manifesto)
+
+    hash_origem = hash_arquivo(caminho)
+    if hash_origem not in manifesto["fontes"]:
+        df = ler_origem(caminho)
+        meses = df['data_acidente'].dt.to_period('M')
+        particoes = []
+        for periodo, df_mes in df.groupby(meses, sort=True):
+            particao = str(periodo)
+            destino = caminho_particao(diretorio, particao)
+            os.makedirs(destino, exist_ok=True)
+
+            # Gravar ordenado por data, junto com o cubo agregado do mês
+            df_mes = df_mes.sort_values('data_acidente', kind='stable', ignore_index=True)
+            _gravar_parquet(df_mes, os.path.join(destino, ARQUIVO_DADOS))
+            _gravar_parquet(construir_cubo(df_mes), os.path.join(destino, ARQUIVO_CUBO))
+
+            manifesto["particoes"][particao] = {
+                "fonte": hash_origem,
+                "linhas": len(df_mes),
+                "inicio": df_mes['data_acidente'].iloc[0].isoformat(),
+                "fim": df_mes['data_acidente'].iloc[-1].isoformat(),
+                "rodovias": resumir_rodovias(df_mes),
+            }
+            particoes.append(particao)
+        manifesto["fontes"][hash_origem] = {"particoes": particoes}
+
+    # Conteúdo idêntico (ex.: arquivo copiado de novo) só atualiza os metadados
+    manifesto["fontes"][hash_origem].update({
+        "arquivo": os.path.basename(caminho),
+        "tamanho": stat.st_size,
+        "mtime": stat.st_mtime,
+    })
+    _gravar_manifesto(caminho_manifesto, manifesto)
+    return versao_manifesto(manifesto)
+
+
+# Partições que têm algum acidente no intervalo [início, fim] (datas inclusivas)
+def selecionar_particoes(manifesto, inicio=None, fim=None):
+    selecionadas = []
+    for particao, info in sorted(manifesto["particoes"].items()):
+        if inicio is not None and pd.Timestamp(info["fim"]) < pd.Timestamp(inicio).normalize():
+            continue
+        if fim is not None and pd.Timestamp(info["inicio"]) >= pd.Timestamp(fim).normalize() + pd.Timedelta(days=1):
+            continue
+        selecionadas.append(particao)
+    return selecionadas
+
+
+# Converter uma tabela Arrow em um DataFrame imutável, para ser compartilhado entre as sessões.
+# Números e datas apontam para os buffers do Arrow (sem cópia) e todos os arrays ficam somente leitura:
+# qualquer escrita no DataFrame compartilhado gera erro em vez de alterar os dados das outras sessões.
+def somente_leitura(tabela):
+    # Um único bloco por coluna, com o dicionário das categorias unificado entre as partições
+    tabela = tabela.unify_dictionaries().combine_chunks()
+    colunas = {}
+    for nome, coluna in zip(tabela.column_names, tabela.columns):
+        valores = coluna.chunk(0) if coluna.num_chunks else pa.array([], type=coluna.type)
+        if pa.types.is_dictionary(valores.type):
+            categorias = valores.dictionary.to_pandas()
+            # Códigos já no tipo que o pandas usaria, para o Categorical não fazer outra cópia
+            tipo = np.min_scalar_type(-len(categorias) - 1)
+            codigos = valores.indices.fill_null(-1).to_numpy().astype(tipo, copy=False)
+            codigos.flags.writeable = False
+            colunas[nome] = pd.Categorical.from_codes(codigos, categories=categorias, validate=False)
+        else:
+            array = valores.to_numpy(zero_copy_only=False)
+            array.flags.writeable = False
+            colunas[nome] = array
+    return pd.DataFrame(colunas, copy=False)
+
+
+# Tabela Arrow das partições do intervalo (só os arquivos e as colunas necessários), em ordem de data
+def ler_particoes(diretorio=DIRETORIO_DADOS, inicio=None, fim=None, arquivo=ARQUIVO_DADOS, colunas=None):
+    manifesto = ler_manifesto(diretorio)
+    tabelas = [
+        pq.read_table(os.path.join(caminho_particao(diretorio, particao), arquivo), columns=colunas,
+                      partitioning=None, memory_map=True)
+        for particao in selecionar_particoes(manifesto, inicio, fim)
+    ]
+    if not tabelas:
+        raise FileNotFoundError(f"Nenhuma partição de dados em {diretorio}")
+    return pa.concat_tables(tabelas)
+
+
+# Ler as partições do intervalo como DataFrame; arquivo = ARQUIVO_DADOS ou ARQUIVO_CUBO
+def carregar_particoes(diretorio=DIRETORIO_DADOS, inicio=None, fim=None, arquivo=ARQUIVO_DADOS, imutavel=False, colunas=None):
+    tabela = ler_particoes(diretorio, inicio, fim, arquivo, colunas)
+    if imutavel:
+        return somente_leitura(tabela)
+    # Os dicionários das colunas categóricas de cada partição são unificados na conversão
+    return tabela.to_pandas()
+
+
+# Garantir a ordem por data (as partições já são gravadas ordenadas)
+def preprocessar(df):
+    if not df['data_acidente'].is_monotonic_increasing:
+        df = df.sort_values('data_acidente', kind='stable', ignore_index=True)
+    return df
+
+
+# Tabela de estados com população, acidentes, mortos e taxas por mil habitantes (a partir das linhas ou do cubo)
+def montar_estados(df, estado_nome, populacao):
+    estados = pd.DataFrame(estado_nome.items(), columns=['estado', 'sigla'])
+    estados['populacao'] = estados['sigla'].map(populacao)
+    if 'acidentes' in df.columns:
+        acidentes = df['acidentes'].groupby(df['uf'], observed=True).sum()
+    else:
+        acidentes = df.groupby('uf', observed=True).size()
+    estados['Acidentes'] = estados['sigla'].map(acidentes)
+    estados['Mortos'] = estados['sigla'].map(df['mortos'].groupby(df['uf'], observed=True).sum())
+    estados['tx_acidentalidade_1k'] = estados['Acidentes'] / estados['populacao'] * 1000
+    estados['tx_mortalidade_1k'] = estados['Mortos'] / estados['populacao'] * 1000
+    return estados
+
+
+# python -m utils.dados <arquivo> [<arquivo> ...] -> acrescenta novos anos/meses ao armazenamento
+if __name__ == "__main__":
+    for arquivo in sys.argv[1:]:
+        print(f"{arquivo}: versão {ingerir(arquivo)[:12]}")
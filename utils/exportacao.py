@@ -0,0 +1,199 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from utils.config import (DIRETORIO_DADOS, DIRETORIO_EXPORTACOES, LINHAS_POR_BLOCO_EXPORTACAO, MAX_EXPORTACOES,
+                          MAX_MB_EXPORTACOES, VALIDADE_EXPORTACOES_MIN)
+from utils.dados import ARQUIVO_DADOS, caminho_particao, ler_manifesto, selecionar_particoes
+
+# Formatos de exportação: extensão do arquivo gerado
+FORMATOS = {'CSV': '.csv.gz', 'Parquet': '.parquet'}
+
+# Colunas usadas pelos filtros da seleção
+COLUNAS_FILTRO = ['data_acidente', 'uf', 'municipio', 'br', 'km']
+
+# Pasta estática que o Streamlit serve em app/static/ (a pasta static ao lado de streamlit_app.py)
+PASTA_ESTATICA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+
+# URL de um caminho dentro da pasta estática; ValueError se ele não estiver dentro dela (o link não seria servido)
+def url_estatica(caminho):
+    raiz = os.path.realpath(PASTA_ESTATICA)
+    alvo = os.path.realpath(caminho)
+    if alvo == raiz or os.path.commonpath([raiz, alvo]) != raiz:
+        raise ValueError(f"{caminho} não fica dentro de {raiz}, a pasta servida pelo Streamlit em app/static/; "
+                         "ajuste ACIDENTES_DIRETORIO_EXPORTACOES para uma pasta dentro dela")
+    return "app/static/" + os.path.relpath(alvo, raiz).replace(os.sep, "/")
+
+
+# Exportação das linhas da seleção (UF, município, datas e trecho de rodovia) em CSV compactado ou Parquet.
+# Nada fica carregado entre as exportações: cada uma lê só as partições que podem ter linhas da seleção (intervalo de
+# datas e, com BR, as que têm a BR segundo o manifesto), em blocos de até linhas_por_bloco linhas, e grava cada bloco
+# já filtrado, sem montar a seleção inteira na memória.
+# No máximo max_exportacoes exportações rodam ao mesmo tempo (as outras são recusadas). O destino precisa estar
+# dentro da pasta estática; os arquivos valem por validade_min minutos desde o último pedido e a pasta não passa
+# de max_mb MB.
+class Exportador:
+    def __init__(self, diretorio=DIRETORIO_DADOS, destino=DIRETORIO_EXPORTACOES, versao=None,
+                 linhas_por_bloco=LINHAS_POR_BLOCO_EXPORTACAO, max_exportacoes=MAX_EXPORTACOES,
+                 validade_min=VALIDADE_EXPORTACOES_MIN, max_mb=MAX_MB_EXPORTACOES):
+        self.url_destino = url_estatica(destino)
+        self.diretorio = diretorio
+        self.manifesto = ler_manifesto(diretorio)
+        if not self.manifesto["particoes"]:
+            raise FileNotFoundError(f"Nenhuma partição de dados em {diretorio}")
+        # Esquema dos arquivos exportados (o mesmo em todas as partições)
+        self.esquema = pq.read_schema(self._arquivo(min(self.manifesto["particoes"]))).remove_metadata()
+        self.destino = destino
+        self.versao = versao or ''
+        self.linhas_por_bloco = linhas_por_bloco
+        self.validade = validade_min * 60
+        self.max_bytes = max_mb * 2**20
+        self._vagas = threading.BoundedSemaphore(max_exportacoes)
+
+    def _arquivo(self, particao):
+        return os.path.join(caminho_particao(self.diretorio, particao), ARQUIVO_DADOS)
+
+    # Nome do arquivo de uma seleção: a mesma seleção da mesma versão dos dados reaproveita o arquivo
+    def nome_arquivo(self, spec, formato):
+        chave = hashlib.sha256(repr((self.versao, spec.chave(), formato)).encode()).hexdigest()[:16]
+        return f"acidentes-{self.versao[:8]}-{chave}{FORMATOS[formato]}"
+
+    # Partições que podem ter linhas da seleção: as do intervalo de datas e, com BR, só as que têm a BR
+    def particoes(self, spec):
+        particoes = selecionar_particoes(self.manifesto, spec.inicio, spec.fim)
+        if spec.br is not None:
+            particoes = [particao for particao in particoes
+                         if str(spec.br) in self.manifesto["particoes"][particao]["rodovias"]["limites_km"]]
+        return particoes
+
+    # Máscara das linhas do bloco que entram na seleção (None quando não há filtro). Mesmas regras do motor de
+    # filtros e do índice das rodovias: o dia final entra inteiro, o município só vale com UF e o trecho só com BR
+    # (linhas sem km ficam fora de qualquer trecho).
+    def mascara(self, spec, bloco):
+        condicoes = []
+        if spec.inicio is not None:
+            condicoes.append(pc.greater_equal(bloco['data_acidente'], pa.scalar(pd.Timestamp(spec.inicio).normalize())))
+        if spec.fim is not None:
+            limite = pd.Timestamp(spec.fim).normalize() + pd.Timedelta(days=1)
+            condicoes.append(pc.less(bloco['data_acidente'], pa.scalar(limite)))
+        if spec.uf is not None:
+            condicoes.append(pc.equal(bloco['uf'], spec.uf))
+            if spec.municipio is not None:
+                condicoes.append(pc.equal(bloco['municipio'], spec.municipio))
+        if spec.br is not None:
+            condicoes.append(pc.equal(bloco['br'], spec.br))
+            if spec.km_inicio is not None:
+                condicoes.append(pc.greater_equal(bloco['km'], spec.km_inicio))
+            if spec.km_fim is not None:
+                condicoes.append(pc.less_equal(bloco['km'], spec.km_fim))
+        if not condicoes:
+            return None
+        return functools.reduce(pc.and_kleene, condicoes)
+
+    # Blocos já filtrados da seleção, em ordem de data (só as colunas pedidas; por padrão, todas)
+    def blocos(self, spec, colunas=None):
+        for particao in self.particoes(spec):
+            arquivo = pq.ParquetFile(self._arquivo(particao), memory_map=True)
+            for bloco in arquivo.iter_batches(self.linhas_por_bloco, columns=colunas):
+                mascara = self.mascara(spec, bloco)
+                if mascara is not None:
+                    bloco = bloco.filter(mascara)
+                if bloco.num_rows:
+                    yield bloco
+
+    # Quantidade de linhas da seleção (lê só as colunas dos filtros)
+    def contar(self, spec):
+        return sum(bloco.num_rows for bloco in self.blocos(spec, COLUNAS_FILTRO))
+
+    # URL do arquivo exportado, servida pelo Streamlit
+    def url(self, caminho):
+        return f"{self.url_destino}/{os.path.basename(caminho)}"
+
+    # Gravar a seleção e devolver o caminho do arquivo; None se já houver max_exportacoes em andamento.
+    # Um arquivo reaproveitado tem a validade renovada.
+    def exportar(self, spec, formato='CSV'):
+        caminho = os.path.join(self.destino, self.nome_arquivo(spec, formato))
+        try:
+            os.utime(caminho)
+            return caminho
+        except FileNotFoundError:
+            pass
+        if not self._vagas.acquire(blocking=False):
+            return None
+        try:
+            os.makedirs(self.destino, exist_ok=True)
+            # Arquivo temporário + os.replace: o link nunca aponta para um arquivo pela metade
+            temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                self._gravar(self.blocos(spec), temporario, formato)
+            except BaseException:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+                raise
+            os.replace(temporario, caminho)
+        finally:
+            self._vagas.release()
+        self.limpar(manter=caminho)
+        return caminho
+
+    def _gravar(self, blocos, caminho, formato):
+        if formato == 'Parquet':
+            with pq.ParquetWriter(caminho, self.esquema, compression='zstd') as escritor:
+                for bloco in blocos:
+                    escritor.write_batch(bloco.replace_schema_metadata())
+        else:
+            with pa.CompressedOutputStream(caminho, 'gzip') as saida, pacsv.CSVWriter(saida, self.esquema) as escritor:
+                for bloco in blocos:
+                    escritor.write_batch(bloco.replace_schema_metadata())
+
+    # Remover os arquivos de outras versões dos dados e os vencidos; se a pasta ainda passar de max_bytes, remover
+    # os pedidos há mais tempo. Temporários só saem depois de vencidos (podem ser de uma gravação em andamento em
+    # outro processo), e `manter` (o arquivo recém-gravado) nunca é removido.
+    def limpar(self, manter=None):
+        if not os.path.isdir(self.destino):
+            return
+        prefixo = f"acidentes-{self.versao[:8]}-"
+        vencimento = time.time() - self.validade
+        arquivos = []
+        total = 0
+        for entrada in os.scandir(self.destino):
+            if not entrada.name.startswith('acidentes-'):
+                continue
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            total += info.st_size
+            if entrada.name.endswith('.tmp'):
+                if info.st_mtime < vencimento:
+                    _remover(entrada.path)
+                    total -= info.st_size
+            elif manter is not None and entrada.name == os.path.basename(manter):
+                continue
+            elif not entrada.name.startswith(prefixo) or info.st_mtime < vencimento:
+                _remover(entrada.path)
+                total -= info.st_size
+            else:
+                arquivos.append((info.st_mtime, entrada.path, info.st_size))
+        for _, caminho, tamanho in sorted(arquivos):
+            if total <= self.max_bytes:
+                break
+            _remover(caminho)
+            total -= tamanho
+
+
+# Remover um arquivo exportado (outro processo pode já tê-lo removido)
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
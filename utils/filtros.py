@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+# Agrupar as posições das linhas por código; dentro de cada grupo as posições ficam em ordem crescente
+def _indexar(codigos, nomes):
+    ordem = np.argsort(codigos, kind='stable')
+    fronteiras = np.searchsorted(codigos[ordem], np.arange(len(nomes) + 1))
+    return {
+        nome: ordem[fronteiras[i]:fronteiras[i + 1]]
+        for i, nome in enumerate(nomes)
+        if fronteiras[i + 1] > fronteiras[i]
+    }
+
+
+# Motor de filtros montado uma única vez sobre um DataFrame ordenado por data.
+# Devolve fatias (slice) ou arrays de posições, sem copiar o DataFrame.
+class FiltroIndexado:
+    def __init__(self, df, coluna_data):
+        self.datas = df[coluna_data].to_numpy()
+        if len(self.datas) and not (self.datas[1:] >= self.datas[:-1]).all():
+            raise ValueError(f"O DataFrame precisa estar ordenado por '{coluna_data}'")
+
+        # Posições por UF
+        ufs = df['uf'].cat.categories
+        self.posicoes_uf = _indexar(df['uf'].cat.codes.to_numpy(), list(ufs))
+
+        # Posições por (UF, município); o mesmo nome de município pode existir em mais de uma UF
+        municipios = df['municipio'].cat.categories
+        codigos_uf = df['uf'].cat.codes.to_numpy().astype(np.int64)
+        codigos_municipio = df['municipio'].cat.codes.to_numpy()
+        codigo_par = np.where((codigos_uf < 0) | (codigos_municipio < 0), -1, codigos_uf * len(municipios) + codigos_municipio)
+        pares = [(uf, municipio) for uf in ufs for municipio in municipios]
+        self.posicoes_municipio = _indexar(codigo_par, pares)
+
+        # Lista de municípios de cada UF, já ordenada para o selectbox
+        self.municipios_por_uf = {}
+        for uf, municipio in sorted(self.posicoes_municipio):
+            self.municipios_por_uf.setdefault(uf, []).append(municipio)
+
+    # Intervalo [início, fim) de posições para as datas; o dia final entra inteiro
+    def limites_data(self, inicio=None, fim=None):
+        lo = 0 if inicio is None else int(np.searchsorted(self.datas, np.datetime64(pd.Timestamp(inicio).normalize()), 'left'))
+        hi = len(self.datas) if fim is None else int(np.searchsorted(
+            self.datas, np.datetime64(pd.Timestamp(fim).normalize() + pd.Timedelta(days=1)), 'left'))
+        return lo, max(lo, hi)
+
+    # Posições selecionadas: um slice quando não há filtro de UF, senão uma view do índice
+    def posicoes(self, uf=None, municipio=None, inicio=None, fim=None):
+        lo, hi = self.limites_data(inicio, fim)
+        if uf is None:
+            return slice(lo, hi)
+        if municipio is None:
+            base = self.posicoes_uf.get(uf)
+        else:
+            base = self.posicoes_municipio.get((uf, municipio))
+        if base is None:
+            return np.empty(0, dtype=np.intp)
+        return base[np.searchsorted(base, lo):np.searchsorted(base, hi)]
+
+    def selecionar(self, df, uf=None, municipio=None, inicio=None, fim=None):
+        return df.iloc[self.posicoes(uf, municipio, inicio, fim)]
@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+
+import numpy as np
+import requests
+
+from utils.config import CAMINHO_GEOJSON, TOLERANCIA_GEOJSON
+from utils.routes import estado_nome
+
+# Origem do GeoJSON dos estados brasileiros (usada apenas para gerar a cópia local)
+URL_GEOJSON = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
+
+# Casas decimais mantidas nas coordenadas simplificadas (5 casas ~ 1 metro)
+CASAS_DECIMAIS = 5
+
+
+# Baixar o GeoJSON uma única vez e guardar no repositório já simplificado
+def baixar_geojson(destino=CAMINHO_GEOJSON, url=URL_GEOJSON, tolerancia=TOLERANCIA_GEOJSON):
+    resposta = requests.get(url, timeout=60)
+    resposta.raise_for_status()
+    geojson = resposta.json()
+    if tolerancia > 0:
+        for feature in geojson['features']:
+            feature['geometry'] = simplificar_geometria(feature['geometry'], tolerancia)
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, ensure_ascii=False, separators=(",", ":"))
+
+
+# Distância de cada ponto ao segmento entre o primeiro e o último ponto
+def _distancias(pontos):
+    inicio, fim = pontos[0], pontos[-1]
+    segmento = fim - inicio
+    comprimento = np.hypot(*segmento)
+    if comprimento == 0:
+        return np.hypot(*(pontos - inicio).T)
+    return np.abs(segmento[0] * (inicio[1] - pontos[:, 1]) - segmento[1] * (inicio[0] - pontos[:, 0])) / comprimento
+
+
+# Simplificação de Douglas-Peucker (iterativa, para não estourar a pilha em fronteiras longas)
+def simplificar_linha(pontos, tolerancia):
+    manter = np.zeros(len(pontos), dtype=bool)
+    manter[[0, -1]] = True
+    pilha = [(0, len(pontos) - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        if j - i < 2:
+            continue
+        distancias = _distancias(pontos[i:j + 1])
+        k = int(np.argmax(distancias[1:-1])) + 1
+        if distancias[k] > tolerancia:
+            manter[i + k] = True
+            pilha.append((i, i + k))
+            pilha.append((i + k, j))
+    return pontos[manter]
+
+
+def _simplificar_anel(anel, tolerancia):
+    pontos = np.asarray(anel, dtype=float)
+    simplificado = simplificar_linha(pontos, tolerancia)
+    # Um anel fechado precisa de pelo menos 4 pontos; anéis pequenos demais ficam como estão
+    if len(simplificado) < 4:
+        simplificado = pontos
+    return np.round(simplificado, CASAS_DECIMAIS).tolist()
+
+
+def simplificar_geometria(geometria, tolerancia):
+    if geometria['type'] == 'Polygon':
+        coordenadas = [_simplificar_anel(anel, tolerancia) for anel in geometria['coordinates']]
+    elif geometria['type'] == 'MultiPolygon':
+        coordenadas = [[_simplificar_anel(anel, tolerancia) for anel in poligono] for poligono in geometria['coordinates']]
+    else:
+        return geometria
+    return {'type': geometria['type'], 'coordinates': coordenadas}
+
+
+# Carregar o GeoJSON local com a sigla da UF como id de cada estado.
+# Nunca baixa o arquivo em tempo de execução (os servidores podem não ter acesso à internet): sem a cópia local, erro.
+def carregar_geojson(caminho=CAMINHO_GEOJSON, tolerancia=0.0):
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(
+            f"GeoJSON dos estados não encontrado em {caminho}. Gere a cópia local com `python -m utils.geo` "
+            "em uma máquina com acesso à internet (ou aponte ACIDENTES_GEOJSON para o arquivo)."
+        )
+    with open(caminho, encoding="utf-8") as f:
+        geojson = json.load(f)
+
+    for feature in geojson['features']:
+        nome_estado = feature['properties']['name']
+        feature['id'] = estado_nome.get(nome_estado, None)  # Adicionar ID com a sigla do estado
+        if tolerancia > 0:
+            feature['geometry'] = simplificar_geometria(feature['geometry'], tolerancia)
+    return geojson
+
+
+# python -m utils.geo [destino] -> gera a cópia local do GeoJSON
+if __name__ == "__main__":
+    baixar_geojson(sys.argv[1] if len(sys.argv) > 1 else CAMINHO_GEOJSON)
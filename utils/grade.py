@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from utils.filtros import FiltroIndexado
+
+# Retângulo que contém o Brasil (longitude mínima, latitude mínima, longitude máxima, latitude máxima)
+LIMITES_BRASIL = (-74.0, -34.0, -34.0, 6.0)
+
+# Célula do nível mais fino, em graus (~1 km); cada nível seguinte dobra o lado da célula
+TAMANHO_CELULA = 0.01
+NIVEIS = 8
+
+# Janela do retângulo inteiro, em índices de célula do nível mais fino
+JANELA_BRASIL = (0, 0, round((LIMITES_BRASIL[2] - LIMITES_BRASIL[0]) / TAMANHO_CELULA),
+                 round((LIMITES_BRASIL[3] - LIMITES_BRASIL[1]) / TAMANHO_CELULA))
+
+# Colunas das partições usadas pela grade
+COLUNAS_GRADE = ['data_acidente', 'uf', 'municipio', 'mortos', 'latitude', 'longitude']
+
+
+# Lado da célula (em graus) de um nível
+def tamanho_nivel(nivel):
+    return TAMANHO_CELULA * (1 << nivel)
+
+
+# Longitude e latitude mínimas e máximas de uma janela em índices de célula (para posicionar o mapa)
+def limites_janela(janela):
+    x_min, y_min, x_max, y_max = janela
+    lon_min, lat_min = LIMITES_BRASIL[:2]
+    return (lon_min + x_min * TAMANHO_CELULA, lat_min + y_min * TAMANHO_CELULA,
+            lon_min + x_max * TAMANHO_CELULA, lat_min + y_max * TAMANHO_CELULA)
+
+
+# Grade espacial hierárquica dos acidentes. Acidentes e mortos são pré-agregados por dia, UF, município e
+# célula do nível mais fino; os níveis mais grossos saem de um deslocamento de bits das coordenadas da célula
+# (cada nível junta 2x2 células do anterior). Os filtros usam o mesmo motor de índices do cubo.
+class GradeDensidade:
+    def __init__(self, df, coluna_data='data_acidente'):
+        lon_min, lat_min, lon_max, lat_max = LIMITES_BRASIL
+        longitude = df['longitude'].to_numpy()
+        latitude = df['latitude'].to_numpy()
+
+        # Acidentes sem coordenada ou fora do Brasil ficam de fora do mapa
+        validos = (longitude >= lon_min) & (longitude < lon_max) & (latitude >= lat_min) & (latitude < lat_max)
+        df = df.iloc[np.flatnonzero(validos)]
+        celulas = (
+            pd.DataFrame({
+                'data': df[coluna_data].dt.normalize(),
+                'uf': df['uf'],
+                'municipio': df['municipio'],
+                'x': ((longitude[validos] - lon_min) / TAMANHO_CELULA).astype(np.int32),
+                'y': ((latitude[validos] - lat_min) / TAMANHO_CELULA).astype(np.int32),
+                'mortos': df['mortos'],
+            })
+            .groupby(['data', 'uf', 'municipio', 'x', 'y'], observed=True, sort=True)
+            .agg(acidentes=('mortos', 'size'), mortos=('mortos', 'sum'))
+            .reset_index()
+        )
+
+        self.filtro = FiltroIndexado(celulas, 'data')
+        self.x = celulas['x'].to_numpy()
+        self.y = celulas['y'].to_numpy()
+        self.acidentes = celulas['acidentes'].to_numpy()
+        self.mortos = celulas['mortos'].to_numpy()
+        for array in (self.x, self.y, self.acidentes, self.mortos):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.x)
+
+    # Menor nível em que a janela (em células do nível mais fino) cabe em ~pontos_lado células de cada lado
+    def nivel_para_janela(self, janela, pontos_lado=200):
+        x_min, y_min, x_max, y_max = janela
+        lado = max(x_max - x_min, y_max - y_min) / pontos_lado
+        nivel = int(np.ceil(np.log2(max(lado, 1))))
+        return min(max(nivel, 0), NIVEIS - 1)
+
+    # Janela ocupada pelos acidentes selecionados, em índices de célula do nível mais fino:
+    # (x mínimo, y mínimo, x máximo, y máximo), com os máximos exclusivos
+    def janela(self, posicoes):
+        x, y = self.x[posicoes], self.y[posicoes]
+        if len(x) == 0:
+            return JANELA_BRASIL
+        return int(x.min()), int(y.min()), int(x.max()) + 1, int(y.max()) + 1
+
+    # Acidentes e mortos por célula no nível pedido, só dentro da janela (índices de célula, como em `janela`).
+    # Se passar de max_celulas, sobe de nível até caber; devolve (células, nível usado).
+    def celulas(self, posicoes, nivel, janela=None, max_celulas=20000):
+        x, y = self.x[posicoes], self.y[posicoes]
+        acidentes, mortos = self.acidentes[posicoes], self.mortos[posicoes]
+        if janela is not None:
+            x_min, y_min, x_max, y_max = janela
+            dentro = (x >= x_min) & (x < x_max) & (y >= y_min) & (y < y_max)
+            x, y, acidentes, mortos = x[dentro], y[dentro], acidentes[dentro], mortos[dentro]
+
+        while True:
+            cx, cy = x >> nivel, y >> nivel
+            # Identificador único da célula no nível (as coordenadas cabem em 16 bits)
+            ids, inverso = np.unique((cx.astype(np.int64) << 16) | cy, return_inverse=True)
+            if len(ids) <= max_celulas or nivel == NIVEIS - 1:
+                break
+            nivel += 1
+
+        tamanho = tamanho_nivel(nivel)
+        celulas = pd.DataFrame({
+            'longitude': LIMITES_BRASIL[0] + ((ids >> 16) + 0.5) * tamanho,
+            'latitude': LIMITES_BRASIL[1] + ((ids & 0xFFFF) + 0.5) * tamanho,
+            'acidentes': np.bincount(inverso, weights=acidentes, minlength=len(ids)).astype(np.int64),
+            'mortos': np.bincount(inverso, weights=mortos, minlength=len(ids)).astype(np.int64),
+        })
+        return celulas, nivel
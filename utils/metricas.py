@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# Registro das durações de cada etapa (span), compartilhado pelo processo.
+# Guarda uma janela móvel por span para os percentis e exporta em JSON-lines e no formato texto do Prometheus.
+class RegistroMetricas:
+    def __init__(self, caminho_jsonl, caminho_prometheus, janela=1000, intervalo_exportacao=15.0):
+        self.caminho_jsonl = caminho_jsonl
+        self.caminho_prometheus = caminho_prometheus
+        self.intervalo_exportacao = intervalo_exportacao
+        self._amostras = defaultdict(lambda: deque(maxlen=janela))
+        self._contagem = defaultdict(int)
+        self._soma = defaultdict(float)
+        self._ultima_exportacao = time.monotonic()
+        self._trava = threading.Lock()
+
+    def registrar(self, nome, duracao):
+        with self._trava:
+            self._amostras[nome].append(duracao)
+            self._contagem[nome] += 1
+            self._soma[nome] += duracao
+
+    # p50/p95 da janela móvel de cada span
+    def percentis(self):
+        with self._trava:
+            amostras = {nome: np.array(valores) for nome, valores in self._amostras.items()}
+            contagem = dict(self._contagem)
+            soma = dict(self._soma)
+        return {
+            nome: {
+                'p50': float(np.percentile(valores, 50)),
+                'p95': float(np.percentile(valores, 95)),
+                'janela': len(valores),
+                'contagem': contagem[nome],
+                'soma': soma[nome],
+            }
+            for nome, valores in sorted(amostras.items())
+        }
+
+    def exportar(self):
+        percentis = self.percentis()
+        self._ultima_exportacao = time.monotonic()
+        if self.caminho_jsonl:
+            os.makedirs(os.path.dirname(self.caminho_jsonl) or ".", exist_ok=True)
+            with open(self.caminho_jsonl, "a", encoding="utf-8") as f:
+                f.write(json.dumps({'timestamp': time.time(), 'pid': os.getpid(), 'spans': percentis}) + "\n")
+        if self.caminho_prometheus:
+            linhas = [
+                "# HELP acidentes_span_segundos Duração das etapas de uma reexecução do app",
+                "# TYPE acidentes_span_segundos summary",
+            ]
+            for nome, valores in percentis.items():
+                linhas.append(f'acidentes_span_segundos{{span="{nome}",quantile="0.5"}} {valores["p50"]:.6f}')
+                linhas.append(f'acidentes_span_segundos{{span="{nome}",quantile="0.95"}} {valores["p95"]:.6f}')
+                linhas.append(f'acidentes_span_segundos_sum{{span="{nome}"}} {valores["soma"]:.6f}')
+                linhas.append(f'acidentes_span_segundos_count{{span="{nome}"}} {valores["contagem"]}')
+            # O node exporter pode ler o arquivo a qualquer momento: gravar em outro e renomear
+            os.makedirs(os.path.dirname(self.caminho_prometheus) or ".", exist_ok=True)
+            temporario = f"{self.caminho_prometheus}.{os.getpid()}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.write("\n".join(linhas) + "\n")
+            os.replace(temporario, self.caminho_prometheus)
+
+    def exportar_se_necessario(self):
+        if time.monotonic() - self._ultima_exportacao >= self.intervalo_exportacao:
+            self.exportar()
+
+
+# Spans de uma única reexecução do script
+class Medidor:
+    def __init__(self, registro=None):
+        self.registro = registro
+        self.spans = []
+        self.inicio = time.perf_counter()
+
+    @contextmanager
+    def span(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.spans.append((nome, duracao))
+            if self.registro is not None:
+                self.registro.registrar(nome, duracao)
+
+    # Tempo desde a criação do medidor (a reexecução inteira)
+    def finalizar(self, nome='total'):
+        duracao = time.perf_counter() - self.inicio
+        self.spans.append((nome, duracao))
+        if self.registro is not None:
+            self.registro.registrar(nome, duracao)
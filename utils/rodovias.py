@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from utils.agregacao import DIMENSOES_AGREGADAS
+
+# Colunas das linhas usadas pelo índice das rodovias e, só com uma BR escolhida, pela tabela do kernel de agregação
+COLUNAS_RODOVIAS = ['data_acidente', 'br', 'km', 'uf', 'municipio', 'mortos']
+COLUNAS_TABELA_RODOVIAS = ['data_acidente', 'mortos'] + DIMENSOES_AGREGADAS
+
+# Critérios do ranking de trechos: coluna ordenada primeiro (a outra desempata)
+CRITERIOS_RANKING = {'mortos': 'Mortos', 'acidentes': 'Acidentes'}
+
+# Distância entre BRs na chave (BR, km) usada nas janelas; maior que qualquer km + tamanho de janela
+_SEPARACAO_BR = 1e5
+
+
+# Rótulo de uma rodovia para a interface ("BR-116")
+def rotulo_br(br):
+    return f"BR-{int(br):03d}"
+
+
+# Resumo das rodovias de uma partição, guardado no manifesto na ingestão: BRs de cada UF e menor e maior km de
+# cada BR (None se a BR não tiver km). Os controles do filtro de rodovia leem só esse resumo, sem carregar as linhas.
+def resumir_rodovias(df):
+    com_br = df.loc[df['br'] != 0, ['uf', 'br', 'km']]
+    pares = com_br.dropna(subset=['uf']).groupby(['uf', 'br'], observed=True).size().index
+    brs_por_uf = {}
+    for uf, br in pares:
+        brs_por_uf.setdefault(str(uf), []).append(int(br))
+    limites = com_br.groupby('br')['km'].agg(['min', 'max'])
+    limites_km = {
+        str(br): None if pd.isna(minimo) else [round(float(minimo), 3), round(float(maximo), 3)]
+        for br, minimo, maximo in zip(limites.index, limites['min'], limites['max'])
+    }
+    return {'brs_por_uf': brs_por_uf, 'limites_km': limites_km}
+
+
+# Juntar os resumos das partições do manifesto: {UF: [BRs em ordem]} e {BR: (km mínimo, km máximo) ou None}
+def tabelas_rodovias(manifesto):
+    brs_por_uf = {}
+    limites_km = {}
+    for info in manifesto["particoes"].values():
+        resumo = info["rodovias"]
+        for uf, brs in resumo['brs_por_uf'].items():
+            brs_por_uf.setdefault(uf, set()).update(brs)
+        for br, limites in resumo['limites_km'].items():
+            atual = limites_km.get(int(br))
+            if limites is None:
+                limites_km.setdefault(int(br), None)
+            elif atual is None:
+                limites_km[int(br)] = tuple(limites)
+            else:
+                limites_km[int(br)] = (min(atual[0], limites[0]), max(atual[1], limites[1]))
+    return ({uf: sorted(brs) for uf, brs in sorted(brs_por_uf.items())},
+            {br: limites_km[br] for br in sorted(limites_km)})
+
+
+# Trechos críticos: janelas deslizantes [km, km + tamanho) que começam no km de cada acidente, sem passar de uma BR
+# para outra. As entradas precisam estar ordenadas por (BR, km), sem km ausente; cada janela soma os acidentes e os
+# mortos com duas buscas binárias e uma soma acumulada. As janelas são ordenadas pelo critério e escolhidas em
+# sequência, descartando as que se sobrepõem a um trecho já escolhido da mesma BR.
+def ranquear_trechos(br, km, mortos, ufs, tamanho=1.0, top=10, criterio='mortos'):
+    colunas = ['br', 'km_inicial', 'km_final', 'ufs', 'acidentes', 'mortos', 'acidentes_km', 'mortos_km']
+    if len(km) == 0:
+        return pd.DataFrame({coluna: [] for coluna in colunas})
+
+    chave = br.astype(np.float64) * _SEPARACAO_BR + km.astype(np.float64)
+    inicio_janela = np.arange(len(chave))
+    fim_janela = np.searchsorted(chave, chave + tamanho, 'left')
+    acidentes = fim_janela - inicio_janela
+    acumulado = np.concatenate([[0], np.cumsum(mortos, dtype=np.int64)])
+    soma_mortos = acumulado[fim_janela] - acumulado[inicio_janela]
+
+    # Ordem do critério; empates ficam na ordem (BR, km)
+    if criterio == 'mortos':
+        ordem = np.lexsort((-acidentes, -soma_mortos))
+    else:
+        ordem = np.lexsort((-soma_mortos, -acidentes))
+
+    escolhidas = []
+    for i in ordem:
+        if len(escolhidas) == top:
+            break
+        if any(br[j] == br[i] and abs(km[j] - km[i]) < tamanho for j in escolhidas):
+            continue
+        escolhidas.append(i)
+    escolhidas = np.array(escolhidas, dtype=np.intp)
+    # km guardado em float32: arredondar para não mostrar o ruído da conversão (163.39999...)
+    km_inicial = km[escolhidas].astype(np.float64).round(3)
+
+    return pd.DataFrame({
+        'br': [rotulo_br(valor) for valor in br[escolhidas]],
+        'km_inicial': km_inicial,
+        'km_final': (km_inicial + tamanho).round(3),
+        'ufs': [", ".join(sorted(set(ufs[i:fim_janela[i]]) - {None})) for i in escolhidas],
+        'acidentes': acidentes[escolhidas].astype(np.int64),
+        'mortos': soma_mortos[escolhidas],
+        'acidentes_km': acidentes[escolhidas] / tamanho,
+        'mortos_km': soma_mortos[escolhidas] / tamanho,
+    })
+
+
+# Índice das rodovias sobre as linhas dos acidentes: as linhas com BR ficam ordenadas por (BR, km), com os km
+# ausentes no fim de cada BR. Cada BR é um bloco contíguo, então o filtro de trecho [km inicial, km final] é uma
+# busca binária dentro do bloco (sem máscara sobre todas as linhas); UF, município e datas só são testados nas
+# linhas do trecho. Guarda só os arrays usados pelos filtros e pelo ranking (COLUNAS_RODOVIAS) e `ordem`, a posição
+# de cada linha do índice nas linhas originais (para montar outras colunas na mesma ordem, como a tabela do kernel).
+class IndiceRodovias:
+    def __init__(self, df):
+        br = df['br'].to_numpy()
+        km = df['km'].to_numpy()
+        validas = np.flatnonzero(br != 0)
+        self.ordem = validas[np.lexsort((km[validas], br[validas]))]
+
+        self.br = br[self.ordem]
+        self.km = km[self.ordem]
+        self.datas = df['data_acidente'].to_numpy()[self.ordem]
+        self.mortos = df['mortos'].to_numpy()[self.ordem]
+        self.ufs = df['uf'].cat.categories
+        self.codigos_uf = df['uf'].cat.codes.to_numpy()[self.ordem]
+        self.municipios = df['municipio'].cat.categories
+        self.codigos_municipio = df['municipio'].cat.codes.to_numpy()[self.ordem]
+
+        # Bloco [início, fim) de cada BR
+        rodovias, inicios = np.unique(self.br, return_index=True)
+        fins = np.append(inicios[1:], len(self.br))
+        self.blocos = {int(br): (int(inicio), int(fim)) for br, inicio, fim in zip(rodovias, inicios, fins)}
+
+    # Posições (no índice) das linhas da seleção: um slice quando só há BR e trecho, senão as posições que passam nos
+    # outros filtros. Sem BR, a seleção é feita sobre todas as BRs (o trecho só vale com uma BR escolhida); o km final
+    # entra inteiro e as linhas sem km ficam fora de qualquer trecho.
+    def posicoes(self, br=None, km_inicio=None, km_fim=None, uf=None, municipio=None, inicio=None, fim=None):
+        if br is None:
+            lo, hi = 0, len(self.br)
+        else:
+            lo, hi = self.blocos.get(br, (0, 0))
+            bloco_lo = lo
+            if km_inicio is not None or km_fim is not None:
+                # Os km ausentes (NaN) ficam no fim do bloco, depois de qualquer km
+                hi = bloco_lo + int(np.searchsorted(self.km[bloco_lo:hi], np.inf, 'right'))
+            if km_inicio is not None:
+                lo = bloco_lo + int(np.searchsorted(self.km[bloco_lo:hi], km_inicio, 'left'))
+            if km_fim is not None:
+                hi = bloco_lo + int(np.searchsorted(self.km[bloco_lo:hi], km_fim, 'right'))
+            hi = max(lo, hi)
+
+        mascara = None
+        if uf is not None:
+            codigo = self.ufs.get_loc(uf) if uf in self.ufs else -2
+            mascara = self.codigos_uf[lo:hi] == codigo
+            if municipio is not None:
+                codigo = self.municipios.get_loc(municipio) if municipio in self.municipios else -2
+                mascara &= self.codigos_municipio[lo:hi] == codigo
+        if inicio is not None or fim is not None:
+            datas = self.datas[lo:hi]
+            no_periodo = np.ones(hi - lo, dtype=bool)
+            if inicio is not None:
+                no_periodo &= datas >= np.datetime64(pd.Timestamp(inicio).normalize())
+            if fim is not None:
+                no_periodo &= datas < np.datetime64(pd.Timestamp(fim).normalize() + pd.Timedelta(days=1))
+            mascara = no_periodo if mascara is None else mascara & no_periodo
+        if mascara is None:
+            return slice(lo, hi)
+        return lo + np.flatnonzero(mascara)
+
+    # Somas diárias de acidentes e mortos das posições (entrada da montagem das séries temporais)
+    def somas_diarias(self, posicoes):
+        dias = pd.DatetimeIndex(self.datas[posicoes]).normalize()
+        somas = (
+            pd.DataFrame({'acidentes': np.ones(len(dias), dtype=np.int32), 'mortos': self.mortos[posicoes].astype(np.int32)})
+            .groupby(dias.to_numpy())
+            .sum()
+        )
+        return somas.index.to_numpy(), somas['acidentes'].to_numpy(), somas['mortos'].to_numpy()
+
+    # Trechos críticos das posições (que já vêm em ordem de BR e km)
+    def ranking(self, posicoes, tamanho=1.0, top=10, criterio='mortos'):
+        indices = np.arange(*posicoes.indices(len(self.br))) if isinstance(posicoes, slice) else posicoes
+        indices = indices[~np.isnan(self.km[indices])]
+        codigos = self.codigos_uf[indices]
+        ufs = np.where(codigos >= 0, np.asarray(self.ufs, dtype=object)[codigos], None)
+        return ranquear_trechos(self.br[indices], self.km[indices], self.mortos[indices], ufs, tamanho, top, criterio)
@@ -38,4 +38,14 @@ estado_nome = {
     'Pernambuco': 'PE', 'Piauí': 'PI', 'Rio de Janeiro': 'RJ', 'Rio Grande do Norte': 'RN',
     'Rio Grande do Sul': 'RS', 'Rondônia': 'RO', 'Roraima': 'RR', 'Santa Catarina': 'SC',
     'São Paulo': 'SP', 'Sergipe': 'SE', 'Tocantins': 'TO'
+}
+
+# Tamanho da população de cada estado - Fonte: https://www.cnnbrasil.com.br/nacional/brasil-tem-2125-milhoes-de-habitantes-diz-ibge/#goog_rewarded
+populacao = {
+    "SP": 45973194, "MG": 21322691, "RJ": 17219679, "BA": 14850513, "PR": 11824665,
+    "RS": 11229915, "PE": 9539029, "CE": 9233656, "PA": 8664306, "SC": 8058441,
+    "GO": 7350483, "MA": 7010960, "AM": 4281209, "PB": 4145040, "ES": 4102129,
+    "MT": 3836399, "RN": 3446071, "PI": 3375646, "AL": 3220104, "DF": 2982818,
+    "MS": 2901895, "SE": 2291077, "RO": 1746227, "TO": 1577342, "AC": 880631,
+    "AP": 802837, "RR": 716793
 }
\ No newline at end of file
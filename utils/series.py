@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from utils.filtros import FiltroIndexado
+
+# Granularidades das séries: diária, semanal (segunda a domingo) e mensal
+GRANULARIDADES = {'D': 'Diária', 'W': 'Semanal', 'M': 'Mensal'}
+
+# Limites (em dias do intervalo) da escolha automática da granularidade
+MAX_DIAS_DIARIA = 180
+MAX_DIAS_SEMANAL = 3 * 365
+
+
+# Somar as tabelas diárias por período (coluna 'data' = início do período)
+def _agrupar_periodo(diario, granularidade):
+    inicio_periodo = diario['data'].dt.to_period(granularidade).dt.start_time
+    return (
+        diario.assign(data=inicio_periodo)
+        .groupby(['data', 'uf', 'municipio'], observed=True, sort=True)[['acidentes', 'mortos']]
+        .sum()
+        .reset_index()
+    )
+
+
+# Granularidade automática a partir do tamanho do intervalo
+def granularidade_automatica(inicio, fim):
+    dias = (pd.Timestamp(fim) - pd.Timestamp(inicio)).days + 1
+    if dias <= MAX_DIAS_DIARIA:
+        return 'D'
+    if dias <= MAX_DIAS_SEMANAL:
+        return 'W'
+    return 'M'
+
+
+# Redução de pontos Largest-Triangle-Three-Buckets: mantém o primeiro e o último ponto e, em cada balde,
+# o ponto que forma o maior triângulo com o ponto escolhido antes e a média do balde seguinte (preserva picos e vales)
+def lttb(x, y, max_pontos):
+    n = len(y)
+    if max_pontos >= n or max_pontos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    limites = np.linspace(1, n - 1, max_pontos - 1).astype(np.int64)
+    escolhidos = np.empty(max_pontos, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(max_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        proximo_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[fim:proximo_fim].mean() if proximo_fim > fim else x[-1]
+        media_y = y[fim:proximo_fim].mean() if proximo_fim > fim else y[-1]
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+
+# Séries temporais por UF e município: acidentes e mortos por dia, com as somas semanais e mensais
+# derivadas das diárias. Cada tabela tem o próprio índice de filtros (UF, município e busca binária nas datas).
+class SeriesTemporais:
+    def __init__(self, cubo):
+        diario = (
+            cubo.groupby(['data', 'uf', 'municipio'], observed=True, sort=True)[['acidentes', 'mortos']]
+            .sum()
+            .reset_index()
+        )
+        self.tabelas = {'D': diario, 'W': _agrupar_periodo(diario, 'W'), 'M': _agrupar_periodo(diario, 'M')}
+        self.filtros = {granularidade: FiltroIndexado(tabela, 'data') for granularidade, tabela in self.tabelas.items()}
+
+    def _somar(self, granularidade, uf, municipio, inicio, fim):
+        tabela = self.tabelas[granularidade]
+        posicoes = self.filtros[granularidade].posicoes(uf, municipio, inicio, fim)
+        return tabela['data'].to_numpy()[posicoes], tabela['acidentes'].to_numpy()[posicoes], tabela['mortos'].to_numpy()[posicoes]
+
+    # Série do intervalo [início, fim] na granularidade pedida (None = automática), com no máximo max_pontos.
+    # Os períodos inteiros vêm da tabela da granularidade; os pedaços de período nas bordas, da tabela diária.
+    def serie(self, uf=None, municipio=None, inicio=None, fim=None, granularidade=None, max_pontos=500):
+        datas_diario = self.tabelas['D']['data']
+        inicio = pd.Timestamp(inicio if inicio is not None else datas_diario.iloc[0]).normalize()
+        fim = pd.Timestamp(fim if fim is not None else datas_diario.iloc[-1]).normalize()
+        granularidade = granularidade or granularidade_automatica(inicio, fim)
+
+        if granularidade == 'D':
+            partes = [self._somar('D', uf, municipio, inicio, fim)]
+        else:
+            # Primeiro e último período que cabem inteiros no intervalo
+            periodo_inicio, periodo_fim = inicio.to_period(granularidade), fim.to_period(granularidade)
+            primeiro = periodo_inicio if inicio == periodo_inicio.start_time else periodo_inicio + 1
+            ultimo = periodo_fim if fim == periodo_fim.end_time.normalize() else periodo_fim - 1
+            if primeiro <= ultimo:
+                partes = [
+                    self._somar('D', uf, municipio, inicio, primeiro.start_time - pd.Timedelta(days=1)),
+                    self._somar(granularidade, uf, municipio, primeiro.start_time, ultimo.start_time),
+                    self._somar('D', uf, municipio, (ultimo + 1).start_time, fim),
+                ]
+            else:
+                partes = [self._somar('D', uf, municipio, inicio, fim)]
+
+        return montar_serie(np.concatenate([parte[0] for parte in partes]),
+                            np.concatenate([parte[1] for parte in partes]),
+                            np.concatenate([parte[2] for parte in partes]), inicio, fim, granularidade, max_pontos)
+
+
+# Série final a partir de somas por dia (ou por período): soma por período da granularidade, com zero nos períodos
+# sem acidentes entre início e fim, e redução com LTTB quando passar de max_pontos
+def montar_serie(datas, acidentes, mortos, inicio, fim, granularidade, max_pontos=500):
+    if granularidade == 'D':
+        baldes = pd.date_range(inicio, fim, freq='D')
+    else:
+        baldes = pd.period_range(inicio.to_period(granularidade), fim.to_period(granularidade), freq=granularidade).start_time
+        datas = pd.DatetimeIndex(datas).to_period(granularidade).start_time
+    serie = (
+        pd.DataFrame({'data': datas, 'acidentes': acidentes, 'mortos': mortos})
+        .groupby('data')[['acidentes', 'mortos']]
+        .sum()
+        .reindex(baldes, fill_value=0)
+        .rename_axis('data')
+        .reset_index()
+    )
+
+    # Períodos demais para o navegador: reduzir cada série mantendo a forma
+    if len(serie) > max_pontos:
+        x = serie['data'].to_numpy().astype(np.int64)
+        acidentes = serie.iloc[lttb(x, serie['acidentes'].to_numpy(), max_pontos)]
+        mortos = serie.iloc[lttb(x, serie['mortos'].to_numpy(), max_pontos)]
+        return {'granularidade': granularidade, 'acidentes': acidentes[['data', 'acidentes']],
+                'mortos': mortos[['data', 'mortos']], 'reduzida': True}
+    return {'granularidade': granularidade, 'acidentes': serie[['data', 'acidentes']],
+            'mortos': serie[['data', 'mortos']], 'reduzida': False}